@@ -0,0 +1,319 @@
+"""
+Adaptive test scheduling: spend test airtime where links are changing.
+
+Each target's interval (start to start) and test duration follow what its
+last tests showed:
+
+- stable   no drift for CALM_TESTS tests in a row: interval x BACKOFF, up to max_interval
+- drift    a metric moved more than DRIFT_Z standard deviations from its
+           recent (exponentially weighted) level: interval halved
+- incident the detector flagged the sample, the model predicted
+           degradation, or a metric moved INCIDENT_Z std: min_interval at
+           once, with shorter tests so the denser sampling costs less airtime
+
+A global airtime budget (test-seconds per second, summed over all targets)
+caps the total: when demand exceeds it, stable and drifting targets are
+stretched first, so incidents keep their sampling rate.
+
+    python adaptive_scheduler.py --bench [--csv wifi_results.csv] [--targets 20 --hours 48]
+
+replays recorded histories (the CSV, plus a longer synthetic multi-target
+one) under fixed-rate and adaptive schedules and compares airtime against
+detection latency.
+"""
+import sys, time, heapq
+import numpy as np
+from anomaly_detector import RunningStats, AnomalyDetector, METRICS
+
+# ----------------- Configuration ----------------- #
+BASE_INTERVAL = 5.0     # seconds between tests before anything is known
+MIN_INTERVAL = 2.0      # during an incident
+MAX_INTERVAL = 30.0     # for a long-stable link
+BACKOFF = 1.5           # interval growth per calm stretch
+CALM_TESTS = 3          # quiet tests in a row before backing off
+DRIFT_Z = 3.0           # max over the metrics, so lower values fire on noise
+INCIDENT_Z = 4.0
+HALFLIFE = 20           # tests; weight of the level/variance each metric is compared with
+MIN_HISTORY = 5         # tests before z-scores count
+MERGE_GAP = 60.0        # replay: degraded runs closer than this are one incident
+STABLE, DRIFT, INCIDENT = "stable", "drift", "incident"
+
+# -------- Policy -------- #
+class _Link:
+    __slots__ = ("interval", "duration", "level", "calm", "stats", "tests")
+
+    def __init__(self, interval, duration):
+        self.interval = interval
+        self.duration = duration
+        self.level = STABLE
+        self.calm = 0
+        self.tests = 0
+        self.stats = {m: RunningStats(halflife=HALFLIFE) for m in METRICS}
+
+class AdaptivePolicy:
+    """
+    Per-target test interval and duration from recent variance and the
+    detector/model signals. observe() after every test; interval() and
+    duration() for the next one. `budget` is the airtime allowed in total,
+    in test-seconds per second (None: unlimited).
+    """
+
+    def __init__(self, duration=5.0, min_duration=None, base_interval=BASE_INTERVAL,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, backoff=BACKOFF,
+                 calm_tests=CALM_TESTS, drift_z=DRIFT_Z, incident_z=INCIDENT_Z, budget=None):
+        self.test_duration = duration
+        self.min_duration = min_duration if min_duration is not None else max(duration / 2, 0.5)
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.calm_tests = calm_tests
+        self.drift_z = drift_z
+        self.incident_z = incident_z
+        self.budget = budget
+        self.links = {}
+        self._stretch = {STABLE: 1.0, DRIFT: 1.0, INCIDENT: 1.0}
+
+    def _link(self, key):
+        link = self.links.get(key)
+        if link is None:
+            link = self.links[key] = _Link(self.base_interval, self.test_duration)
+            self._rebalance()
+        return link
+
+    def observe(self, key, sample, anomalies=None, degraded=None):
+        """
+        One finished test: `sample` is anything with .get(metric) (Sample,
+        dict), `anomalies` the metrics the detector flagged, `degraded` the
+        model's prediction. Returns the target's new level.
+        """
+        link = self._link(key)
+        link.tests += 1
+        z = 0.0
+        values = {}
+        for metric, stats in link.stats.items():
+            x = sample.get(metric)
+            if x is None or x != x:
+                continue
+            values[metric] = float(x)
+            if stats.count >= MIN_HISTORY and stats.std > 0:
+                z = max(z, abs(x - stats.mean) / stats.std)
+
+        incident = anomalies or (degraded is not None and degraded > 0) or z >= self.incident_z
+        if not incident:
+            # The baseline only learns from normal samples, so an incident doesn't blunt the next one
+            for metric, x in values.items():
+                link.stats[metric].push(x)
+        if incident:
+            link.level, link.calm = INCIDENT, 0
+            link.interval = self.min_interval
+            link.duration = self.min_duration
+        elif z >= self.drift_z:
+            link.level, link.calm = DRIFT, 0
+            link.interval = max(self.min_interval, link.interval / 2)
+            link.duration = self.test_duration
+        else:
+            link.calm += 1
+            link.duration = self.test_duration
+            if link.level == INCIDENT:
+                # Leave the incident rate in steps, not straight back to the old interval
+                link.level = DRIFT
+            if link.calm >= self.calm_tests:
+                link.level, link.calm = STABLE, 0
+                link.interval = min(self.max_interval, link.interval * self.backoff)
+        self._rebalance()
+        return link.level
+
+    def _rebalance(self):
+        """Stretch intervals so total airtime fits the budget, incidents last"""
+        self._stretch = {STABLE: 1.0, DRIFT: 1.0, INCIDENT: 1.0}
+        if self.budget is None:
+            return
+        demand = {STABLE: 0.0, DRIFT: 0.0, INCIDENT: 0.0}
+        for link in self.links.values():
+            demand[link.level] += link.duration / max(link.interval, link.duration)
+        total = sum(demand.values())
+        if total <= self.budget:
+            return
+        urgent = demand[INCIDENT]
+        if urgent >= self.budget:
+            stretch = total / self.budget
+            self._stretch = {STABLE: stretch, DRIFT: stretch, INCIDENT: stretch}
+        else:
+            stretch = (total - urgent) / (self.budget - urgent)
+            self._stretch = {STABLE: stretch, DRIFT: stretch, INCIDENT: 1.0}
+
+    def interval(self, key):
+        """Seconds from this test's start to the next one's (never shorter than the test)"""
+        link = self._link(key)
+        return max(link.interval * self._stretch[link.level], link.duration)
+
+    def duration(self, key):
+        return self._link(key).duration
+
+    def level(self, key):
+        return self._link(key).level
+
+    def airtime(self):
+        """Current demand in test-seconds per second, after the budget"""
+        return sum(self.duration(k) / self.interval(k) for k in self.links)
+
+# -------- Replay -------- #
+def incidents(times, degraded, merge_gap=MERGE_GAP):
+    """[(start, end)] runs of degraded rows (times in seconds), runs less than merge_gap apart joined"""
+    edges = np.diff(np.concatenate([[0], degraded.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    out = []
+    for s, e in zip(times[starts], times[ends]):
+        if out and s - out[-1][1] < merge_gap:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+def replay(histories, policy=None, interval=BASE_INTERVAL, duration=5.0, predictions=None):
+    """
+    Run a schedule over recorded histories: {target: (times s, metrics
+    (n, 4) in METRICS order, degraded 0/1)}. A test at time t sees the
+    first recorded row at or after t. Fixed-rate when `policy` is None.
+    The policy gets the detector's flags and, if given, the model's
+    prediction for the row ({target: 0/1 per row}); never the label.
+    Returns {"tests", "airtime", "latencies" (s, per detected incident), "missed"}.
+    """
+    tests, airtime = 0, 0.0
+    latencies, missed = [], 0
+    heap = [(h[0][0], key) for key, h in histories.items() if len(h[0])]
+    heapq.heapify(heap)
+    sampled = {key: [] for key in histories}
+    detectors = {key: AnomalyDetector() for key in histories}
+    while heap:
+        t, key = heapq.heappop(heap)
+        times, X, degraded = histories[key]
+        i = int(np.searchsorted(times, t))
+        if i >= len(times):
+            continue
+        sampled[key].append(t)
+        tests += 1
+        if policy is None:
+            airtime += duration
+            heapq.heappush(heap, (t + interval, key))
+            continue
+        airtime += policy.duration(key)
+        sample = dict(zip(METRICS, X[i]))
+        flagged = detectors[key].update(sample)
+        policy.observe(key, sample, flagged, None if predictions is None else predictions[key][i])
+        heapq.heappush(heap, (t + policy.interval(key), key))
+
+    for key, (times, X, degraded) in histories.items():
+        test_times = np.asarray(sampled[key])
+        for start, end in incidents(times, degraded):
+            # Detected by the first test that lands inside the incident
+            j = np.searchsorted(test_times, start)
+            if j < len(test_times) and test_times[j] <= end:
+                latencies.append(test_times[j] - start)
+            else:
+                missed += 1
+    return {"tests": tests, "airtime": airtime, "latencies": np.asarray(latencies), "missed": missed}
+
+def histories_from_frame(df):
+    """{target: (times, X, degraded)} from a results DataFrame, labelled like online_training"""
+    from online_training import label_frame
+    df = df.sort_values("timestamp").reset_index(drop=True)
+    if "target" not in df:
+        df["target"] = "recorded"
+    for metric in METRICS:
+        df[metric] = df[metric].astype(float).fillna(0.0)
+    df["degraded"] = label_frame(df)
+    out = {}
+    for key, group in df.groupby("target", sort=False):
+        times = group["timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+        out[key] = (times - times[0], group[METRICS].to_numpy(dtype=float), group["degraded"].to_numpy())
+    return out
+
+def synthetic_histories(targets=20, hours=48, step=1.0, ramp=(60, 180), seed=0):
+    """
+    Per-target ground truth every `step` seconds with incidents every few
+    hours. Each incident ramps in over `ramp` seconds (throughput sinking,
+    latency and jitter rising; (0, 0) for abrupt onsets) before the link is
+    degraded for 2-10 minutes.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 / step)
+    times = np.arange(n) * step
+    out = {}
+    for t in range(targets):
+        base = rng.uniform(100, 800)
+        X = np.column_stack([base * rng.normal(1.0, 0.05, n), rng.gamma(4.0, 2.0, n),
+                             rng.gamma(2.0, 0.3, n), np.clip(rng.normal(0.2, 0.2, n), 0, None)])
+        degraded = np.zeros(n, dtype=np.int8)
+        k = int(rng.exponential(3 * 3600 / step))
+        while k < n:
+            onset, hold = int(rng.uniform(*ramp) / step), int(rng.uniform(120, 600) / step)
+            severity = np.concatenate([np.linspace(0, 1, onset, endpoint=False), np.ones(hold)])[:n - k]
+            rows = slice(k, k + len(severity))
+            X[rows, 0] *= 1 - 0.8 * severity
+            X[rows, 1] += 90 * severity
+            X[rows, 2] += 5 * severity
+            X[rows, 3] += 8 * severity
+            degraded[rows] = (X[rows, 1] > 50) | (X[rows, 3] > 5) | (X[rows, 0] < 0.5 * base)
+            k += len(severity) + int(rng.exponential(3 * 3600 / step))
+        out[f"10.0.0.{t + 1}:5201"] = (times, X, degraded)
+    return out
+
+def model_predictions(histories, seed=99, rows=200_000):
+    """{target: 0/1 per row} from a forest trained on a synthetic history with another seed"""
+    from sklearn.ensemble import RandomForestClassifier
+    train = synthetic_histories(targets=4, hours=24, seed=seed)
+    X = np.concatenate([h[1] for h in train.values()])
+    y = np.concatenate([h[2] for h in train.values()])
+    pick = np.random.default_rng(seed).choice(len(X), min(rows, len(X)), replace=False)
+    clf = RandomForestClassifier(n_estimators=50, min_samples_leaf=5, n_jobs=-1, random_state=seed)
+    clf.fit(X[pick], y[pick])
+    return {key: clf.predict(X_key) for key, (_, X_key, _) in histories.items()}
+
+def _report(label, result, reference):
+    lat = result["latencies"]
+    mean = f"{lat.mean():7.1f}" if len(lat) else "     -"
+    p90 = f"{np.percentile(lat, 90):7.1f}" if len(lat) else "     -"
+    print(f"  {label:<34} {result['tests']:>8} {result['airtime'] / reference * 100:8.1f}% {mean} s {p90} s "
+          f"{result['missed']:>7}")
+
+def benchmark(csv=None, targets=20, hours=48, duration=5.0, budget=None):
+    """Fixed 5 s schedule vs adaptive (and fixed at the adaptive airtime) on recorded histories"""
+    sets = []
+    if csv:
+        import pandas as pd
+        df = pd.read_csv(csv)
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="mixed")
+        sets.append((f"{csv} ({len(df)} rows)", histories_from_frame(df), None))
+    # Model rows use a forest trained on other synthetic data, as the live loop uses its trained model
+    for onsets, ramp in (("gradual", (60, 180)), ("abrupt", (0, 0))):
+        histories = synthetic_histories(targets, hours, ramp=ramp)
+        sets.append((f"synthetic, {targets} targets x {hours} h, {onsets} onsets", histories,
+                     model_predictions(histories)))
+    for label, histories, predictions in sets:
+        print(f"\n{label}")
+        print(f"  {'schedule':<34} {'tests':>8} {'airtime':>9} {'latency':>9} {'p90':>9} {'missed':>7}")
+        fixed = replay(histories, None, BASE_INTERVAL, duration)
+        _report(f"fixed {BASE_INTERVAL:g} s", fixed, fixed["airtime"])
+        suffix = f" (budget {budget:g})" if budget else ""
+        start = time.perf_counter()
+        adaptive = replay(histories, AdaptivePolicy(duration, budget=budget))
+        elapsed = time.perf_counter() - start
+        _report("adaptive, detector" + suffix, adaptive, fixed["airtime"])
+        if predictions is not None:
+            adaptive = replay(histories, AdaptivePolicy(duration, budget=budget), predictions=predictions)
+            _report("adaptive, detector + model" + suffix, adaptive, fixed["airtime"])
+        # A fixed rate spending the same airtime as the (last) adaptive schedule
+        same = BASE_INTERVAL * fixed["airtime"] / max(adaptive["airtime"], 1e-9)
+        _report(f"fixed {same:.1f} s (same airtime)", replay(histories, None, same, duration), fixed["airtime"])
+        print(f"  ({adaptive['tests'] / elapsed:,.0f} policy decisions/s)")
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        args = sys.argv[1:]
+        opt = lambda name, default: type(default)(args[args.index(name) + 1]) if name in args else default
+        benchmark(opt("--csv", "wifi_results.csv"), opt("--targets", 20), opt("--hours", 48),
+                  budget=opt("--budget", 0.0) or None)
+    else:
+        print(__doc__)
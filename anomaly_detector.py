@@ -0,0 +1,143 @@
+import math
+from collections import deque
+import numpy as np
+
+# ----------------- Configuration ----------------- #
+METRICS = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
+THRESHOLD = 2.0     # flag samples more than 2 standard deviations from the mean
+MIN_SAMPLES = 2     # need this many earlier samples before anything is flagged
+
+# -------- Running Statistics -------- #
+class RunningStats:
+    """
+    Welford running mean/std, updated in O(1) per sample.
+
+    window=None     all samples so far
+    window=N        only the last N samples (values leave the window in O(1))
+    halflife=H      exponentially decayed, a sample's weight halves every H samples
+    """
+
+    def __init__(self, window=None, halflife=None):
+        if window is not None and halflife is not None:
+            raise ValueError("use either window or halflife, not both")
+        self.window = window
+        self.alpha = None if halflife is None else 1 - math.exp(-math.log(2) / halflife)
+        self.values = deque() if window else None
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, x):
+        if self.alpha is not None:
+            if self.count == 0:
+                self.mean, self._m2 = x, 0.0
+            else:
+                delta = x - self.mean
+                self.mean += self.alpha * delta
+                self._m2 = (1 - self.alpha) * (self._m2 + self.alpha * delta * delta)
+            self.count += 1
+            return
+
+        if self.values is not None:
+            if len(self.values) == self.window:
+                self._remove(self.values.popleft())
+            self.values.append(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.count == 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self._m2 -= delta * (x - self.mean)
+
+    @property
+    def std(self):
+        if self.alpha is not None:
+            return math.sqrt(max(self._m2, 0.0))
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (self.count - 1))
+
+# -------- Streaming Detector -------- #
+class AnomalyDetector:
+    """
+    2-sigma anomaly detector, one RunningStats per metric.
+
+    Each sample is compared with the statistics of the samples before it and
+    then added to them, so a sample is flagged exactly once, when it arrives.
+    Flagged row indexes are kept in `anomalies[metric]`.
+    """
+
+    def __init__(self, metrics=METRICS, threshold=THRESHOLD, window=None, halflife=None,
+                 min_samples=MIN_SAMPLES):
+        self.metrics = list(metrics)
+        self.threshold = threshold
+        self.window = window
+        self.halflife = halflife
+        self.min_samples = min_samples
+        self.stats = {m: RunningStats(window, halflife) for m in self.metrics}
+        self.anomalies = {m: [] for m in self.metrics}
+        self.rows = 0
+
+    def update(self, sample, row=None):
+        """Ingest one sample (dict of metric -> value); return the metrics it flags"""
+        if row is None:
+            row = self.rows
+        self.rows = row + 1
+        flagged = []
+        for metric in self.metrics:
+            x = sample.get(metric)
+            if x is None or x != x:
+                continue
+            stats = self.stats[metric]
+            std = stats.std
+            if stats.count >= self.min_samples and std > 0 and abs(x - stats.mean) > self.threshold * std:
+                flagged.append(metric)
+                self.anomalies[metric].append(row)
+            stats.push(float(x))
+        return flagged
+
+    def flag_batch(self, df):
+        """
+        Vectorized equivalent of calling update() on every row of df, for
+        backfills. Returns {metric: boolean array aligned with df's rows}.
+        Does not change the detector's own state.
+        """
+        import pandas as pd
+        masks = {}
+        for metric in self.metrics:
+            if metric not in df.columns:
+                continue
+            column = pd.Series(np.asarray(df[metric], dtype=float))
+            values = column.dropna()
+            if self.halflife is not None:
+                ewm = values.ewm(halflife=self.halflife, adjust=False)
+                mean, std = ewm.mean(), np.sqrt(ewm.var(bias=True))
+            elif self.window:
+                rolling = values.rolling(self.window, min_periods=1)
+                mean, std = rolling.mean(), rolling.std()
+            else:
+                expanding = values.expanding()
+                mean, std = expanding.mean(), expanding.std()
+            # Compare each value with the statistics of the values before it; an
+            # undefined (NaN) or zero std flags nothing, as in update()
+            mean, std = mean.shift(1), std.shift(1)
+            seen = np.arange(len(values))
+            count = np.minimum(seen, self.window) if self.window and self.halflife is None else seen
+            std = std.values
+            flagged = (count >= self.min_samples) & (std > 0) & \
+                ((values - mean).abs().values > self.threshold * std)
+            mask = np.zeros(len(column), dtype=bool)
+            mask[values.index.values[flagged]] = True
+            masks[metric] = mask
+        return masks
+
+def flag_anomalies(df, **kwargs):
+    """Batch-flag a results DataFrame with a fresh detector"""
+    return AnomalyDetector(**kwargs).flag_batch(df)
@@ -0,0 +1,148 @@
+"""Score stored results with the degradation model and write predicted_degraded back in place"""
+import os, time
+from collections import deque
+import numpy as np
+from wifi_store import open_store
+from features import FeatureBuilder
+
+# ----------------- Configuration ----------------- #
+CHUNK_ROWS = 1 << 17      # rows per scoring task (~11 MB of float32 features)
+IN_FLIGHT = 2             # tasks queued per worker
+
+# -------- Workers -------- #
+_model = None
+
+def _load(model_file):
+    global _model
+    from model_store import load_model
+    _model = load_model(model_file)
+
+def _score(X):
+    return _model.predict(X).astype(np.int8)
+
+def default_model():
+    """The model live scoring would use: newest published version, else the single file"""
+    from predictor_service import ML_MODEL_FILE, latest_model_file
+    return latest_model_file() or ML_MODEL_FILE
+
+# -------- Time Order -------- #
+def time_ordered(store, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the stored rows as lists of (segment, row offsets, records) pieces,
+    chunk after chunk in timestamp order across segments (compaction and
+    late appends leave the segments overlapping in time). A chunk holds at
+    most chunk_rows rows per segment it overlaps.
+    """
+    store.refresh()
+    segments = [(s["name"], s["rows"], s["sorted"]) for s in store.manifest["segments"]]
+    segments.append((store.manifest["active"], None, False))
+    open_ = []
+    for name, n, is_sorted in segments:
+        data = store._map(name, n)
+        if len(data) == 0:
+            continue
+        order = None if is_sorted else np.argsort(data["timestamp"], kind="stable")
+        ts = data["timestamp"] if is_sorted else data["timestamp"][order]
+        open_.append([name, data, order, ts, 0])
+    while open_:
+        # Every segment gives at most chunk_rows rows older than `cut`
+        open_.sort(key=lambda seg: seg[3][seg[4]])
+        cut = None
+        for name, data, order, ts, pos in open_:
+            if cut is not None and ts[pos] >= cut:
+                break
+            last = int(ts[min(pos + chunk_rows, len(ts)) - 1]) + 1
+            cut = last if cut is None else min(cut, last)
+        pieces = []
+        for seg in open_:
+            name, data, order, ts, pos = seg
+            if ts[pos] >= cut:
+                break
+            end = pos + int(np.searchsorted(np.asarray(ts[pos:pos + chunk_rows]), cut, "left"))
+            rows = np.arange(pos, end) if order is None else order[pos:end]
+            pieces.append((name, rows, np.array(data[pos:end]) if order is None else data[rows]))
+            seg[4] = end
+        open_ = [seg for seg in open_ if seg[4] < len(seg[3])]
+        yield pieces
+
+# -------- Backfill -------- #
+def backfill(store=None, model_file=None, rescore=False, workers=None, chunk_rows=CHUNK_ROWS, quiet=False):
+    """Score unscored rows (every row with `rescore`) and write the predictions back; returns counts"""
+    from concurrent.futures import ProcessPoolExecutor
+    from result_query import ResultQuery
+    store = store if store is not None else open_store(legacy_csv=None)
+    model_file = model_file or default_model()
+    workers = workers or os.cpu_count() or 1
+    _load(model_file)         # fail before any work if the model can't be loaded
+    pool = ProcessPoolExecutor(workers, initializer=_load, initargs=(model_file,)) if workers > 1 else None
+    rollups = getattr(store, "rollups", None)
+    builder = FeatureBuilder()
+    counts = {"rows": 0, "scored": 0, "degraded": 0, "moved": 0}
+    rewritten, pending = set(), deque()
+    start = time.perf_counter()
+
+    def finish(pieces, result):
+        preds = result.result() if pool is not None else result
+        for name, rows, records in pieces:
+            part, preds = preds[:len(rows)], preds[len(rows):]
+            if not store.write_field(name, "predicted_degraded", rows, part):
+                counts["moved"] += len(rows)
+                continue
+            rewritten.add(name)
+            counts["scored"] += len(rows)
+            counts["degraded"] += int(np.count_nonzero(part == 1))
+            if rollups is not None and not rescore:
+                records["predicted_degraded"] = part
+                rollups.add_predictions(records)
+
+    try:
+        for pieces in time_ordered(store, chunk_rows):
+            chunk = np.concatenate([records for _, _, records in pieces])
+            counts["rows"] += len(chunk)
+            # Every row goes through the builder: later rows' windows depend on it
+            X = builder.transform(chunk)
+            need = np.ones(len(chunk), dtype=bool) if rescore else chunk["predicted_degraded"] == -1
+            if not need.any():
+                continue
+            todo, offset = [], 0
+            for name, rows, records in pieces:
+                mask = need[offset:offset + len(rows)]
+                offset += len(rows)
+                if mask.any():
+                    todo.append((name, rows[mask], records[mask]))
+            X = X[need].astype(np.float32)
+            result = pool.submit(_score, X) if pool is not None else _score(X)
+            pending.append((todo, result))
+            while len(pending) > (IN_FLIGHT * workers if pool is not None else 0):
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    # Zone maps keep the max predicted_degraded per block; rebuild them lazily
+    query = ResultQuery(store, auto_index=False)
+    for name in rewritten:
+        query.invalidate(name)
+    if rescore and rollups is not None and rewritten:
+        # Predicted counts can't be decremented in place: recount them from the raw rows
+        rollups.rebuild(store)
+    counts["seconds"] = time.perf_counter() - start
+    if not quiet:
+        rate = counts["rows"] / max(counts["seconds"], 1e-9)
+        print(f"✅ Scored {counts['scored']:,} of {counts['rows']:,} rows ({counts['degraded']:,} degraded) "
+              f"with {os.path.basename(model_file)} in {counts['seconds']:.1f} s "
+              f"({rate:,.0f} rows/s, {workers} worker{'s' * (workers > 1)})")
+        if counts["moved"]:
+            print(f"⚠️ {counts['moved']:,} rows were moved by a compaction during the run; run again to score them")
+    return counts
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Score stored results and write predicted_degraded back")
+    parser.add_argument("--rescore", action="store_true", help="overwrite existing predictions too")
+    parser.add_argument("--workers", type=int, help="scoring processes (default: one per CPU)")
+    parser.add_argument("--model", help="model file or version stem (default: the newest published one)")
+    args = parser.parse_args()
+    backfill(model_file=args.model, rescore=args.rescore, workers=args.workers)
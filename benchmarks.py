@@ -0,0 +1,531 @@
+"""
+Benchmark suite for the framework's own hot paths.
+
+Builds synthetic result histories (1k .. 10M rows) in a scratch directory,
+times every stage a test result goes through (ingest, per-sample append,
+reads, anomaly detection, features, prediction, rollups, report/PDF) plus the legacy
+CSV and per-sample sklearn paths for comparison, and records peak Python
+heap per stage with tracemalloc. A fake iperf3 binary and loopback probes
+stand in for the network.
+
+    python benchmarks.py [--sizes 1k,100k,1M,10M] [--stages ingest,read_frame]
+    python benchmarks.py --save-baseline          # store this machine's numbers
+    python benchmarks.py                          # ... later: flags regressions (exit 1)
+
+Results are written as JSON (--out); when the baseline file exists every
+stage is compared against it.
+"""
+import os, sys, json, time, shutil, socket, asyncio, platform, tempfile, tracemalloc, subprocess
+import numpy as np
+
+RESULTS_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+DEFAULT_SIZES = "1k,100k,1M"
+TOLERANCE = 0.25          # slower (or bigger) than baseline by more than this fraction is a regression
+NOISE_FLOOR = 0.005       # ... and by more than this many seconds or the stage's run-to-run spread
+MEMORY_FLOOR = 1.0        # ... peak heap: and by more than this many MB
+REPEAT = 5                # runs per stage; the median is kept
+LARGE_REPEAT = 3          # runs per stage at >= 1M rows
+LEGACY_MAX_ROWS = 1_000_000
+CHUNK_ROWS = 1 << 16
+TARGETS = 4
+COORD_WORKERS = 4         # coordinator_ingest: worker processes ...
+COORD_ROWS = 50_000       # ... each pushing this many results
+APPEND_PRODUCERS = 4      # multi_append_*: producer processes ...
+APPEND_ROWS = 2000        # ... each appending this many single records
+
+FAKE_IPERF = r'''#!/usr/bin/env python3
+import json, random, sys
+if "--version" in sys.argv:
+    print("iperf 3.9"); sys.exit(0)
+args = sys.argv
+t = int(args[args.index("-t") + 1]) if "-t" in args else 5
+P = int(args[args.index("-P") + 1]) if "-P" in args else 1
+bps = random.gauss(6e8, 1e8)
+intervals = []
+for i in range(t):
+    streams = [{"socket": 5 + s, "start": i, "end": i + 1.0, "seconds": 1.0, "bytes": int(bps / 8 / P),
+                "bits_per_second": bps / P, "retransmits": random.randint(0, 3), "rtt": random.randint(50, 300),
+                "omitted": False, "sender": True} for s in range(P)]
+    intervals.append({"streams": streams, "sum": {"start": i, "end": i + 1.0, "bytes": int(bps / 8),
+                      "bits_per_second": bps, "retransmits": 1, "sender": True}})
+print(json.dumps({"start": {"timestamp": {"timesecs": 0}}, "intervals": intervals, "end": {
+    "streams": [{"sender": {"mean_rtt": random.uniform(50, 200)}, "jitter_ms": 0.1, "lost_percent": 0}],
+    "sum_sent": {"bits_per_second": bps, "retransmits": 0}, "sum_received": {"bits_per_second": bps}}}, indent=1))
+'''
+
+# -------- Synthetic Data -------- #
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+def synthetic_records(n, start_row=0, seed=0, targets=TARGETS):
+    """n RESULT_DTYPE rows: one test every 5 s on each of `targets` targets, with degraded stretches"""
+    from wifi_store import RESULT_DTYPE, ANOMALY_FLAGS
+    rng = np.random.default_rng(seed + start_row)
+    rows = np.arange(start_row, start_row + n)
+    rec = np.zeros(n, dtype=RESULT_DTYPE)
+    rec["timestamp"] = np.datetime64("2024-01-01", "ns").astype(np.int64) + rows // targets * 5_000_000_000
+    rec["target"] = rows % targets
+    degraded = rng.random(n) < 0.05
+    rec["throughput_mbps"] = rng.gamma(4.0, 60.0, n) * np.where(degraded, 0.3, 1.0)
+    rec["latency_ms"] = rng.gamma(2.0, 8.0, n) + np.where(degraded, 60.0, 0.0)
+    rec["jitter_ms"] = rng.gamma(1.5, 1.0, n)
+    rec["lost_percent"] = rng.gamma(0.5, 1.0, n) + np.where(degraded, 6.0, 0.0)
+    rec["retransmits"] = rng.poisson(2, n)
+    rec["flags"] = np.where(rng.random(n) < 0.01, ANOMALY_FLAGS["latency_ms"], 0)
+    rec["predicted_degraded"] = degraded
+    return rec
+
+def synthetic_store(path, n, targets=TARGETS, rollups=True):
+    """A fresh store filled with n rows the way ingest appends them (rollups attached unless told not to)"""
+    from wifi_store import ResultStore
+    from rollups import attach
+    shutil.rmtree(path, ignore_errors=True)
+    store = ResultStore(path)
+    for t in range(targets):
+        store.target_id(f"10.0.{t // 256}.{t % 256}:5201")
+    if rollups:
+        attach(store)
+    for start in range(0, n, CHUNK_ROWS):
+        store.append_records(synthetic_records(min(CHUNK_ROWS, n - start), start, targets=targets))
+    return store
+
+def train_models(n_rows=20_000):
+    """A repo-sized sklearn forest and its FlatForest copy"""
+    from sklearn.ensemble import RandomForestClassifier
+    from predictor_service import FlatForest
+    from online_training import label_chunk
+    X, y = label_chunk(synthetic_records(n_rows, seed=1), {})
+    clf = RandomForestClassifier(n_estimators=100, random_state=42).fit(X, y)
+    return clf, FlatForest.from_sklearn(clf)
+
+def features_per_row(records):
+    """features.FeatureBuilder's matrix built one row at a time (what a naive live scorer would do)"""
+    import warnings
+    from collections import deque
+    from predictor_service import FEATURES
+    from features import FEATURE_NAMES, WINDOW, HALFLIFE, QUANTILE, DAY_NS
+    X = np.zeros((len(records), len(FEATURE_NAMES)))
+    alpha = 1 - np.exp(np.log(0.5) / HALFLIFE)
+    windows, ewms = {}, {}
+    for i, r in enumerate(records):
+        values = np.array([r[f] for f in FEATURES], dtype=np.float64)
+        window = windows.setdefault(int(r["target"]), deque(maxlen=WINDOW))
+        prev = ewms.get(int(r["target"]))
+        if prev is None:
+            prev = np.full(len(FEATURES), np.nan)
+        ewm = np.where(np.isnan(prev), values, np.where(np.isnan(values), prev, (1 - alpha) * prev + alpha * values))
+        ewms[int(r["target"])] = ewm
+        delta = values - window[-1] if window else np.full(len(FEATURES), np.nan)
+        window.append(values)
+        w = np.array(window)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")     # all-NaN windows
+            std = np.nanstd(w, axis=0, ddof=1) if len(w) > 1 else np.full(len(FEATURES), np.nan)
+            p90 = np.nanquantile(w, QUANTILE, axis=0)
+        angle = (int(r["timestamp"]) % DAY_NS) * (2 * np.pi / DAY_NS)
+        X[i] = np.concatenate([values, ewm, delta, std, p90, [np.sin(angle), np.cos(angle)]])
+    X[np.isnan(X)] = 0.0
+    return X
+
+# -------- Measurement -------- #
+def measure(func, repeat=REPEAT, memory=True, setup=None):
+    """(wall seconds of each of `repeat` runs, peak traced MB of one extra run or None); func(setup()) if setup"""
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        # Separate run: tracing slows allocation-heavy code and would skew the timings
+        args = (setup(),) if setup else ()
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return times, peak
+
+class Suite:
+    """Runs the stages, collecting one result per (stage, rows)"""
+
+    def __init__(self, workdir, stages=None, repeat=REPEAT, memory=True):
+        self.workdir = workdir
+        self.stages = stages
+        self.repeat = repeat
+        self.memory = memory
+        self.results = []
+
+    def run(self, stage, rows, ops, func, repeat=None, setup=None):
+        """Time func() (func(setup()), setup untimed); `ops` items are processed per call (for per-op cost)"""
+        if self.stages and stage not in self.stages:
+            return None
+        repeat = repeat or (min(LARGE_REPEAT, self.repeat) if rows and rows >= 1_000_000 else self.repeat)
+        try:
+            runs, peak = measure(func, repeat, self.memory, setup)
+        except (OSError, ImportError) as e:
+            # e.g. no ICMP permission, reportlab missing
+            print(f"  {stage:<22} {'' if rows is None else rows:>10}  skipped: {e}")
+            self.results.append({"stage": stage, "rows": rows, "skipped": str(e)})
+            return None
+        seconds = float(np.median(runs))
+        result = {"stage": stage, "rows": rows, "ops": ops, "seconds": seconds, "runs": runs,
+                  "per_op_us": seconds / ops * 1e6 if ops else None, "peak_mb": peak}
+        self.results.append(result)
+        per_op = f"{result['per_op_us']:12.3f} us/op" if ops else " " * 18
+        mem = f"{peak:9.1f} MB" if peak is not None else ""
+        print(f"  {stage:<22} {'' if rows is None else rows:>10} {seconds * 1000:12.2f} ms {per_op} {mem}")
+        return result
+
+# -------- Stages -------- #
+def sized_stages(suite, n, models):
+    """Stages whose cost depends on the history size"""
+    import pandas as pd
+    from anomaly_detector import flag_anomalies
+    from rollups import load_report_data
+    from report_render import REPORT_POINTS
+    from features import FeatureBuilder, frame_features
+    path = os.path.join(suite.workdir, "wifi_store")
+    state = {}
+
+    def ingest():
+        state["store"] = synthetic_store(path, n)
+    suite.run("ingest", n, n, ingest, repeat=1)
+    store = state.get("store") or synthetic_store(path, n)
+
+    sample = {"timestamp": "2030-01-01 00:00:00", "throughput_mbps": 200.0, "latency_ms": 12.0,
+              "jitter_ms": 1.0, "lost_percent": 0.1, "anomalies": ["latency_ms"]}
+    suite.run("append_one", n, 1000, lambda: [store.append(sample, target="10.0.0.0:5201") for _ in range(1000)],
+              repeat=1)
+    state["df"] = store.read_frame()
+
+    def read_frame():
+        state["df"] = store.read_frame()
+    suite.run("read_frame", n, n, read_frame)
+    df = state["df"]
+    suite.run("tail_100k", n, min(n, 100_000), lambda: store.tail(100_000))
+    suite.run("detect_batch", n, n, lambda: flag_anomalies(df))
+    suite.run("features_batch", n, n, lambda: frame_features(df))
+    suite.run("features_chunked", n, n, lambda records: [b.transform(records[i:i + CHUNK_ROWS])
+                                                         for b in [FeatureBuilder()] for i in range(0, n, CHUNK_ROWS)],
+              setup=store.read_range)
+    X = frame_features(df)
+    suite.run("predict_batch", n, n, lambda: models[1].predict(X))
+    suite.run("rollup_rebuild", n, n, lambda: store.rollups.rebuild(store))
+    suite.run("report_data", n, n, lambda: load_report_data(store, points=REPORT_POINTS))
+
+    # Indexed queries vs the filtered scan they replace (one target, whole history)
+    from result_query import ResultQuery
+
+    def index_build():
+        shutil.rmtree(os.path.join(store.path, "index"), ignore_errors=True)
+        ResultQuery(store).build_indexes()
+    suite.run("query_index_build", n, n, index_build)
+    ap, t_end = store.target_names()[1], int(store.tail(1)["timestamp"][0]) + 1
+    suite.run("query_target_where", n, n, lambda: ResultQuery(store).select(target=ap, where=["latency_ms > 50"]))
+    suite.run("query_anomalies", n, n, lambda: ResultQuery(store).select(anomalies=True))
+    suite.run("query_last_hour", n, n, lambda: ResultQuery(store).select(start=t_end - 3600 * 10**9, end=t_end))
+
+    def query_scan():
+        tid = store.target_names().index(ap)
+        return sum(int(np.count_nonzero((c["target"] == tid) & (c["latency_ms"] > 50)))
+                   for c in store.iter_chunks(chunk_rows=1 << 22))
+    suite.run("query_scan", n, n, query_scan)
+
+    def report_pdf():
+        import generate_report, io, contextlib
+        shutil.rmtree(os.path.join(suite.workdir, ".report_cache"), ignore_errors=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_report.main(store)
+    suite.run("report_pdf", n, n, report_pdf)
+
+    if n <= LEGACY_MAX_ROWS:
+        # What every save_metrics / load_data did before the result store
+        csv = os.path.join(suite.workdir, "wifi_results.csv")
+        suite.run("legacy_csv_rewrite", n, n, lambda: df.to_csv(csv, index=False))
+        suite.run("legacy_csv_load", n, n, lambda: pd.read_csv(csv, parse_dates=["timestamp"]))
+
+    # Re-score the whole history in place, one process (drops the query indexes, rebuilds rollups)
+    from backfill import backfill
+    from model_store import save_flat
+    model = save_flat(models[1], os.path.join(suite.workdir, "backfill_model.flat"))[:-len(".flat")]
+    suite.run("backfill", n, n, lambda: backfill(store, model, rescore=True, workers=1, quiet=True))
+    store.close()
+
+def fixed_stages(suite, models):
+    """Per-sample stages that don't depend on the history size"""
+    from anomaly_detector import AnomalyDetector
+    from predictor_service import MicroBatchPredictor
+    from iperf_stream import run_iperf_streaming
+    from interval_capture import IntervalCapture
+    from wifi_store import ResultStore, Sample, SampleBuffer, to_records
+    from pipeline import test_pipeline
+    from features import FeatureBuilder
+    clf, forest = models
+    rng = np.random.default_rng(2)
+    samples = [{"throughput_mbps": t, "latency_ms": l, "jitter_ms": j, "lost_percent": p}
+               for t, l, j, p in rng.gamma(2.0, 10.0, (10_000, 4)).tolist()]
+    suite.run("detect_stream", None, len(samples), lambda: [d.update(s) for d in [AnomalyDetector()] for s in samples])
+
+    # Per-call cost of a stage timer, recording and switched off (WIFI_METRICS=0)
+    import instrumentation
+
+    def spans(n=100_000):
+        for _ in range(n):
+            with instrumentation.span("bench"):
+                pass
+    enabled = instrumentation.ENABLED
+    try:
+        for stage, on in (("span_enabled", True), ("span_disabled", False)):
+            instrumentation.ENABLED = on
+            suite.run(stage, None, 100_000, spans)
+    finally:
+        instrumentation.ENABLED = enabled
+
+    # Sample objects (the test loop's results), buffered as records or batched in one call
+    typed = [Sample(None, **s) for s in samples]
+    suite.run("sample_build", None, len(samples), lambda: [Sample(None, **s) for s in samples])
+    suite.run("sample_buffer", None, len(typed), lambda: [b.append(s) for b in [SampleBuffer()] for s in typed])
+    suite.run("sample_to_records", None, len(typed), lambda: to_records(typed))
+
+    features = list(FeatureBuilder().transform(to_records(samples[:1000])))
+    history = synthetic_records(2000, seed=3)
+
+    def per_row_features():
+        if not np.allclose(features_per_row(history), FeatureBuilder().transform(history), rtol=1e-6, atol=1e-6):
+            raise RuntimeError("per-row features differ from FeatureBuilder")
+    suite.run("legacy_features_per_row", None, len(history), per_row_features)
+    predictor = MicroBatchPredictor(forest)
+    suite.run("predict_single", None, len(features), lambda: [predictor.predict(f) for f in features])
+    predictor.close()
+    suite.run("legacy_predict_single", None, 200, lambda: [clf.predict([f]) for f in features[:200]])
+
+    # Model load: the pickle is unpickled into the heap, the .flat copy is mapped (shared between processes)
+    import joblib
+    from model_store import save_flat, load_flat
+    pkl = os.path.join(suite.workdir, "model.pkl")
+    joblib.dump(clf, pkl)
+    flat = save_flat(forest, os.path.join(suite.workdir, "model.flat"))
+    suite.run("model_load_joblib", None, 1, lambda: joblib.load(pkl))
+    suite.run("model_load_flat", None, 1, lambda: load_flat(flat).predict(features[:1]))
+
+    capture = IntervalCapture(ResultStore(os.path.join(suite.workdir, "interval_store")))
+    cmd = ["iperf3", "-c", "127.0.0.1", "-t", "60", "-P", "4", "-J"]
+    suite.run("iperf_parse", None, 5,
+              lambda: [run_iperf_streaming(cmd, on_interval=capture.recorder("127.0.0.1:5201")) for _ in range(5)])
+    capture.flush()
+
+    def probe():
+        from latency_prober import probe_hosts
+        probe_hosts(["127.0.0.1"], count=20, interval=0.005)
+    suite.run("probe_loopback", None, 20, probe)
+
+    def run_pipeline():
+        store = ResultStore(tempfile.mkdtemp(dir=suite.workdir))
+        pipe, _ = test_pipeline(lambda: dict(samples[0], timestamp="2030-01-01 00:00:00"), store,
+                                "127.0.0.1:5201", 0, detector=AnomalyDetector(), count=2000, ui=False)
+        pipe.start().join()
+    suite.run("pipeline", None, 2000, run_pipeline)
+
+    def pipeline_slow_io(count=100, period=0.02, write=0.1, redraw=0.3):
+        # Tests every 20 ms while each write takes 100 ms and each redraw 300 ms: the
+        # schedule must hold (about count * period seconds), every sample stored and drawn
+        store = ResultStore(tempfile.mkdtemp(dir=suite.workdir))
+        append = store.append_records
+        store.append_records = lambda records: (time.sleep(write), append(records))
+        pipe, ui = test_pipeline(lambda: dict(samples[0], timestamp="2030-01-01 00:00:00"), store,
+                                 "127.0.0.1:5201", period, count=count)
+        pipe.start()
+        drawn = 0
+        while (batch := ui.get_batch(timeout=0.1)) is not None:
+            if batch:
+                drawn += len(batch[0])
+                time.sleep(redraw)
+        pipe.join()
+        if len(store) != count or drawn != count:
+            raise RuntimeError(f"pipeline lost samples: {len(store)} stored, {drawn} drawn of {count}")
+    suite.run("pipeline_slow_io", None, 100, pipeline_slow_io, repeat=1)
+
+    def coordinator_ingest():
+        import io, contextlib
+        from load_coordinator import Coordinator, spawn_workers
+        store = ResultStore(tempfile.mkdtemp(dir=suite.workdir))
+        port = free_port()
+        coord = Coordinator(store, "127.0.0.1", port, rounds=COORD_ROWS // 1000, period=0, duration=0,
+                            expect=COORD_WORKERS, lead=1.0)
+        # Workers push 1000-row bursts; the coordinator stops once every worker has drained
+        procs = spawn_workers(COORD_WORKERS, port, ["--burst", "1000"])
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(coord.run(grace=60.0))
+        finally:
+            for p in procs:
+                p.wait()
+            store.close()
+    suite.run("coordinator_ingest", None, COORD_WORKERS * COORD_ROWS, coordinator_ingest, repeat=1)
+    for mode in ("direct+fsync", "direct", "service"):
+        multi_append(suite, mode)
+
+def append_producer(mode, path, producer, rows, ready, go, out):
+    """One producer process: one record per call, like one test result per message"""
+    from wifi_store import ResultStore, RESULT_DTYPE
+    from ingest_service import IngestClient
+    store = ResultStore(path)
+    writer = IngestClient(store) if mode == "service" else store
+    records = np.zeros(rows, dtype=RESULT_DTYPE)
+    records["timestamp"] = producer * rows + np.arange(rows) + 1
+    records["predicted_degraded"] = -1
+    ready.put(producer)
+    go.wait()
+    for i in range(rows):
+        writer.append_records(records[i:i + 1])
+        if mode == "direct+fsync":
+            store.sync()
+    out.put(getattr(writer, "direct", 0))
+
+def multi_append(suite, mode, producers=APPEND_PRODUCERS, rows=APPEND_ROWS):
+    """Producer processes appending single records directly (with or without fsync) or through the ingest service"""
+    import multiprocessing
+    from wifi_store import ResultStore
+    from ingest_service import IngestServer
+    ctx = multiprocessing.get_context("spawn")
+
+    def setup():
+        path = tempfile.mkdtemp(dir=suite.workdir)
+        store = ResultStore(path)
+        server = IngestServer(store).start() if mode == "service" else None
+        ready, go, out = ctx.Queue(), ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=append_producer, args=(mode, path, p, rows, ready, go, out))
+                 for p in range(producers)]
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.get()           # started and imported: only the appends are timed
+        return store, server, procs, go, out
+
+    def run(state):
+        store, server, procs, go, out = state
+        go.set()
+        direct = sum(out.get() for _ in procs)
+        for p in procs:
+            p.join()
+        if server is not None:
+            server.wait_for(producers * rows - direct, timeout=60)
+            server.close()
+        stored = np.sort(store.read_range()["timestamp"])
+        store.close()
+        if not np.array_equal(stored, np.arange(producers * rows) + 1):
+            raise RuntimeError(f"{mode}: {len(stored)} of {producers * rows} records stored")
+    suite.run(f"multi_append_{mode.replace('+', '_')}", None, producers * rows, run, setup=setup)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# -------- Baseline -------- #
+def key(result):
+    return f"{result['stage']}@{result['rows']}"
+
+def noise(result):
+    """Run-to-run spread of a stage's timings: 3 median absolute deviations (~2 sigma; 0 for one run)"""
+    runs = np.asarray(result.get("runs") or [result["seconds"]])
+    return 3 * float(np.median(np.abs(runs - np.median(runs))))
+
+def compare(results, baseline, tolerance=TOLERANCE, floor=NOISE_FLOOR, memory_floor=MEMORY_FLOOR):
+    """Print current vs baseline per stage (median time and peak heap); returns the regressed keys"""
+    base = {key(r): r for r in baseline["results"] if "seconds" in r}
+    regressions = []
+    print(f"\n  {'stage@rows':<32} {'baseline ms':>12} {'now ms':>12} {'ratio':>7} {'base MB':>8} {'now MB':>8}")
+    for r in results:
+        b = base.get(key(r))
+        if b is None or "seconds" not in r:
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+        # A stage has to slow down by more than its own spread in either run
+        slower = ratio > 1 + tolerance and r["seconds"] - b["seconds"] > max(floor, noise(b), noise(r))
+        grew = (r.get("peak_mb") is not None and b.get("peak_mb") is not None
+                and r["peak_mb"] > b["peak_mb"] * (1 + tolerance) and r["peak_mb"] - b["peak_mb"] > memory_floor)
+        mark = "  ❌ regression" if slower else ("  ✅ faster" if ratio < 1 - tolerance else "")
+        mark += "  ❌ more memory" if grew else ""
+        mb = lambda x: f"{x['peak_mb']:8.1f}" if x.get("peak_mb") is not None else f"{'':8}"
+        print(f"  {key(r):<32} {b['seconds'] * 1000:12.2f} {r['seconds'] * 1000:12.2f} {ratio:7.2f} "
+              f"{mb(b)} {mb(r)}{mark}")
+        if slower:
+            regressions.append(key(r))
+        if grew:
+            regressions.append(f"{key(r)} (peak heap)")
+    return regressions
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count()}
+
+# -------- Main -------- #
+def main(sizes=DEFAULT_SIZES, stages=None, repeat=REPEAT, memory=True, out=RESULTS_FILE,
+         baseline_file=BASELINE_FILE, save_baseline=False, tolerance=TOLERANCE):
+    import warnings
+    warnings.filterwarnings("ignore")
+    out, baseline_file = os.path.abspath(out), os.path.abspath(baseline_file)
+    workdir = tempfile.mkdtemp(prefix="wifi_bench_")
+    cwd, path = os.getcwd(), os.environ.get("PATH", "")
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir)
+    with open(os.path.join(bindir, "iperf3"), "w") as f:
+        f.write(FAKE_IPERF)
+    os.chmod(os.path.join(bindir, "iperf3"), 0o755)
+    os.environ["PATH"] = bindir + os.pathsep + path
+    suite = Suite(workdir, set(stages.split(",")) if stages else None, repeat, memory)
+    try:
+        # Relative paths (reports, render cache) land in the scratch directory
+        os.chdir(workdir)
+        print(f"  {'stage':<22} {'rows':>10} {'time':>15} {'per op':>18} {'peak heap':>12}")
+        models = train_models()
+        fixed_stages(suite, models)
+        for n in [parse_size(s) for s in sizes.split(",")]:
+            sized_stages(suite, n, models)
+    finally:
+        os.chdir(cwd)
+        os.environ["PATH"] = path
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": environment(), "results": suite.results}
+    with open(out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\n✅ Results written to {out}")
+    if save_baseline:
+        shutil.copyfile(out, baseline_file)
+        print(f"✅ Saved as baseline {baseline_file}")
+        return 0
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            regressions = compare(suite.results, json.load(f), tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the framework's hot paths")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="history sizes, e.g. 1k,100k,1M,10M")
+    parser.add_argument("--stages", help="comma-separated subset of stages")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help=f"runs per stage (the median is kept; at most {LARGE_REPEAT} at >= 1M rows)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--out", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+    sys.exit(main(args.sizes, args.stages, args.repeat, not args.no_memory, args.out, args.baseline,
+                  args.save_baseline, args.tolerance))
@@ -1,9 +1,9 @@
-import subprocess, json
-import pandas as pd
-from datetime import datetime
-import os
+import sys
+from wifi_store import Sample, now_ns
+from ingest_service import default_writer
+from iperf_stream import run_iperf_streaming
 
-def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None):
+def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None, on_interval=None):
     cmd = ["iperf3", "-c", server_ip, "-t", str(duration), "-J", "-p", "5201"]
     if parallel > 1:
         cmd += ["-P", str(parallel)]
@@ -12,36 +12,43 @@ def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, ban
         if bandwidth:
             cmd += ["-b", str(bandwidth)]
 
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr)
-    return json.loads(proc.stdout)
+    # Parsed incrementally: only start/end are kept, intervals go to on_interval
+    return run_iperf_streaming(cmd, on_interval=on_interval)
 
 def extract_metrics(iperf_json):
     end = iperf_json.get("end", {})
     summary = end.get("sum_received") or end.get("sum_sent") or {}
-    return {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "throughput_mbps": summary.get("bits_per_second", 0) / 1e6,
-        "retransmits": summary.get("retransmits"),
-        "lost_percent": summary.get("lost_percent"),
-        "jitter_ms": summary.get("jitter_ms"),
-    }
+    return Sample(now_ns(), throughput_mbps=summary.get("bits_per_second", 0) / 1e6,
+                  retransmits=summary.get("retransmits"), lost_percent=summary.get("lost_percent"),
+                  jitter_ms=summary.get("jitter_ms"))
 
 if __name__ == "__main__":
-    # Run test
-    j = run_iperf_test("127.0.0.1", duration=5, parallel=1, udp=False)
+    # python client_worker.py [--intervals]
+    # python client_worker.py --coordinator HOST[:PORT] [SERVER_IP[:PORT]]
+    # runs the coordinator's synchronized schedule instead of one local test
+    if "--coordinator" in sys.argv:
+        from load_coordinator import run_worker
+        args = sys.argv[1:]
+        coordinator = args.pop(args.index("--coordinator") + 1)
+        args.remove("--coordinator")
+        run_worker(coordinator, args[0] if args else "127.0.0.1:5201")
+        sys.exit(0)
+
+    # Run test; with --intervals (as in wifi_cli run) every interval/stream sample is recorded as it arrives
+    capture = None
+    if "--intervals" in sys.argv:
+        from interval_capture import default_capture
+        capture = default_capture()
+    j = run_iperf_test("127.0.0.1", duration=5, parallel=1, udp=False,
+                       on_interval=capture.recorder("127.0.0.1:5201") if capture else None)
+    if capture:
+        capture.flush()
     metrics = extract_metrics(j)
     print(metrics)
 
-    # Save to CSV
-    file_name = "wifi_results.csv"
-    df = pd.DataFrame([metrics])
-
-    # Append if file exists, else create new
-    if os.path.exists(file_name):
-        df.to_csv(file_name, mode="a", header=False, index=False)
-    else:
-        df.to_csv(file_name, index=False)
+    # Append to the shared result store (through the ingest service when it runs)
+    writer = default_writer()
+    writer.append(metrics, target="127.0.0.1:5201")
+    writer.flush()
 
-    print(f"✅ Results saved to {file_name}")
+    print(f"✅ Results saved to {writer.store.path}/")
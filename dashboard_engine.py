@@ -0,0 +1,194 @@
+import sys, time
+import numpy as np
+
+METRICS = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
+NS_PER_DAY = 86400 * 10**9
+MARKER_POINTS = 200     # draw "o" markers only while a series is this short
+
+# -------- Decimation -------- #
+def minmax_decimate(x, y, buckets):
+    """
+    Keep the min and max of y in each of `buckets` equal-width x buckets.
+    Peaks and dips survive, and the output never exceeds 2 * buckets points.
+    """
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    if len(x) <= 2 * buckets:
+        return x, y
+    edges = np.linspace(x[0], x[-1], buckets + 1)
+    starts = np.searchsorted(x, edges[:-1], "left")
+    starts = np.unique(starts[starts < len(x)])
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    ends = np.append(starts[1:], len(x)) - 1
+    mid = (x[starts] + x[ends]) / 2
+    return np.repeat(mid, 2), np.column_stack([lo, hi]).ravel()
+
+def ns_to_days(timestamps):
+    """int64 ns -> matplotlib date numbers (days since 1970)"""
+    return np.asarray(timestamps, dtype=np.int64) / NS_PER_DAY
+
+# -------- Dashboard -------- #
+class LiveDashboard:
+    """
+    Live metric dashboard that never clears its axes.
+
+    Lines and scatters are created once and marked animated; each update
+    only swaps their data, restores the cached background and blits the
+    artists. Axis limits grow with headroom, so the full (slow) redraw that
+    re-renders ticks and labels only happens when data leaves the view.
+    """
+
+    def __init__(self, metrics=METRICS, nrows=None, ncols=1, figsize=(10, 12), predicted=False):
+        import matplotlib.pyplot as plt
+        self.plt = plt
+        self.metrics = list(metrics)
+        nrows = nrows or len(self.metrics)
+        self.fig, axs = plt.subplots(nrows, ncols, figsize=figsize)
+        self.axs = np.atleast_1d(axs).flatten()
+        self.canvas = self.fig.canvas
+        self.lines, self.anomalies, self.predicted = {}, {}, {}
+        for ax, metric in zip(self.axs, self.metrics):
+            ax.set_title(f"Real-Time Wi-Fi Performance: {metric}")
+            ax.set_xlabel("Time")
+            ax.set_ylabel(metric)
+            ax.xaxis_date()
+            self.lines[metric], = ax.plot([], [], marker="o", label=metric, animated=True)
+            self.anomalies[metric] = ax.scatter([], [], color="red", s=80, label="Anomaly",
+                                                zorder=5, animated=True)
+            if predicted:
+                self.predicted[metric] = ax.scatter([], [], color="orange", s=80,
+                                                    label="Predicted Degradation", zorder=4, animated=True)
+            ax.legend(loc="upper left")
+        self.fig.tight_layout()
+        self._background = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _artists(self):
+        return list(self.lines.values()) + list(self.anomalies.values()) + list(self.predicted.values())
+
+    def _on_draw(self, event):
+        # A full draw just happened (first show, resize, limit change)
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._artists():
+            artist.axes.draw_artist(artist)
+
+    def _fit(self, ax, x, y):
+        """Grow the view with headroom if the data left it; True if limits changed"""
+        if len(x) == 0:
+            return False
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        dx0, dx1 = x[0], x[-1]
+        dy0, dy1 = np.nanmin(y), np.nanmax(y)
+        changed = False
+        if dx0 < x0 or dx1 > x1 or ax.get_autoscalex_on():
+            span = max(dx1 - dx0, 60 / 86400)
+            ax.set_xlim(dx0 - span * 0.02, dx1 + span * 0.25)
+            changed = True
+        if np.isfinite(dy0) and (dy0 < y0 or dy1 > y1 or ax.get_autoscaley_on()):
+            span = max(dy1 - dy0, abs(dy1) * 0.1, 1e-6)
+            ax.set_ylim(dy0 - span * 0.1, dy1 + span * 0.1)
+            changed = True
+        return changed
+
+    def update(self, timestamps, columns, anomalies=None, predicted=None):
+        """
+        timestamps: int64 ns array; columns: {metric: float array};
+        anomalies: {metric: bool mask}; predicted: bool mask
+        """
+        x = ns_to_days(timestamps)
+        relayout = self._background is None
+        for ax, metric in zip(self.axs, self.metrics):
+            y = np.asarray(columns.get(metric, np.full(len(x), np.nan)), dtype=float)
+            width = max(int(ax.bbox.width), 1)
+            xd, yd = minmax_decimate(x, y, width)
+            line = self.lines[metric]
+            line.set_data(xd, yd)
+            line.set_marker("o" if len(xd) <= MARKER_POINTS else "")
+            relayout |= self._fit(ax, xd, yd)
+
+            mask = anomalies.get(metric) if anomalies else None
+            self.anomalies[metric].set_offsets(
+                np.column_stack([x[mask], y[mask]]) if mask is not None and mask.any() else np.empty((0, 2)))
+            if metric in self.predicted:
+                self.predicted[metric].set_offsets(
+                    np.column_stack([x[predicted], y[predicted]]) if predicted is not None and predicted.any()
+                    else np.empty((0, 2)))
+
+        if relayout:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            for artist in self._artists():
+                artist.axes.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+
+    def update_records(self, records, anomaly_flags=None):
+        """Update from store records (structured array with a flags field)"""
+        columns = {m: records[m] for m in self.metrics}
+        anomalies = None
+        if anomaly_flags:
+            anomalies = {m: (records["flags"] & anomaly_flags[m]) != 0 for m in self.metrics}
+        predicted = records["predicted_degraded"] == 1 if self.predicted else None
+        self.update(records["timestamp"], columns, anomalies, predicted)
+
+    def pump(self, seconds=0.01):
+        """Let the GUI process events without forcing a full redraw (unlike plt.pause)"""
+        self.canvas.flush_events()
+        self.canvas.start_event_loop(seconds)
+
+    def run(self, callback, interval=2000):
+        """Call callback() every `interval` ms and show the window"""
+        timer = self.canvas.new_timer(interval=interval)
+        timer.add_callback(callback)
+        timer.start()
+        self._timer = timer
+        self.plt.show()
+
+# -------- Headless Benchmark -------- #
+def _legacy_frame(axs, x, columns):
+    # What the scripts used to do every frame
+    for ax, metric in zip(axs, METRICS):
+        ax.clear()
+        ax.set_title(f"Real-Time Wi-Fi Performance: {metric}")
+        ax.plot(x, columns[metric], marker="o", label=metric)
+        ax.legend()
+    axs[0].figure.canvas.draw()
+
+def benchmark(sizes=(1_000, 100_000, 1_000_000), frames=20, legacy_limit=100_000):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    rng = np.random.default_rng(0)
+    print(f"{'samples':>10} {'blit fps':>10} {'legacy fps':>11}")
+    for n in sizes:
+        ts = np.int64(1.7e18) + np.arange(n, dtype=np.int64) * 5 * 10**9
+        columns = {m: rng.gamma(2.0, 10.0, n) for m in METRICS}
+        anomalies = {m: rng.random(n) < 0.001 for m in METRICS}
+
+        dash = LiveDashboard(figsize=(10, 12))
+        dash.update(ts, columns, anomalies)       # first full draw
+        start = time.perf_counter()
+        for _ in range(frames):
+            dash.update(ts, columns, anomalies)
+        blit_fps = frames / (time.perf_counter() - start)
+        plt.close(dash.fig)
+
+        legacy_fps = float("nan")
+        if n <= legacy_limit:
+            fig, axs = plt.subplots(len(METRICS), 1, figsize=(10, 12))
+            x = ts.astype("datetime64[ns]")
+            legacy_frames = max(1, frames // 4)
+            start = time.perf_counter()
+            for _ in range(legacy_frames):
+                _legacy_frame(axs, x, columns)
+            legacy_fps = legacy_frames / (time.perf_counter() - start)
+            plt.close(fig)
+        print(f"{n:>10} {blit_fps:>10.1f} {legacy_fps:>11.2f}")
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        print("usage: python dashboard_engine.py --bench")
@@ -1,84 +1,228 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-import io
-import os
+import io, os, shutil, sys, tempfile
 from datetime import datetime
 import numpy as np
+from wifi_store import default_store, to_ns
+from rollups import load_report_data
+from report_render import render_metric_plots, REPORT_POINTS, CACHE_DIR
 
-# -------- Load Data -------- #
-file_name = "wifi_results.csv"
-df = pd.read_csv(file_name)
-df["timestamp"] = pd.to_datetime(df["timestamp"])
+metrics = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
 
-# -------- Anomaly Detection -------- #
-def detect_anomalies(series):
-    if len(series) < 2:
-        return []
-    mean = series.mean()
-    std = series.std()
-    return series[(series - mean).abs() > 2 * std]
+# ----------------- Streaming Mode ----------------- #
+DAY = 86400 * 1_000_000_000
+STREAM_CHUNK_ROWS = 1 << 18   # raw rows held at once (~7.6 MB)
+SECTION_SPLIT_DAYS = 2        # "auto" sections: per day above this span, else per target
+RENDER_BATCH = 8              # section pages rendered (in parallel) before their images leave memory
+SECTION_POINTS = REPORT_POINTS // 2   # buckets per section panel (two panels per row)
 
-metrics = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
+def _summary_lines(summary):
+    for metric in metrics:
+        s = summary[metric]
+        yield (f"{metric}: mean={s['mean']:.2f}, min={s['min']:.2f}, max={s['max']:.2f}, "
+               f"p50={s['p50']:.2f}, p99={s['p99']:.2f}, anomalies={int(s['anomalies'])}")
+
+def _canvas(pdf_name):
+    from reportlab import rl_config
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    # Binary image streams: without rl_accel, reportlab's ASCII85 encoder is pure Python
+    rl_config.useA85 = 0
+    return canvas.Canvas(pdf_name, pagesize=A4)
+
+def main(store=None, pdf_name=None, predicted=False, cache_dir=CACHE_DIR):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+
+    # -------- Load Data + Anomaly Detection -------- #
+    # Long histories come from the coarsest rollup level with REPORT_POINTS
+    # buckets; short ones from the raw rows and the detector
+    df, masks, summary = load_report_data(store if store is not None else default_store(), metrics,
+                                          points=REPORT_POINTS)
+
+    # -------- Generate Plots as Images -------- #
+    # Downsampled, rendered in parallel and cached across runs
+    plot_images = [io.BytesIO(png) for _, png in render_metric_plots(df, metrics, masks, predicted=predicted,
+                                                                       cache_dir=cache_dir)]
+
+    # -------- Create PDF -------- #
+    pdf_name = pdf_name or f"wifi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    c = _canvas(pdf_name)
+    width, height = A4
+
+    # Title
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(width/2, height-50, "Wi-Fi Performance Report")
+
+    # Summary Table
+    c.setFont("Helvetica", 12)
+    y = height - 100
+    c.drawString(50, y, "Summary of Tests:")
+    y -= 20
+    if predicted:
+        c.drawString(60, y, f"{summary['rows']} tests, {summary['predicted']} predicted degraded")
+        y -= 15
 
-# -------- Generate Plots as Images -------- #
-plot_images = []
-for metric in metrics:
-    if metric in df.columns:
-        plt.figure(figsize=(8,4))
-        plt.plot(df["timestamp"], df[metric], marker="o", label=metric)
-
-        anomalies = detect_anomalies(df[metric].dropna())
-        if len(anomalies) > 0:
-            anomaly_points = df.loc[df[metric].isin(anomalies)]
-            plt.scatter(anomaly_points["timestamp"], anomaly_points[metric],
-                color="red", s=80, label="Anomaly")
-
-
-        plt.title(f"Wi-Fi Performance: {metric}")
-        plt.xlabel("Time")
-        plt.ylabel(metric)
-        plt.xticks(rotation=45)
-        plt.legend()
-        plt.tight_layout()
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close()
-        buf.seek(0)
-        plot_images.append(buf)
-
-# -------- Create PDF -------- #
-pdf_name = f"wifi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-c = canvas.Canvas(pdf_name, pagesize=A4)
-width, height = A4
-
-# Title
-c.setFont("Helvetica-Bold", 18)
-c.drawCentredString(width/2, height-50, "Wi-Fi Performance Report")
-
-# Summary Table
-c.setFont("Helvetica", 12)
-y = height - 100
-c.drawString(50, y, "Summary of Tests:")
-y -= 20
-
-for metric in metrics:
-    if metric in df.columns:
-        mean_val = df[metric].mean()
-        max_val = df[metric].max()
-        min_val = df[metric].min()
-        anomaly_count = len(detect_anomalies(df[metric]))
-        line = f"{metric}: mean={mean_val:.2f}, min={min_val:.2f}, max={max_val:.2f}, anomalies={anomaly_count}"
+    for line in _summary_lines(summary):
         c.drawString(60, y, line)
         y -= 15
 
-# Insert Plots
-for img in plot_images:
-    c.showPage()
-    c.drawImage(ImageReader(img), 50, 150, width-100, height-300)
+    # Insert Plots
+    for img in plot_images:
+        c.showPage()
+        c.drawImage(ImageReader(img), 50, 150, width-100, height-300)
+
+    c.save()
+    print(f"✅ PDF report generated: {pdf_name}")
+
+def stream_report(store=None, start=None, end=None, sections="auto", pdf_name=None, cache_dir=CACHE_DIR):
+    """
+    Report for histories of any length in bounded memory.
+
+    Raw rows are read STREAM_CHUNK_ROWS at a time and folded into
+    rollups.StreamingStats (bucket min/max/mean, sketch p50/p99, stored
+    anomaly flags; vectorized per chunk), so no DataFrame of the history is ever built. Sections
+    are per day (each day read on its own) or per target, with one page per
+    section showing its summary and a grid of all metrics. Section images are
+    rendered into the cache as they complete (by one worker pool for the
+    whole report) and drawn one page at a time, so memory grows with
+    targets and pages, never with rows.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from reportlab.lib.pagesizes import A4
+    from rollups import StreamingStats
+    from report_render import bucket_job, render_plots, render_section, section_key
+
+    store = store if store is not None else default_store()
+    span = store.time_range()
+    lo = None if span is None else span[0] if start is None else max(span[0], to_ns(start))
+    hi = None if span is None else span[1] + 1 if end is None else min(span[1] + 1, to_ns(end))
+    if span is None or lo >= hi:
+        print("⚠️ No results in range")
+        return None
+    names = store.target_names()
+    if sections == "auto":
+        sections = "day" if hi - lo > SECTION_SPLIT_DAYS * DAY else "target" if len(names) > 1 else "none"
+    own_cache = cache_dir is None
+    if own_cache:
+        cache_dir = tempfile.mkdtemp(prefix="wifi_report_")
+
+    width = max(1, (hi - lo) // SECTION_POINTS)
+    overall = StreamingStats(width, by_target=sections == "target")
+    pages, batch = [], []     # pages: [title, summary, image path]; images stay on disk
+    workers = os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    def render_batch():
+        paths = render_plots([job for job, _ in batch], workers=workers, cache_dir=cache_dir,
+                             render=render_section, key=section_key, load=False, pool=pool)
+        for (_, page), path in zip(batch, paths):
+            page[2] = path
+        batch.clear()
+
+    def add_section(title, stats, bucket_width, target=None):
+        rows = stats.rows(target)
+        panels = [bucket_job(m, rows, bucket_width, predicted=True) for m in metrics]
+        page = [title, stats.summary(metrics, target), None]
+        pages.append(page)
+        batch.append(({"title": title, "panels": panels}, page))
+        if len(batch) >= RENDER_BATCH:
+            render_batch()
+
+    try:
+        if sections == "day":
+            for day in range(lo // DAY * DAY, hi, DAY):
+                stats = StreamingStats(DAY // SECTION_POINTS)
+                for chunk in store.iter_chunks(max(day, lo), min(day + DAY, hi), chunk_rows=STREAM_CHUNK_ROWS):
+                    stats.add(chunk)
+                    overall.add(chunk)
+                if len(stats.totals):
+                    add_section(str(np.datetime64(day, "ns"))[:10], stats, DAY // SECTION_POINTS)
+        else:
+            for chunk in store.iter_chunks(lo, hi, chunk_rows=STREAM_CHUNK_ROWS):
+                overall.add(chunk)
+            if sections == "target":
+                for t in overall.targets():
+                    add_section(names[t] if t < len(names) else f"target {t}", overall, width, t)
+        add_section("All results", overall, width)
+        render_batch()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    pages.insert(0, pages.pop())
+
+    pdf_name = pdf_name or f"wifi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    c = _canvas(pdf_name)
+    page_width, height = A4
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(page_width/2, height-50, "Wi-Fi Performance Report")
+    c.setFont("Helvetica", 11)
+    first, last = (str(np.datetime64(t, "ns"))[:16].replace("T", " ") for t in (lo, hi - 1))
+    note = f"{first} to {last}" + (f", {len(pages) - 1} {sections} sections" if sections != "none" else "")
+    c.drawCentredString(page_width/2, height-70, note)
+    for i, (title, summary, path) in enumerate(pages):
+        y = height - 105
+        if i:
+            c.showPage()
+            y = height - 50
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, y, title)
+        c.setFont("Helvetica", 9)
+        y -= 18
+        c.drawString(60, y, f"{summary['rows']} tests, {summary['predicted']} predicted degraded")
+        for line in _summary_lines(summary):
+            y -= 12
+            c.drawString(60, y, line)
+        c.drawImage(path, 30, 40, page_width - 60, y - 60, preserveAspectRatio=True, anchor="n")
+    c.save()
+    if own_cache:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"✅ PDF report generated: {pdf_name} ({overall.summary(metrics)['rows']} tests, {len(pages)} pages)")
+    return pdf_name
+
+# -------- Benchmark -------- #
+def benchmark(sizes=(1_000_000, 4_000_000, 16_000_000), raw_max=4_000_000):
+    """Peak RSS and time of the streamed report vs the in-memory one (raw rows, no rollups, no image cache)"""
+    import subprocess
+    from benchmarks import synthetic_store, TARGETS
+    child = ("import resource, sys, time, generate_report as g; from wifi_store import ResultStore; "
+             "t = time.perf_counter(); store = ResultStore(sys.argv[1]); "
+             "g.stream_report(store, pdf_name=sys.argv[2], cache_dir=None) if sys.argv[3] == 'stream' "
+             "else g.main(store, pdf_name=sys.argv[2], cache_dir=None); "
+             "rss = max(resource.getrusage(w).ru_maxrss for w in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)); "
+             "print('BENCH', time.perf_counter() - t, rss)")
+    print(f"{TARGETS} targets, one test per 5 s each; report from raw rows\n")
+    print(f"  {'rows':>11} {'days':>5} {'mode':<7} {'seconds':>8} {'peak RSS MB':>12} {'PDF KB':>7}")
+    for n in sizes:
+        path = tempfile.mkdtemp(prefix="report_bench_", dir=".")
+        store = synthetic_store(path, n, rollups=False)
+        days = (store.time_range()[1] - store.time_range()[0]) / DAY
+        store.close()
+        for mode in ("stream", "memory"):
+            if mode == "memory" and n > raw_max:
+                print(f"  {n:>11,} {days:>5.0f} {mode:<7} {'skipped (> %d rows)' % raw_max:>29}")
+                continue
+            pdf = os.path.join(path, "report.pdf")
+            out = subprocess.run([sys.executable, "-c", child, path, pdf, mode], capture_output=True, text=True)
+            line = [l for l in out.stdout.splitlines() if l.startswith("BENCH")]
+            if not line:
+                print(f"  {n:>11,} {days:>5.0f} {mode:<7} failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            seconds, rss = line[0].split()[1:]
+            print(f"  {n:>11,} {days:>5.0f} {mode:<7} {float(seconds):>8.1f} {int(rss) / 1024:>12.0f} "
+                  f"{os.path.getsize(pdf) / 1024:>7.0f}")
+        shutil.rmtree(path)
 
-c.save()
-print(f"✅ PDF report generated: {pdf_name}")
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="PDF report of stored results")
+    parser.add_argument("--stream", action="store_true",
+                        help="read raw rows in chunks with bounded memory, one page per section")
+    parser.add_argument("--sections", choices=["auto", "day", "target", "none"], default="auto",
+                        help="with --stream: per-day or per-target pages (auto: per day above 2 days)")
+    parser.add_argument("--bench", action="store_true", help="peak memory of --stream vs the in-memory report")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark()
+    elif args.stream:
+        stream_report(sections=args.sections)
+    else:
+        main()
@@ -0,0 +1,327 @@
+"""Single-writer ingestion: producers stream records over <store>/ingest.sock and one thread group-commits them"""
+import argparse, os, selectors, socket, sys, threading, time
+import numpy as np
+from wifi_store import STORE_DIR, open_store, default_store
+
+# ----------------- Configuration ----------------- #
+SOCKET_NAME = "ingest.sock"     # inside the store directory
+MAGIC = b"WRS1"                 # a connection = MAGIC | RESULT_DTYPE records ...
+RECV_BUFFER = 256 * 1024
+SEND_TIMEOUT = 0.5              # seconds a producer waits for buffer room before writing directly
+MAX_PENDING = 1_000_000         # rows held in memory before the receiver stops reading
+RETRY_DELAY = 1.0               # seconds between attempts after a failed commit
+FLUSH_TIMEOUT = 10.0            # seconds IngestClient.flush waits for the commit
+
+# Rows are lost only if the service crashes between accepting and committing them
+# (one commit plus the socket buffers) or a producer dies mid-record (the partial
+# record is dropped). A commit torn by a machine crash fails its CRC and is cut off.
+
+# -------- Service -------- #
+class _Connection:
+    def __init__(self):
+        self.checked = False    # MAGIC seen
+        self.tail = b""         # start of a record whose remaining bytes have not arrived yet
+
+class IngestServer:
+    """Receives record streams from producers and appends them with one group-commit writer"""
+
+    def __init__(self, store=None, path=None):
+        self.store = store if store is not None else open_store(legacy_csv=None)
+        self.store.durable = True
+        self.path = path or os.path.join(self.store.path, SOCKET_NAME)
+        self.rows = self.commits = self.max_batch = 0
+        self.connections = self.rejected = self.torn = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._enqueued = 0
+        self._finishing = []     # (rows enqueued when it hit EOF, connection): closed once committed
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._received = False
+
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise RuntimeError(f"an ingest service is already listening on {self.path}")
+            except ConnectionRefusedError:
+                os.unlink(self.path)     # left behind by a service that died
+            finally:
+                probe.close()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(64)
+        self.sock.setblocking(False)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._receiver = threading.Thread(target=self._receive_loop, name="ingest-recv", daemon=True)
+        self._writer = threading.Thread(target=self._commit_loop, name="ingest-commit", daemon=True)
+
+    def start(self):
+        self._receiver.start()
+        self._writer.start()
+        return self
+
+    def _receive_loop(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.sock, selectors.EVENT_READ)
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        conns = {}
+        buf = bytearray(RECV_BUFFER)
+        view = memoryview(buf)
+        itemsize = self.store.dtype.itemsize
+        while conns or not self._stopping:
+            chunks, finished = [], []
+            for key, _ in sel.select():
+                sock = key.fileobj
+                if sock is self._wake_r:
+                    # close(): stop accepting; producers' next send fails and they write directly,
+                    # while everything already buffered is still read below
+                    sel.unregister(self._wake_r)
+                    sel.unregister(self.sock)
+                    self.sock.close()
+                    for conn in conns:
+                        conn.shutdown(socket.SHUT_RD)
+                    continue
+                if sock is self.sock:
+                    try:
+                        conn, _ = sock.accept()
+                    except BlockingIOError:
+                        continue
+                    conn.setblocking(False)
+                    sel.register(conn, selectors.EVENT_READ)
+                    conns[conn] = _Connection()
+                    self.connections += 1
+                    continue
+                state = conns[sock]
+                try:
+                    n = sock.recv_into(buf)
+                except BlockingIOError:
+                    continue
+                except ConnectionResetError:
+                    n = 0
+                if n == 0:
+                    # The producer is done (or flushing): close our end once its rows are on disk
+                    self.torn += bool(state.tail)
+                    sel.unregister(sock)
+                    del conns[sock]
+                    finished.append(sock)
+                    continue
+                data = state.tail + view[:n] if state.tail else bytes(view[:n])
+                if not state.checked:
+                    if len(data) < len(MAGIC):
+                        state.tail = data
+                        continue
+                    if data[:len(MAGIC)] != MAGIC:
+                        self.rejected += 1
+                        sel.unregister(sock)
+                        sock.close()
+                        del conns[sock]
+                        continue
+                    state.checked = True
+                    data = data[len(MAGIC):]
+                whole = len(data) - len(data) % itemsize
+                state.tail = data[whole:]
+                if whole:
+                    chunks.append(data[:whole])
+            if chunks or finished:
+                rows = sum(len(c) for c in chunks) // itemsize
+                with self._cond:
+                    while self._pending_rows >= MAX_PENDING:
+                        self._cond.wait()
+                    self._pending += chunks
+                    self._pending_rows += rows
+                    self._enqueued += rows
+                    self._finishing += [(self._enqueued, sock) for sock in finished]
+                    self._close_committed()
+                    self._cond.notify_all()
+        sel.close()
+        with self._cond:
+            self._received = True
+            self._cond.notify_all()
+
+    def _commit_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._received:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                chunks, self._pending = self._pending, []
+            records = np.frombuffer(b"".join(chunks), dtype=self.store.dtype)
+            while True:
+                try:
+                    self.store.append_records(records)
+                    self.store.sync()
+                    break
+                except OSError as e:
+                    print(f"❌ commit of {len(records)} rows failed ({e}); retrying")
+                    time.sleep(RETRY_DELAY)
+            with self._cond:
+                self._pending_rows -= len(records)
+                self.rows += len(records)
+                self.commits += 1
+                self.max_batch = max(self.max_batch, len(records))
+                self._close_committed()
+                self._cond.notify_all()
+
+    def _close_committed(self):
+        """Close finished connections whose rows are all committed (called holding _cond)"""
+        done = [sock for rows, sock in self._finishing if rows <= self.rows]
+        if done:
+            self._finishing = [(rows, sock) for rows, sock in self._finishing if rows > self.rows]
+            for sock in done:
+                sock.close()
+
+    def wait_for(self, rows, timeout=None):
+        """Block until `rows` rows in total have been committed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.rows < rows:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def close(self):
+        """Stop accepting, commit everything producers already handed over, then return"""
+        # Unlinked first: from here on producers fall back to direct appends
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._stopping = True
+        self._wake_w.send(b"x")
+        if self._receiver.is_alive():
+            self._receiver.join()
+            self._writer.join()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def serve_forever(self):
+        self.start()
+        print(f"📥 Ingest service writing to {self.store.path}/ via {self.path}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+            print(f"✅ {self.rows} rows in {self.commits} commits from {self.connections} connections "
+                  f"({self.torn} torn, {self.rejected} rejected)")
+
+# -------- Producers -------- #
+class IngestClient:
+    """Store-shaped writer (append / append_records / target_id): to the ingest service, or directly without one"""
+
+    def __init__(self, store=None, path=None, timeout=SEND_TIMEOUT):
+        self.store = store if store is not None else default_store()
+        self.path = path or os.path.join(self.store.path, SOCKET_NAME)
+        self.dtype = self.store.dtype
+        self.timeout = timeout
+        self.sent = self.direct = 0
+        self._sock = None
+        self._lock = threading.Lock()   # one record stream per process, shared by its threads
+        self._warned = False
+
+    def target_id(self, target):
+        return self.store.target_id(target)
+
+    def make_record(self, metrics, target=None, test_type="tcp"):
+        return self.store.make_record(metrics, target, test_type)
+
+    def tail(self, n):
+        """Reads go straight to the store (records still in flight are not in it yet)"""
+        return self.store.tail(n)
+
+    def append(self, metrics, target=None, test_type="tcp"):
+        self.append_records(self.make_record(metrics, target, test_type))
+
+    def append_records(self, records):
+        records = np.ascontiguousarray(records, dtype=self.dtype)
+        if len(records) == 0:
+            return
+        data = memoryview(records.tobytes())
+        with self._lock:
+            sent = 0
+            try:
+                if self._sock is None:
+                    self._connect()
+                while sent < len(data):
+                    sent += self._sock.send(data[sent:])
+            except OSError as e:
+                # No service, a stale socket, a stopped service (EPIPE) or a full buffer (timeout).
+                # The service drops a record it got only part of, so resend from that record on.
+                self._disconnect()
+                done = sent // self.dtype.itemsize
+                self.sent += done
+                self._append_direct(records[done:], e)
+                return
+            self.sent += len(records)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(MAGIC)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait until the service has committed everything sent so far (the next append reconnects)"""
+        with self._lock:
+            if self._sock is None:
+                return True
+            try:
+                self._sock.shutdown(socket.SHUT_WR)
+                self._sock.settimeout(timeout)
+                return self._sock.recv(1) == b""
+            except OSError:
+                return False
+            finally:
+                self._disconnect()
+
+    def _append_direct(self, records, error):
+        if not self._warned:
+            print(f"⚠️ ingest service not reachable ({type(error).__name__}); appending to {self.store.path}/ directly")
+            self._warned = True
+        self.store.append_records(records)
+        self.direct += len(records)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+_default_writer = None
+
+def default_writer():
+    """The process-wide writer for new results: the ingest service when it runs, else the store"""
+    global _default_writer
+    if _default_writer is None:
+        _default_writer = IngestClient()
+    return _default_writer
+
+# -------- CLI -------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single-writer ingestion for the result store")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("serve")
+    p.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        IngestServer(open_store(args.store, legacy_csv=None)).serve_forever()
+    else:
+        parser.print_help()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""Stage timers (span / timed) into fixed-bucket histograms, Prometheus export and a sampling profiler; stdlib only"""
+import os, sys, time, atexit, bisect, threading
+from collections import Counter
+
+ENABLED = os.environ.get("WIFI_METRICS", "1") != "0"
+EXPORT_SECONDS = 10
+PROFILE_INTERVAL = 0.005   # seconds between profiler samples
+# 100 us .. ~100 s, x2 per bucket
+BUCKETS = tuple(1e-4 * 2 ** i for i in range(21))
+
+# -------- Metrics -------- #
+class Histogram:
+    """Fixed-bucket latency histogram (seconds), sharded per thread so observe() takes no lock"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = [0] * (len(self.bounds) + 1) + [0.0]
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def observe(self, seconds):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[bisect.bisect_left(self.bounds, seconds)] += 1
+        shard[-1] += seconds
+
+    def snapshot(self):
+        """(bucket counts, sum, count)"""
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for i, c in enumerate(shard[:-1]):
+                counts[i] += c
+            total += shard[-1]
+        return counts, total, sum(counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)"""
+        counts, _, count = self.snapshot()
+        rank, seen = q * count, 0
+        for bound, c in zip(self.bounds + (float("inf"),), counts):
+            seen += c
+            if seen >= rank and c:
+                return bound
+        return 0.0
+
+class Registry:
+    """Histograms per span name, counters per event name and gauges read at export time"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = Counter()
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault(name, Histogram())
+        return h
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def gauge(self, name, func):
+        """Export func() as a gauge (e.g. a queue depth); replaces an earlier one of the same name"""
+        self.gauges[name] = func
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = ["# HELP wifi_span_seconds Wall time of instrumented stages.",
+                 "# TYPE wifi_span_seconds histogram"]
+        for name, h in sorted(self.histograms.items()):
+            counts, total, count = h.snapshot()
+            cumulative = 0
+            for bound, c in zip(h.bounds, counts):
+                cumulative += c
+                lines.append(f'wifi_span_seconds_bucket{{span="{name}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'wifi_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'wifi_span_seconds_sum{{span="{name}"}} {total:.9g}')
+            lines.append(f'wifi_span_seconds_count{{span="{name}"}} {count}')
+        lines += ["# HELP wifi_events_total Counted events.", "# TYPE wifi_events_total counter"]
+        with self._lock:
+            counters = sorted(self.counters.items())
+        lines += [f'wifi_events_total{{event="{name}"}} {n}' for name, n in counters]
+        lines += ["# HELP wifi_gauge Current values.", "# TYPE wifi_gauge gauge"]
+        for name, func in sorted(self.gauges.items()):
+            try:
+                lines.append(f'wifi_gauge{{name="{name}"}} {float(func()):.9g}')
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{span: (count, mean s, p50 s, p99 s)} for printing"""
+        out = {}
+        for name, h in sorted(self.histograms.items()):
+            _, total, count = h.snapshot()
+            if count:
+                out[name] = (count, total / count, h.quantile(0.5), h.quantile(0.99))
+        return out
+
+    def print_summary(self):
+        for name, (count, mean, p50, p99) in self.summary().items():
+            print(f"  {name:<20} n={count:<6} mean {mean * 1000:9.2f} ms   p50 <= {p50 * 1000:9.2f} ms   "
+                  f"p99 <= {p99 * 1000:9.2f} ms")
+
+REGISTRY = Registry()
+
+# -------- Spans -------- #
+class _Span:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+def span(name):
+    """Context manager timing its block into the `name` histogram"""
+    if not ENABLED:
+        return NULL_SPAN
+    return _Span(REGISTRY.histogram(name))
+
+def timed(name):
+    """Decorator form of span()"""
+    def wrap(func):
+        if not ENABLED:
+            return func
+        hist = REGISTRY.histogram(name)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - start)
+        wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = func.__name__, func.__doc__, func
+        return wrapper
+    return wrap
+
+def count(name, n=1):
+    if ENABLED:
+        REGISTRY.count(name, n)
+
+def gauge(name, func):
+    if ENABLED:
+        REGISTRY.gauge(name, func)
+
+# -------- Export -------- #
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📊 Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+def write_file(path):
+    """Atomically replace `path` with the current metrics"""
+    with open(path + ".tmp", "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(path + ".tmp", path)
+
+def export_to_file(path, interval=EXPORT_SECONDS):
+    """Rewrite `path` every `interval` seconds and at exit"""
+    def loop():
+        while True:
+            time.sleep(interval)
+            write_file(path)
+    threading.Thread(target=loop, daemon=True).start()
+    atexit.register(write_file, path)
+
+# -------- Sampling Profiler -------- #
+class SamplingProfiler:
+    """Counts every thread's stack (sys._current_frames) each `interval` s and writes them as folded stacks"""
+
+    def __init__(self, path, interval=PROFILE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def _loop(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.basename(code.co_filename)
+                    stack.append(f"{module[:-3] if module.endswith('.py') else module}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Stop sampling and write the folded stacks (safe to call twice)"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        with open(self.path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        print(f"🔥 {self.samples} profile samples written to {self.path} (folded stacks)")
+
+def enable_from_env():
+    """Start whatever the WIFI_METRICS_* / WIFI_PROFILE environment variables ask for"""
+    if ENABLED and os.environ.get("WIFI_METRICS_PORT"):
+        serve(int(os.environ["WIFI_METRICS_PORT"]))
+    if ENABLED and os.environ.get("WIFI_METRICS_FILE"):
+        export_to_file(os.environ["WIFI_METRICS_FILE"])
+    if os.environ.get("WIFI_PROFILE"):
+        interval = float(os.environ.get("WIFI_PROFILE_INTERVAL", PROFILE_INTERVAL))
+        return SamplingProfiler(os.environ["WIFI_PROFILE"], interval).start()
+    return None
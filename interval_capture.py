@@ -0,0 +1,109 @@
+import os, threading, time
+import numpy as np
+from wifi_store import SegmentLog, default_store, now_ns
+
+# ----------------- Configuration ----------------- #
+INTERVAL_DIR = "intervals"     # under the result store's directory
+BUFFER_ROWS = 16384        # rows held in memory before a bulk flush (~640 KB)
+FLUSH_SECONDS = 5.0        # flush at least this often while data trickles in
+SUM_STREAM = -1            # stream id of the per-interval aggregate row
+
+# One row per iperf3 interval per stream (plus one SUM_STREAM row per interval).
+# Timestamps are the interval end in int64 ns; missing values are NaN.
+INTERVAL_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("target", "<u2"),
+    ("stream", "<i2"),
+    ("bytes", "<u8"),
+    ("bits_per_second", "<f4"),
+    ("retransmits", "<f4"),
+    ("rtt_ms", "<f4"),
+    ("jitter_ms", "<f4"),
+    ("lost_percent", "<f4"),
+])
+
+def _get(d, key):
+    value = d.get(key)
+    return np.nan if value is None else value
+
+# -------- Column Buffer -------- #
+class IntervalCapture:
+    """
+    Records every iperf3 interval as compact typed rows.
+
+    Rows go into a fixed, preallocated structured array (~40 bytes per
+    sample) and are flushed to an append-only segment log next to the
+    result store's segments in bulk when the buffer fills or FLUSH_SECONDS
+    pass, so memory stays flat however many clients and streams are being
+    recorded.
+    """
+
+    def __init__(self, store=None, log=None, capacity=BUFFER_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.store = store if store is not None else default_store()
+        self.log = log if log is not None else SegmentLog(os.path.join(self.store.path, INTERVAL_DIR), INTERVAL_DTYPE)
+        self.buf = np.zeros(capacity, dtype=INTERVAL_DTYPE)
+        self.size = 0
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def recorder(self, target, start_ns=None):
+        """An on_interval callback for run_iperf_streaming, bound to one test"""
+        target_id = self.store.target_id(target)
+        start_ns = now_ns() if start_ns is None else start_ns
+        streams = {}
+
+        def on_interval(interval):
+            self.add_interval(interval, target_id, start_ns, streams)
+        return on_interval
+
+    def add_interval(self, interval, target_id, start_ns, streams=None):
+        streams = {} if streams is None else streams
+        rows = [(SUM_STREAM, interval.get("sum") or {})]
+        for s in interval.get("streams") or ():
+            # Socket numbers -> 0..P-1 in order of first appearance
+            sid = streams.setdefault(s.get("socket"), len(streams))
+            rows.append((sid, s))
+        # One tuple per row in INTERVAL_DTYPE order, assigned to the buffer in one go;
+        # iperf3 reports per-stream TCP rtt in microseconds
+        values = [(start_ns + int(s["end"] * 1e9) if s.get("end") is not None else start_ns, target_id, sid,
+                   s.get("bytes") or 0, _get(s, "bits_per_second"), _get(s, "retransmits"),
+                   _get(s, "rtt") / 1000.0, _get(s, "jitter_ms"), _get(s, "lost_percent"))
+                  for sid, s in rows]
+        with self._lock:
+            if self.size + len(values) > len(self.buf):
+                self._flush_locked()
+            self.buf[self.size:self.size + len(values)] = values
+            self.size += len(values)
+            if time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self.size:
+            self.log.append_records(self.buf[:self.size])
+            self.rows_written += self.size
+            self.size = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def read(self, start=None, end=None):
+        """Interval rows in [start, end) (flushed rows only)"""
+        return self.log.read_range(start, end)
+
+    def to_frame(self, records):
+        import pandas as pd
+        df = pd.DataFrame({name: records[name] for name in INTERVAL_DTYPE.names})
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ns")
+        return df
+
+_default_capture = None
+
+def default_capture():
+    global _default_capture
+    if _default_capture is None:
+        _default_capture = IntervalCapture()
+    return _default_capture
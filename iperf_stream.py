@@ -0,0 +1,222 @@
+import json, re, subprocess, threading, codecs
+from functools import lru_cache
+
+CHUNK = 1 << 16
+_WS = re.compile(r"[ \t\n\r,]*")
+_KEY = re.compile(r'\s*"((?:[^"\\]|\\.)*)"\s*:\s*')
+
+# -------- Incremental -J Parser -------- #
+class IperfJsonScanner:
+    """
+    Push parser for a classic `iperf3 -J` document.
+
+    feed() text as it arrives and get back ("start" | "interval" | "end" |
+    "error", data) events. Each element of the top-level "intervals" array is
+    decoded on its own and handed out, so memory holds one interval at a
+    time instead of the whole (possibly hundreds of MB) document.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._state = "open"    # open -> key -> value | intervals -> ... -> done
+        self._key = None
+
+    def feed(self, text):
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        events = []
+        while self._step(events):
+            pass
+        return events
+
+    def close(self):
+        if self._state != "done":
+            raise ValueError("truncated iperf3 JSON output")
+
+    def _skip_ws(self):
+        self._pos = _WS.match(self._buf, self._pos).end()
+        return self._pos < len(self._buf)
+
+    def _decode(self):
+        # Objects/arrays only end at their closing bracket, so a decode error
+        # on a value that runs to the end of the buffer just means "need more"
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            return None, False
+        self._pos = end
+        return value, True
+
+    def _step(self, events):
+        if not self._skip_ws():
+            return False
+        ch = self._buf[self._pos]
+        if self._state == "open":
+            if ch != "{":
+                raise ValueError("iperf3 output is not a JSON object")
+            self._pos += 1
+            self._state = "key"
+            return True
+        if self._state == "key":
+            if ch == "}":
+                self._pos += 1
+                self._state = "done"
+                return False
+            m = _KEY.match(self._buf, self._pos)
+            if not m:
+                return False
+            self._key = json.loads(f'"{m.group(1)}"')
+            self._pos = m.end()
+            self._state = "value"
+            return True
+        if self._state == "value":
+            if self._key == "intervals" and ch == "[":
+                self._pos += 1
+                self._state = "intervals"
+                return True
+            value, ok = self._decode()
+            if not ok:
+                return False
+            if self._key in ("start", "end", "error"):
+                events.append((self._key, value))
+            self._state = "key"
+            return True
+        if self._state == "intervals":
+            if ch == "]":
+                self._pos += 1
+                self._state = "key"
+                return True
+            value, ok = self._decode()
+            if not ok:
+                return False
+            events.append(("interval", value))
+            return True
+        return False
+
+# -------- Event Sources -------- #
+def parse_json_stream_line(line):
+    """One `iperf3 --json-stream` line -> (event, data) or None"""
+    line = line.strip()
+    if not line:
+        return None
+    obj = json.loads(line)
+    return obj.get("event"), obj.get("data")
+
+def iter_iperf_events(stream, json_stream=False):
+    """Yield (event, data) from a text stream of iperf3 -J or --json-stream output"""
+    if json_stream:
+        for line in stream:
+            event = parse_json_stream_line(line)
+            if event:
+                yield event
+        return
+    scanner = IperfJsonScanner()
+    while True:
+        chunk = stream.read(CHUNK)
+        if not chunk:
+            break
+        yield from scanner.feed(chunk)
+    scanner.close()
+
+@lru_cache(maxsize=None)
+def supports_json_stream(binary="iperf3"):
+    """--json-stream exists since iperf 3.17"""
+    try:
+        out = subprocess.run([binary, "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return False
+    m = re.search(r"iperf (\d+)\.(\d+)", out)
+    return bool(m) and (int(m.group(1)), int(m.group(2))) >= (3, 17)
+
+# -------- Summaries -------- #
+class IperfResult:
+    """
+    Collects events into the small subset of the -J document the scripts
+    use: {"start": ..., "end": ..., "intervals_seen": n}. Intervals are
+    passed to `on_interval` (if given) and then dropped.
+    """
+
+    def __init__(self, on_interval=None):
+        self.on_interval = on_interval
+        self.doc = {"intervals_seen": 0}
+
+    def add(self, event, data):
+        if event == "interval":
+            self.doc["intervals_seen"] += 1
+            if self.on_interval:
+                self.on_interval(data)
+        elif event in ("start", "end"):
+            self.doc[event] = data
+        elif event == "error":
+            self.doc["error"] = data
+
+def iperf_json_stream_cmd(cmd):
+    """Swap -J for --json-stream in an iperf3 command line"""
+    return [("--json-stream" if arg == "-J" else arg) for arg in cmd]
+
+def run_iperf_streaming(cmd, on_interval=None, json_stream=None):
+    """
+    Run an iperf3 -J command and return {"start", "end"} without ever holding
+    the full JSON document. Uses --json-stream when the binary supports it.
+    """
+    if json_stream is None:
+        json_stream = supports_json_stream(cmd[0])
+    if json_stream:
+        cmd = iperf_json_stream_cmd(cmd)
+    result = IperfResult(on_interval)
+    stderr = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+        # Drain stderr alongside stdout: a full stderr pipe would block iperf3 and stall the parse
+        drain = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+        drain.start()
+        try:
+            for event, data in iter_iperf_events(proc.stdout, json_stream):
+                result.add(event, data)
+        except ValueError:
+            if proc.wait() == 0:
+                raise
+        returncode = proc.wait()
+        drain.join()
+    if returncode != 0:
+        raise RuntimeError(result.doc.get("error") or "".join(stderr))
+    return result.doc
+
+async def run_iperf_streaming_async(cmd, on_interval=None, json_stream=None):
+    """asyncio version of run_iperf_streaming"""
+    import asyncio
+    if json_stream is None:
+        json_stream = supports_json_stream(cmd[0])
+    if json_stream:
+        cmd = iperf_json_stream_cmd(cmd)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=1 << 24)
+    result = IperfResult(on_interval)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    scanner = IperfJsonScanner()
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    try:
+        if json_stream:
+            while True:
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                event = parse_json_stream_line(line.decode())
+                if event:
+                    result.add(*event)
+        else:
+            while True:
+                chunk = await proc.stdout.read(CHUNK)
+                if not chunk:
+                    break
+                for event in scanner.feed(decoder.decode(chunk)):
+                    result.add(*event)
+            scanner.close()
+    except ValueError:
+        if await proc.wait() == 0:
+            raise
+    stderr = await stderr_task
+    if await proc.wait() != 0:
+        raise RuntimeError(result.doc.get("error") or stderr.decode(errors="replace"))
+    return result.doc
@@ -0,0 +1,220 @@
+import asyncio, itertools, os, socket, struct, sys, threading, time
+import numpy as np
+
+# ----------------- Configuration ----------------- #
+PROBE_TIMEOUT = 1.0     # seconds to wait for each echo reply
+PROBE_INTERVAL = 0.2    # gap between probes of one train
+PROBE_COUNT = 5         # probes per host when not running alongside a test
+PAYLOAD = b"wifi-latency-probe".ljust(32, b".")
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# -------- ICMP Packets -------- #
+def icmp_checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def echo_request(ident, seq, payload=PAYLOAD):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+def open_icmp_socket():
+    """
+    Unprivileged ICMP datagram socket if the kernel allows it
+    (net.ipv4.ping_group_range), else a raw socket (needs root/CAP_NET_RAW).
+    Returns (sock, raw).
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        raw = False
+    except OSError:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        except PermissionError:
+            raise PermissionError("ICMP probing needs root/CAP_NET_RAW or net.ipv4.ping_group_range") from None
+        raw = True
+    sock.setblocking(False)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    return sock, raw
+
+# -------- Statistics -------- #
+def latency_stats(rtts, sent):
+    """RTT samples (ms) of one probe train -> summary dict"""
+    received = len(rtts)
+    stats = {"sent": sent, "received": received,
+             "loss_percent": 100.0 * (sent - received) / sent if sent else None}
+    if received:
+        a = np.asarray(rtts, dtype=float)
+        stats.update(min=float(a.min()), avg=float(a.mean()), p50=float(np.percentile(a, 50)),
+                     p99=float(np.percentile(a, 99)), stddev=float(a.std()))
+    else:
+        stats.update(min=None, avg=None, p50=None, p99=None, stddev=None)
+    return stats
+
+# -------- Prober -------- #
+class LatencyProber:
+    """
+    Sends ICMP echo trains to any number of hosts over a single socket.
+
+    All probes share one socket and one event loop reader; replies are
+    matched to their probe by (address, sequence), so hundreds of hosts are
+    probed in about one timeout period instead of one timeout per host.
+    The socket is opened on first use in the running loop.
+    """
+
+    _instances = itertools.count()
+
+    def __init__(self, timeout=PROBE_TIMEOUT):
+        self.timeout = timeout
+        # Raw sockets see every reply on the host, so each prober needs its own id
+        self.ident = (os.getpid() + next(self._instances)) & 0xFFFF
+        self._sock = None
+        self._loop = None
+        self._seq = 0
+        self._pending = {}      # (ip, seq) -> (send time, future)
+
+    def _open(self):
+        loop = asyncio.get_running_loop()
+        if self._sock is None:
+            self._sock, self._raw = open_icmp_socket()
+            self._loop = loop
+            loop.add_reader(self._sock.fileno(), self._on_readable)
+        elif loop is not self._loop:
+            raise RuntimeError("LatencyProber is bound to another event loop")
+
+    def _on_readable(self):
+        now = time.perf_counter()
+        while True:
+            try:
+                packet, (ip, _) = self._sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if self._raw:
+                # Raw sockets see the IP header and every ICMP packet on the host
+                packet = packet[(packet[0] & 0x0F) * 4:]
+            if len(packet) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", packet[:8])
+            # Datagram sockets rewrite the id, and only deliver our own replies
+            if icmp_type != ICMP_ECHO_REPLY or (self._raw and ident != self.ident):
+                continue
+            entry = self._pending.pop((ip, seq), None)
+            if entry and not entry[1].done():
+                entry[1].set_result((now - entry[0]) * 1000.0)
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    async def _ping_once(self, ip):
+        seq = self._next_seq()
+        fut = self._loop.create_future()
+        self._pending[(ip, seq)] = (time.perf_counter(), fut)
+        try:
+            self._sock.sendto(echo_request(self.ident, seq), (ip, 0))
+            return await asyncio.wait_for(fut, self.timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self._pending.pop((ip, seq), None)
+
+    async def probe(self, host, count=PROBE_COUNT, interval=PROBE_INTERVAL, until=None):
+        """
+        Send a train of `count` echoes `interval` seconds apart. If `until`
+        is given, keep sending (at least one probe) until until() is true.
+        """
+        self._open()
+        try:
+            ip = (await self._loop.getaddrinfo(host, None, family=socket.AF_INET))[0][4][0]
+        except socket.gaierror:
+            return latency_stats([], 0)
+        replies = []
+        while True:
+            replies.append(asyncio.ensure_future(self._ping_once(ip)))
+            if until is not None:
+                if until():
+                    break
+            elif len(replies) >= count:
+                break
+            await asyncio.sleep(interval)
+        rtts = [r for r in await asyncio.gather(*replies) if r is not None]
+        return latency_stats(rtts, len(replies))
+
+    async def probe_many(self, hosts, count=PROBE_COUNT, interval=PROBE_INTERVAL):
+        """{host: stats} for many hosts, all trains running concurrently"""
+        results = await asyncio.gather(*(self.probe(h, count, interval) for h in hosts))
+        return dict(zip(hosts, results))
+
+    def close(self):
+        if self._sock is not None:
+            if not self._loop.is_closed():
+                self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+
+# -------- Blocking Helpers -------- #
+def probe_hosts(hosts, count=PROBE_COUNT, interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT):
+    """Blocking probe_many() for scripts without an event loop"""
+    async def run():
+        prober = LatencyProber(timeout)
+        try:
+            return await prober.probe_many(list(hosts), count, interval)
+        finally:
+            prober.close()
+    return asyncio.run(run())
+
+def run_with_probes(host, func, *args, interval=PROBE_INTERVAL, timeout=PROBE_TIMEOUT, **kwargs):
+    """
+    Call func(*args, **kwargs) while probing `host` from a background
+    thread, so latency is measured under load. Returns (result, stats).
+    """
+    done = threading.Event()
+    stats = {}
+
+    async def run():
+        prober = LatencyProber(timeout)
+        try:
+            stats.update(await prober.probe(host, interval=interval, until=done.is_set))
+        except OSError as e:
+            print("❌ latency probe:", e)
+        finally:
+            prober.close()
+
+    t = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    t.start()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        done.set()
+        t.join()
+    return result, stats
+
+# -------- Benchmark -------- #
+def benchmark(n_hosts=500, count=3):
+    """Probe n_hosts addresses, half of them unreachable, in one pass"""
+    # Loopback answers; TEST-NET-1 (192.0.2.0/24) never does
+    up = [f"127.0.{i // 250}.{i % 250 + 1}" for i in range(n_hosts // 2)]
+    down = [f"192.0.2.{i % 254 + 1}" for i in range(n_hosts - len(up))]
+    start = time.perf_counter()
+    results = probe_hosts(up + down, count=count, interval=0.01)
+    elapsed = time.perf_counter() - start
+    answered = sum(1 for s in results.values() if s["received"])
+    print(f"{len(results)} unique hosts x {count} probes: {elapsed:.2f} s ({answered} answered, "
+          f"timeout {PROBE_TIMEOUT:.1f} s)")
+    print(f"sequential ping3 would wait ~{len(set(down)) * count * PROBE_TIMEOUT:.0f} s on the unreachable hosts alone")
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        hosts = sys.argv[1:] or ["127.0.0.1"]
+        for host, s in probe_hosts(hosts).items():
+            print(host, s)
@@ -0,0 +1,443 @@
+"""Coordinator/worker mode for multi-client load tests: one shared round schedule, results sent back in binary batches"""
+import argparse, asyncio, json, os, random, shutil, socket, struct, subprocess, sys, tempfile, time
+import numpy as np
+from wifi_store import RESULT_DTYPE, ResultStore, Sample, SampleBuffer, default_store, now_ns
+
+# ----------------- Configuration ----------------- #
+COORD_PORT = 5300
+START_LEAD = 3.0          # seconds between the plan being fixed and round 0
+REGISTER_WINDOW = 5.0     # how long to wait for --expect workers before starting anyway
+BATCH_ROWS = 256          # worker: send a batch at this many records...
+BATCH_DELAY = 0.2         # ...or this many seconds after the first one
+FLUSH_ROWS = 8192         # coordinator: write to the store at this many records...
+FLUSH_DELAY = 0.2         # ...or this often
+MAX_FRAME = 16 << 20
+MAX_OUTBOX = 4096         # unacknowledged batches a worker keeps for resending before it pauses measuring
+
+# -------- Wire Format -------- #
+# frame   = length u32 | kind u8 | payload
+# HELLO   = JSON {"worker", "session", "target", "time", "acked"} worker -> coordinator (target = server ip:port)
+# PLAN    = JSON {"base", "period", "rounds", "duration", "time"} coordinator -> worker
+# RESULTS = seq u64 | n * RESULT_DTYPE records                  worker -> coordinator
+# ACK     = seq u64 (highest batch written to the store)        coordinator -> worker
+FRAME = struct.Struct("!IB")
+SEQ = struct.Struct("!Q")
+HELLO, PLAN, RESULTS, ACK = 1, 2, 3, 4
+
+async def read_frame(reader):
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"frame of {length} bytes exceeds limit")
+    return kind, await reader.readexactly(length)
+
+def write_frame(writer, kind, payload):
+    writer.write(FRAME.pack(len(payload), kind) + payload)
+
+def encode_results(seq, records):
+    return SEQ.pack(seq) + np.ascontiguousarray(records, dtype=RESULT_DTYPE).tobytes()
+
+def decode_results(payload):
+    seq, = SEQ.unpack_from(payload)
+    return seq, np.frombuffer(payload, dtype=RESULT_DTYPE, offset=SEQ.size)
+
+# -------- Coordinator / Aggregator -------- #
+class Coordinator:
+    """
+    Hands out the test schedule and aggregates every worker's results into
+    one store. Batches are deduplicated by (worker, seq), so a worker that
+    reconnects can safely resend anything that was not acknowledged; a
+    restarted worker (new session) starts its sequence numbers over.
+    """
+
+    def __init__(self, store=None, host="0.0.0.0", port=COORD_PORT, rounds=8, period=10.0,
+                 duration=5, expect=1, lead=START_LEAD, register_window=REGISTER_WINDOW):
+        self.store = store if store is not None else default_store()
+        self.host = host
+        self.port = port
+        self.rounds = rounds
+        self.period = period
+        self.duration = duration
+        self.expect = expect
+        self.lead = lead
+        self.register_window = register_window
+        self.plan = None
+        self.workers = {}       # worker id -> {"target": id, "acked": seq}
+        self.rows = 0
+        self._pending = []      # (worker state, session, seq, records) waiting for a store flush
+        self._pending_rows = 0
+        self._flush_lock = asyncio.Lock()
+
+    def _fix_plan(self):
+        if self.plan is None:
+            self.plan = {"base": time.time() + self.lead, "period": self.period,
+                         "rounds": self.rounds, "duration": self.duration}
+            self._plan_ready.set()
+            print(f"🕒 {len(self.workers)} worker(s) registered; round 0 starts in {self.lead:.1f} s")
+
+    async def _register_timeout(self):
+        await asyncio.sleep(self.register_window)
+        self._fix_plan()
+
+    async def _handle(self, reader, writer):
+        state = None
+        try:
+            kind, payload = await read_frame(reader)
+            if kind != HELLO:
+                return
+            hello = json.loads(payload)
+            session = hello.get("session")
+            state = self.workers.get(hello["worker"])
+            if state is not None and state["session"] != session:
+                # Same id, new process: its seq starts again at 1
+                print(f"🔁 worker {hello['worker']} restarted")
+                state.update(session=session, acked=0, received=0)
+            if state is None:
+                state = {"target": self.store.target_id(hello["target"]), "session": session, "acked": 0,
+                         "received": 0, "writer": None}
+                self.workers[hello["worker"]] = state
+                print(f"👋 worker {hello['worker']} measuring {hello['target']}")
+                if len(self.workers) == 1 and self.plan is None:
+                    self._timeout = asyncio.ensure_future(self._register_timeout())
+                if len(self.workers) >= self.expect:
+                    self._fix_plan()
+            state["writer"] = writer
+            await self._plan_ready.wait()
+            write_frame(writer, PLAN, json.dumps(dict(self.plan, time=time.time())).encode())
+            # Tell a reconnecting worker what already made it to the store
+            write_frame(writer, ACK, SEQ.pack(state["acked"]))
+            await writer.drain()
+            while state["session"] == session:
+                kind, payload = await read_frame(reader)
+                if kind != RESULTS or state["session"] != session:
+                    continue
+                seq, records = decode_results(payload)
+                # Resent after a reconnect: already stored or waiting for the next flush
+                if seq <= state["received"]:
+                    continue
+                state["received"] = seq
+                records = records.copy()
+                # Target ids are the coordinator's, whatever the worker's store uses
+                records["target"] = state["target"]
+                self._pending.append((state, session, seq, records))
+                self._pending_rows += len(records)
+                if self._pending_rows >= FLUSH_ROWS:
+                    await self._flush()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if state is not None and state["writer"] is writer:
+                state["writer"] = None
+            writer.close()
+
+    async def _flush(self):
+        # One flush at a time, so acks go out in order
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batches, self._pending, self._pending_rows = self._pending, [], 0
+            records = np.concatenate([r for _, _, _, r in batches])
+            # One locked append per flush, off the event loop
+            await asyncio.to_thread(self.store.append_records, records)
+            self.rows += len(records)
+            acked = {}
+            for state, session, seq, _ in batches:
+                if state["session"] != session:
+                    continue        # sent by the worker's previous process: stored, not acknowledged
+                state["acked"] = max(state["acked"], seq)
+                acked[id(state)] = state
+            for state in acked.values():
+                if state["writer"] is not None:
+                    write_frame(state["writer"], ACK, SEQ.pack(state["acked"]))
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(FLUSH_DELAY)
+            await self._flush()
+
+    def finished(self):
+        """Every round has started and every worker has disconnected"""
+        if self.plan is None or self.rounds is None:
+            return False
+        last_start = self.plan["base"] + (self.rounds - 1) * self.period
+        return time.time() > last_start and all(w["writer"] is None for w in self.workers.values())
+
+    def end_time(self, grace=None):
+        if self.plan is None or self.rounds is None:
+            return None
+        grace = self.duration + 5.0 if grace is None else grace
+        return self.plan["base"] + (self.rounds - 1) * self.period + self.duration + grace
+
+    async def run(self, grace=None):
+        """Serve until every round is done (forever if rounds is None)"""
+        self._plan_ready = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        flusher = asyncio.ensure_future(self._flusher())
+        print(f"📡 Coordinator listening on {self.host}:{self.port}")
+        try:
+            while True:
+                end = self.end_time(grace)
+                if end is not None and time.time() >= end or self.finished():
+                    break
+                await asyncio.sleep(0.2)
+        finally:
+            server.close()
+            flusher.cancel()
+            await self._flush()
+        return self.rows
+
+# -------- Worker -------- #
+class Worker:
+    """
+    Runs the coordinator's schedule against one iperf3 server and streams
+    the results back. Measurements carry on while disconnected until
+    MAX_OUTBOX batches are unacknowledged; those are resent after reconnecting.
+    """
+
+    def __init__(self, coordinator, target, measure, worker_id=None, test_name=None,
+                 batch_rows=BATCH_ROWS, batch_delay=BATCH_DELAY):
+        host, _, port = coordinator.rpartition(":")
+        self.coord = (host or "127.0.0.1", int(port or COORD_PORT))
+        self.target = target
+        self.measure = measure
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.session = os.urandom(8).hex()      # tells a restart under the same id from a reconnect
+        # Results are stored under the measured server, so a restarted worker (new pid) adds no target
+        self.test_name = test_name or f"{target.server_ip}:{target.port}"
+        self.batch_rows = batch_rows
+        self.batch_delay = batch_delay
+        self.offset = 0.0       # coordinator clock - local clock, seconds
+        self.sent = 0
+        self._seq = 0
+        self._acked = 0
+        self._outbox = []       # [(seq, payload)] not yet acknowledged
+        self._batch = SampleBuffer(batch_rows)
+        self._writer = None
+
+    # ---- connection ---- #
+    async def _connect_loop(self):
+        backoff = 0.2
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.coord)
+                sent_at = time.time()
+                write_frame(writer, HELLO, json.dumps({"worker": self.worker_id, "session": self.session,
+                                                       "target": self.test_name, "time": sent_at,
+                                                       "acked": self._acked}).encode())
+                await writer.drain()
+                kind, payload = await read_frame(reader)
+                plan = json.loads(payload)
+                # NTP-style estimate: the coordinator stamped the plan halfway through the round trip
+                self.offset = plan["time"] - (sent_at + time.time()) / 2
+                if not self._plan.done():
+                    self._plan.set_result(plan)
+                backoff = 0.2
+                self._writer = writer
+                for seq, frame in list(self._outbox):
+                    write_frame(writer, RESULTS, frame)
+                await writer.drain()
+                while True:
+                    kind, payload = await read_frame(reader)
+                    if kind == ACK:
+                        self._acked = max(self._acked, SEQ.unpack(payload)[0])
+                        self._outbox = [(s, f) for s, f in self._outbox if s > self._acked]
+                        if len(self._outbox) < MAX_OUTBOX:
+                            self._room.set()
+                        if not self._outbox:
+                            self._drained.set()
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                pass
+            self._writer = None
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, 5.0)
+
+    # ---- batching ---- #
+    def _add(self, result):
+        """A Sample, metrics dict or RESULT_DTYPE array, written into the batch buffer"""
+        start = len(self._batch)
+        if isinstance(result, np.ndarray):
+            self._batch.extend(result)
+        else:
+            self._batch.append(result)
+        # Timestamps move onto the coordinator's clock
+        self._batch.view()[start:]["timestamp"] += int(self.offset * 1e9)
+        if len(self._batch) >= self.batch_rows:
+            self._send_batch()
+
+    def _send_batch(self):
+        if not len(self._batch):
+            return
+        self._seq += 1
+        frame = encode_results(self._seq, self._batch.view())
+        self.sent += len(self._batch)
+        self._batch.clear()
+        self._outbox.append((self._seq, frame))
+        if len(self._outbox) >= MAX_OUTBOX:
+            self._room.clear()
+        self._drained.clear()
+        if self._writer is not None:
+            write_frame(self._writer, RESULTS, frame)
+
+    async def _batch_timer(self):
+        while True:
+            await asyncio.sleep(self.batch_delay)
+            self._send_batch()
+            if self._writer is not None:
+                try:
+                    await self._writer.drain()
+                except ConnectionError:
+                    pass
+
+    # ---- schedule ---- #
+    async def run(self, drain_timeout=30.0):
+        self._plan = asyncio.get_running_loop().create_future()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._room = asyncio.Event()
+        self._room.set()
+        conn = asyncio.ensure_future(self._connect_loop())
+        timer = asyncio.ensure_future(self._batch_timer())
+        try:
+            plan = await self._plan
+            rounds = plan["rounds"]
+            # Every worker runs the same test length
+            self.target.duration = plan["duration"]
+            k = 0
+            while rounds is None or k < rounds:
+                start = plan["base"] + k * plan["period"] - self.offset
+                k += 1
+                if not self._room.is_set():
+                    # Backpressure: results are never dropped, so stop measuring until acks make room
+                    print(f"⚠️ {self.worker_id}: {len(self._outbox)} batches unacknowledged; pausing")
+                    await self._room.wait()
+                delay = start - time.time()
+                if plan["period"] and delay < -plan["period"]:
+                    continue        # joined late: skip rounds whose slot has passed
+                await asyncio.sleep(max(delay, 0))
+                try:
+                    result = await self.measure(self.target)
+                except Exception as e:
+                    print(f"❌ {self.worker_id}: {e}")
+                    continue
+                self._add(result)
+            self._send_batch()
+            await asyncio.wait_for(self._drained.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {self.worker_id}: {len(self._outbox)} batch(es) never acknowledged")
+        finally:
+            conn.cancel()
+            timer.cancel()
+            if self._writer is not None:
+                self._writer.close()
+        return self.sent
+
+# -------- Measurements -------- #
+async def iperf_measure(target):
+    """Real test: iperf3 plus latency probes, as in wifi_framework"""
+    from wifi_framework import measure_target
+    return await measure_target(target)
+
+async def fake_measure(target):
+    """Stand-in for iperf3 so the orchestration can be tried without servers"""
+    started = now_ns()
+    await asyncio.sleep(target.duration * random.uniform(0.9, 1.0))
+    return Sample(started, throughput_mbps=random.gauss(400, 40), retransmits=random.randint(0, 5),
+                  lost_percent=0.0, jitter_ms=random.uniform(0.1, 2.0), latency_ms=random.uniform(1, 20))
+
+def burst_measure(rows):
+    """Stand-in that returns `rows` records at once, for load-testing the aggregator"""
+    async def measure(target):
+        records = np.zeros(rows, dtype=RESULT_DTYPE)
+        records["timestamp"] = now_ns() + np.arange(rows)
+        records["throughput_mbps"] = np.random.normal(400, 40, rows)
+        records["predicted_degraded"] = -1
+        return records
+    return measure
+
+def run_worker(coordinator, server="127.0.0.1:5201", fake=False, duration=5, worker_id=None, measure=None):
+    from wifi_scheduler import parse_targets
+    target = parse_targets(server, duration=duration)[0]
+    measure = measure or (fake_measure if fake else iperf_measure)
+
+    async def main():
+        worker = Worker(coordinator, target, measure, worker_id=worker_id)
+        return await worker.run()
+    return asyncio.run(main())
+
+# -------- Local Demo -------- #
+def spawn_workers(n, port, extra, servers=0):
+    procs = []
+    for i in range(n):
+        server = f"127.0.0.1:{5201 + i % servers}" if servers else "127.0.0.1:5201"
+        cmd = [sys.executable, os.path.abspath(__file__), "worker", "--coordinator", f"127.0.0.1:{port}",
+               "--server", server, "--id", f"w{i:03d}"] + extra
+        procs.append(subprocess.Popen(cmd))
+    return procs
+
+def demo(workers=50, rounds=3, period=2.0, duration=1, servers=0, port=COORD_PORT):
+    """Coordinator plus `workers` local worker processes (fake iperf3 unless servers > 0)"""
+    iperf_servers = [subprocess.Popen(["iperf3", "-s", "-p", str(5201 + i)], stdout=subprocess.DEVNULL)
+                     for i in range(servers)]
+    store = ResultStore(tempfile.mkdtemp(prefix="wifi_demo_"))
+    coord = Coordinator(store, "127.0.0.1", port, rounds=rounds, period=period, duration=duration,
+                        expect=workers, lead=1.0)
+    extra = ["--duration", str(duration)] + ([] if servers else ["--fake"])
+    procs = spawn_workers(workers, port, extra, servers)
+    try:
+        rows = asyncio.run(coord.run(grace=2.0))
+        ts = np.sort(store.read_range()["timestamp"])
+        print(f"✅ {rows} results from {len(coord.workers)} workers (expected {workers * rounds})")
+        if len(ts):
+            print(f"   round 0 start spread across workers: {np.ptp(ts[:workers]) / 1e6:.1f} ms")
+    finally:
+        for p in procs + iperf_servers:
+            if p.poll() is None:
+                p.terminate()
+            p.wait()
+        store.close()
+        shutil.rmtree(store.path, ignore_errors=True)
+    return rows
+
+# -------- Command Line -------- #
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="load_coordinator.py", description="Multi-client load orchestration")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("coordinator")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=COORD_PORT)
+    p.add_argument("--rounds", type=int, default=8)
+    p.add_argument("--period", type=float, default=10.0, help="seconds between round starts")
+    p.add_argument("--duration", type=int, default=5)
+    p.add_argument("--expect", type=int, default=1, help="workers to wait for before fixing the schedule")
+
+    p = sub.add_parser("worker")
+    p.add_argument("--coordinator", default=f"127.0.0.1:{COORD_PORT}")
+    p.add_argument("--server", default="127.0.0.1:5201", help="iperf3 server ip[:port]")
+    p.add_argument("--duration", type=int, default=5)
+    p.add_argument("--id")
+    p.add_argument("--fake", action="store_true", help="simulate iperf3 instead of running it")
+    p.add_argument("--burst", type=int, default=0, help=argparse.SUPPRESS)
+
+    p = sub.add_parser("demo")
+    p.add_argument("--workers", type=int, default=50)
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--period", type=float, default=2.0)
+    p.add_argument("--duration", type=int, default=1)
+    p.add_argument("--servers", type=int, default=0, help="local iperf3 servers to start (0 = fake iperf3)")
+    p.add_argument("--port", type=int, default=COORD_PORT)
+
+    args = parser.parse_args(argv)
+    if args.command == "coordinator":
+        coord = Coordinator(host=args.host, port=args.port, rounds=args.rounds, period=args.period,
+                            duration=args.duration, expect=args.expect)
+        print(f"✅ {asyncio.run(coord.run())} results stored")
+    elif args.command == "worker":
+        measure = burst_measure(args.burst) if args.burst else None
+        run_worker(args.coordinator, args.server, args.fake, args.duration, args.id, measure)
+    elif args.command == "demo":
+        demo(args.workers, args.rounds, args.period, args.duration, args.servers, args.port)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
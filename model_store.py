@@ -0,0 +1,108 @@
+"""Pickle-free model artifacts: one .npy per forest array in a .flat/ directory, memory-mapped on load"""
+import os, sys, json, time, shutil, threading
+import numpy as np
+from predictor_service import FlatForest, FEATURES, MODEL_DIR, latest_model_file
+
+FLAT_ARRAYS = ["feature", "threshold", "left", "right", "missing_left", "value", "roots", "classes", "is_leaf"]
+FORMAT_VERSION = 1
+
+# -------- Save / Load -------- #
+def save_flat(forest, path):
+    """Write forest arrays to `path` (a directory), replacing it atomically"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name in FLAT_ARRAYS:
+        np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(getattr(forest, name)))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"format": FORMAT_VERSION, "trees": int(len(forest.roots)),
+                   "nodes": int(len(forest.left)), "features": forest.n_features, "saved": time.time()}, f)
+    old = None
+    if os.path.exists(path):
+        # Processes still mapping the old files keep them until they unmap
+        old = f"{path}.old-{os.getpid()}"
+        os.rename(path, old)
+    os.rename(tmp, path)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+    return path
+
+def load_flat(path, mmap=True):
+    """Map a saved forest read-only (mmap=False reads it into private memory)"""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["format"] != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported model format {meta['format']}")
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode) for name in FLAT_ARRAYS}
+    # Large batches are faster in sklearn; its pickle is only read if one comes
+    pkl = path[:-len(".flat")] + ".pkl"
+    # Models saved before the rolling features were trained on the raw metrics
+    return FlatForest(**arrays, n_features=meta.get("features", len(FEATURES)),
+                      sklearn=pkl if os.path.exists(pkl) else None)
+
+def flat_path(model_file):
+    """wifi_rf_model.pkl / models/model-000003 -> its .flat directory"""
+    stem = model_file[:-4] if model_file.endswith(".pkl") else model_file
+    return stem + ".flat"
+
+def load_model(model_file):
+    """The .flat copy of a model if there is one (no unpickling), else the pickle"""
+    path = flat_path(model_file)
+    if os.path.isdir(path):
+        return load_flat(path)
+    import joblib
+    pkl = model_file if model_file.endswith(".pkl") else model_file + ".pkl"
+    return FlatForest.from_sklearn(joblib.load(pkl))
+
+# -------- Hot Reload -------- #
+class ModelWatcher:
+    """
+    Polls models/LATEST and swaps new versions into a MicroBatchPredictor.
+    The swap is a single reference assignment under the predictor's lock, so
+    in-flight batches finish on the old model and the test loop never stops.
+    """
+
+    def __init__(self, predictor, model_dir=MODEL_DIR, interval=2.0, current=None):
+        self.predictor = predictor
+        self.model_dir = model_dir
+        self.interval = interval
+        self.current = current
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def check(self):
+        """Swap if a newer version was published; True if the model changed"""
+        latest = latest_model_file(self.model_dir)
+        if latest is None or latest == self.current:
+            return False
+        try:
+            model = load_model(latest)
+        except (OSError, ValueError) as e:
+            # Published but pruned/replaced before we got to it; try again next poll
+            print(f"⚠️ could not load {latest}: {e}")
+            return False
+        self.predictor.set_model(model)
+        self.current = latest
+        print(f"🔄 Switched to model {latest}")
+        return True
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "convert":
+        import joblib
+        out = save_flat(FlatForest.from_sklearn(joblib.load(sys.argv[2])), flat_path(sys.argv[2]))
+        print(f"✅ Saved {out}/")
+    else:
+        print("usage: python model_store.py convert wifi_rf_model.pkl     # -> wifi_rf_model.flat/")
@@ -0,0 +1,239 @@
+"""Incremental training: each run fits a few more trees on the rows stored since the last one and publishes a new version"""
+import os, json, time, shutil
+import numpy as np
+from wifi_store import default_store
+from predictor_service import FEATURES, MODEL_DIR, LATEST_FILE
+from features import FEATURE_NAMES, FeatureBuilder
+
+# ----------------- Configuration ----------------- #
+BASELINE_WINDOW = 50      # previous tests per target that form the throughput baseline
+INITIAL_TREES = 100       # forest size of a full (re)build
+TREES_PER_UPDATE = 10     # trees added per incremental run
+MAX_TREES = 200           # oldest trees are dropped beyond this (adapts to drift)
+MAX_NEW_ROWS = 200_000    # new rows sampled per run
+HISTORY_ROWS = 50_000     # reservoir of older rows mixed into each run
+KEEP_VERSIONS = 5
+CHUNK_ROWS = 1 << 18
+
+# -------- Labels -------- #
+def degraded_labels(X, baseline):
+    """latency > 50 ms OR loss > 5% OR throughput < 50% of the target's rolling baseline"""
+    throughput, latency, _, loss = X.T
+    with np.errstate(invalid="ignore"):
+        return ((latency > 50) | (loss > 5) | (throughput < 0.5 * baseline)).astype(np.int8)
+
+def label_chunk(records, tails, window=BASELINE_WINDOW, builder=None):
+    """
+    (X, y) for a chunk of RESULT_DTYPE records: X holds FEATURE_NAMES, y the
+    labels. The baseline of each row is the mean throughput of the previous
+    `window` tests of the same target; `tails` ({target: recent
+    throughputs}) carries it across chunks, as `builder` does the features.
+    """
+    import pandas as pd
+    records = records[np.argsort(records["timestamp"], kind="stable")]
+    raw = np.column_stack([records[f].astype(np.float64) for f in FEATURES])
+    baseline = np.full(len(records), np.nan)
+    for target in np.unique(records["target"]):
+        idx = np.flatnonzero(records["target"] == target)
+        tail = tails.get(int(target), [])
+        values = np.concatenate([tail, raw[idx, 0]])
+        rolled = pd.Series(values).rolling(window, min_periods=1).mean().shift(1).to_numpy()
+        baseline[idx] = rolled[len(tail):]
+        tails[int(target)] = [float(v) for v in values[-window:]]
+    X = (builder if builder is not None else FeatureBuilder()).transform(records)
+    return X, degraded_labels(raw, baseline)
+
+def label_frame(df, window=BASELINE_WINDOW):
+    """Rolling-baseline labels for a results DataFrame (same rule as label_chunk)"""
+    rolling = lambda s: s.rolling(window, min_periods=1).mean().shift(1)
+    if "target" in df:
+        baseline = df.groupby("target", sort=False)["throughput_mbps"].transform(rolling)
+    else:
+        baseline = rolling(df["throughput_mbps"])
+    return degraded_labels(df[FEATURES].to_numpy(dtype=float), baseline.to_numpy())
+
+# -------- Reservoir Sample -------- #
+class Reservoir:
+    """Uniform fixed-size sample of every (X, y) row ever added (algorithm R, vectorized)"""
+
+    def __init__(self, size, seed=0, X=None, y=None, seen=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed + seen)
+        self.X = np.empty((0, len(FEATURE_NAMES))) if X is None else X
+        self.y = np.empty(0, dtype=np.int8) if y is None else y
+        self.seen = seen
+
+    def add(self, X, y):
+        free = max(self.size - len(self.X), 0)
+        if free:
+            self.X = np.concatenate([self.X, X[:free]])
+            self.y = np.concatenate([self.y, y[:free]])
+            self.seen += min(free, len(X))
+            X, y = X[free:], y[free:]
+        if len(X):
+            # Row i (1-based overall) replaces a random slot with probability size / i
+            slots = self.rng.integers(0, np.arange(self.seen + 1, self.seen + len(X) + 1))
+            keep = slots < self.size
+            self.X[slots[keep]] = X[keep]
+            self.y[slots[keep]] = y[keep]
+            self.seen += len(X)
+
+# -------- Versioned Artifacts -------- #
+def _path(model_dir, name):
+    return os.path.join(model_dir, name)
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+def load_state(model_dir=MODEL_DIR):
+    """Checkpoint of the last run, the current model, the history reservoir and the read rows' hashes (or Nones)"""
+    import joblib
+    try:
+        with open(_path(model_dir, "state.json")) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None, None, None, None
+    state["tails"] = {int(k): v for k, v in state["tails"].items()}
+    clf = joblib.load(_path(model_dir, state["model"]))
+    with np.load(_path(model_dir, "history.npz")) as h:
+        history = Reservoir(HISTORY_ROWS, X=h["X"], y=h["y"], seen=int(h["seen"]))
+    try:
+        with np.load(_path(model_dir, "cursor.npz")) as h:
+            hashes = {name: h[name] for name in h.files}
+    except FileNotFoundError:
+        hashes = {}
+    return state, clf, history, hashes
+
+def publish(clf, state, history, hashes, model_dir=MODEL_DIR):
+    """Write model + checkpoint, then flip LATEST (the only file readers watch)"""
+    import joblib
+    from predictor_service import FlatForest
+    from model_store import save_flat
+    os.makedirs(model_dir, exist_ok=True)
+    stem = f"model-{state['version']:06d}"
+    name = stem + ".pkl"
+    # The pickle is only for the next warm_start run; serving maps the .flat copy
+    joblib.dump(clf, _path(model_dir, name) + ".tmp")
+    os.replace(_path(model_dir, name) + ".tmp", _path(model_dir, name))
+    save_flat(FlatForest.from_sklearn(clf), _path(model_dir, stem + ".flat"))
+    np.savez(_path(model_dir, "history.tmp.npz"), X=history.X, y=history.y, seen=history.seen)
+    os.replace(_path(model_dir, "history.tmp.npz"), _path(model_dir, "history.npz"))
+    np.savez(_path(model_dir, "cursor.tmp.npz"), **hashes)
+    os.replace(_path(model_dir, "cursor.tmp.npz"), _path(model_dir, "cursor.npz"))
+    state = dict(state, model=name, created=time.time())
+    _write_atomic(_path(model_dir, "state.json"), json.dumps(state))
+    _write_atomic(_path(model_dir, LATEST_FILE), stem)
+    # Keep a few old versions around for rollback
+    versions = sorted(f[:-4] for f in os.listdir(model_dir) if f.startswith("model-") and f.endswith(".pkl"))
+    for old in versions[:-KEEP_VERSIONS]:
+        os.remove(_path(model_dir, old + ".pkl"))
+        shutil.rmtree(_path(model_dir, old + ".flat"), ignore_errors=True)
+    return _path(model_dir, name)
+
+# -------- New Rows -------- #
+def iter_new(store, cursor, hashes, chunk_rows=CHUNK_ROWS):
+    """Yield the rows earlier runs haven't read, updating `cursor` ({segment: rows read}) and `hashes` (rows read from mergeable segments)"""
+    from result_follower import content_hashes, drop_seen
+    store.refresh()
+    segments = [(s["name"], s["rows"]) for s in store.manifest["segments"]]
+    segments.append((store.manifest["active"], None))
+    live = {name for name, _ in segments}
+    gone = [hashes.pop(name) for name in list(hashes) if name not in live]
+    for name in [name for name in cursor if name not in live]:
+        del cursor[name]
+    seen = np.concatenate(gone) if gone else np.empty(0, dtype=np.uint64)
+    mergeable = store.segment_rows * store.compact_every
+    for name, n in segments:
+        data = store._map(name, n)
+        new = data[cursor.get(name, 0):]
+        small = n is None or n < mergeable
+        if small or (name not in cursor and len(seen)):
+            new = np.array(new)
+            h = content_hashes(new)
+        if name not in cursor and len(seen):
+            # Made by compaction (or sealed since): drop rows its vanished sources gave, each once
+            keep = drop_seen(np.arange(len(new)), seen, h)
+            seen = drop_seen(seen, np.delete(h, keep), seen)
+            new = new[keep]
+        if small:
+            hashes[name] = np.concatenate([hashes.get(name, np.empty(0, dtype=np.uint64)), h])
+        else:
+            hashes.pop(name, None)      # never compacted again
+        cursor[name] = len(data)
+        for i in range(0, len(new), chunk_rows):
+            yield np.array(new[i:i + chunk_rows])
+
+# -------- Training -------- #
+def update(store=None, model_dir=MODEL_DIR, full=False, trees=TREES_PER_UPDATE, max_trees=MAX_TREES,
+           n_jobs=-1, seed=42):
+    """Train on rows stored since the last run (everything when `full`); returns the new version's path or None"""
+    from sklearn.ensemble import RandomForestClassifier
+    store = store if store is not None else default_store()
+    state, clf, history, hashes = load_state(model_dir)
+    if state is not None and state.get("features") != FEATURE_NAMES and not full:
+        # Trees and reservoir were fitted on other columns; they can't be extended
+        print("⚠️ The model was trained on different features; rebuilding from the whole history")
+        full = True
+    if state is not None and not isinstance(state["cursor"], dict) and not full:
+        print("⚠️ The last run kept a timestamp cursor, which misses late rows; rebuilding from the whole history")
+        full = True
+    if full or state is None:
+        # Version numbers keep increasing across full rebuilds
+        version = state["version"] if state else 0
+        state = {"version": version, "cursor": {}, "tails": {}, "windows": {}, "rows": 0}
+        history = Reservoir(HISTORY_ROWS, seed)
+        clf, hashes = None, {}
+
+    # Stream the new rows in chunks: label them, keep a bounded sample
+    sample = Reservoir(MAX_NEW_ROWS, seed + state["version"])
+    builder = FeatureBuilder(state["windows"])
+    rows, cursor = 0, dict(state["cursor"])
+    for chunk in iter_new(store, cursor, hashes):
+        X, y = label_chunk(chunk, state["tails"], builder=builder)
+        sample.add(X, y)
+        rows += len(chunk)
+    if rows == 0:
+        print("✅ No new results since the last training run")
+        return None
+
+    X = np.concatenate([sample.X, history.X])
+    y = np.concatenate([sample.y, history.y])
+    if len(np.unique(y)) < 2:
+        # A forest can't grow trees for a class it has never seen
+        print(f"⚠️ {rows} new rows but only one class so far; model not updated")
+        return None
+
+    start = time.perf_counter()
+    # warm_start draws the new trees' seeds after len(estimators_) others; once old trees are
+    # trimmed that count stops growing, so a fixed seed would regrow the same trees every run
+    version = state["version"] + 1
+    if clf is None:
+        clf = RandomForestClassifier(n_estimators=INITIAL_TREES, warm_start=True, n_jobs=n_jobs,
+                                     random_state=seed + version)
+    else:
+        clf.set_params(n_estimators=len(clf.estimators_) + trees, n_jobs=n_jobs, random_state=seed + version)
+    clf.fit(X, y)
+    if len(clf.estimators_) > max_trees:
+        clf.estimators_ = clf.estimators_[-max_trees:]
+        clf.set_params(n_estimators=max_trees)
+    fit_s = time.perf_counter() - start
+
+    history.add(sample.X, sample.y)
+    state.update(version=version, cursor=cursor, rows=state["rows"] + rows,
+                 windows=builder.to_state(), features=FEATURE_NAMES)
+    path = publish(clf, state, history, hashes, model_dir)
+    print(f"✅ Model v{state['version']}: {rows} new rows, {len(X)} trained on, "
+          f"{len(clf.estimators_)} trees, fit {fit_s:.1f} s -> {path}")
+    return path
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Incrementally train the degradation model")
+    parser.add_argument("--full", action="store_true", help="rebuild from the whole history")
+    parser.add_argument("--trees", type=int, default=TREES_PER_UPDATE)
+    parser.add_argument("--max-trees", type=int, default=MAX_TREES)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+    update(model_dir=args.model_dir, full=args.full, trees=args.trees, max_trees=args.max_trees)
@@ -0,0 +1,286 @@
+"""Staged test pipeline: measure -> enrich -> persist on threads joined by bounded queues, with a coalescing UI tap"""
+import time, threading
+from collections import deque
+import numpy as np
+from instrumentation import span, count, gauge
+
+BLOCK, DROP_OLDEST, COALESCE = "block", "drop_oldest", "coalesce"
+POLICY_POLL = 0.25    # seconds; how often an adaptive Ticker re-reads its interval
+
+# -------- Queues -------- #
+class StageQueue:
+    """Bounded FIFO between two stages; when full it blocks, drops the oldest item or merges with merge(old, new)"""
+
+    def __init__(self, maxsize=1024, policy=BLOCK, merge=None):
+        if policy not in (BLOCK, DROP_OLDEST, COALESCE):
+            raise ValueError(f"unknown queue policy {policy!r}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.merge = merge or (lambda old, new: new)
+        self.items = deque()
+        self.closed = False
+        self.cond = threading.Condition()
+        self.put_count = self.dropped = self.coalesced = self.high_water = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.closed:
+                return False
+            self.put_count += 1
+            if len(self.items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                    count("queue_dropped")
+                elif self.policy == COALESCE:
+                    self.items[-1] = self.merge(self.items[-1], item)
+                    self.coalesced += 1
+                    count("queue_coalesced")
+                    self.cond.notify()
+                    return True
+                else:
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return False
+            self.items.append(item)
+            self.high_water = max(self.high_water, len(self.items))
+            self.cond.notify_all()
+            return True
+
+    def get_batch(self, max_items=1, max_delay=0.0, timeout=None):
+        """Up to `max_items` items collected for at most `max_delay` s; [] on timeout, None once closed and drained"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return []
+            if not self.items:
+                return None
+            deadline = time.monotonic() + max_delay
+            while len(self.items) < max_items and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.cond.wait(remaining):
+                    break
+            batch = [self.items.popleft() for _ in range(min(max_items, len(self.items)))]
+            self.cond.notify_all()
+            return batch
+
+    def close(self):
+        """No more puts; consumers drain what is left and then get None"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self):
+        return {"depth": len(self.items), "put": self.put_count, "dropped": self.dropped,
+                "coalesced": self.coalesced, "high_water": self.high_water}
+
+# -------- Stages -------- #
+class Stage(threading.Thread):
+    """Calls func(batch) on batches from `inbox`, puts non-None results on `outputs` and closes them when drained"""
+
+    def __init__(self, name, func, inbox, outputs=(), batch=1, max_delay=0.0):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outputs = list(outputs)
+        self.batch = batch
+        self.max_delay = max_delay
+        self.items = self.batches = self.errors = 0
+        self.busy = 0.0
+
+    def run(self):
+        while True:
+            batch = self.inbox.get_batch(self.batch, self.max_delay)
+            if batch is None:
+                break
+            start = time.perf_counter()
+            try:
+                with span(f"stage_{self.name}"):
+                    result = self.func(batch)
+            except Exception as e:
+                # One bad batch must not stop the stages behind it
+                self.errors += 1
+                print(f"❌ {self.name} stage: {e}")
+                result = None
+            self.busy += time.perf_counter() - start
+            self.items += len(batch)
+            self.batches += 1
+            if result is not None:
+                for q in self.outputs:
+                    q.put(result)
+        for q in self.outputs:
+            q.close()
+
+    def stats(self):
+        return {"items": self.items, "batches": self.batches, "errors": self.errors,
+                "busy_s": round(self.busy, 3)}
+
+class Ticker(threading.Thread):
+    """Source stage: measure() at base + k * period (seconds, or a function for adaptive scheduling), skipping overrun slots"""
+
+    def __init__(self, name, measure, period, outputs=(), count=None):
+        super().__init__(name=name, daemon=True)
+        self.measure = measure
+        self.period = period
+        self.outputs = list(outputs)
+        self.count = count
+        self.stopped = threading.Event()
+        self.items = self.skipped = self.errors = 0
+        self.late = []             # start time - scheduled slot, seconds
+
+    def run(self):
+        base = time.monotonic()
+        slot = 0
+        started = None
+        while not self.stopped.is_set() and (self.count is None or self.items < self.count):
+            if callable(self.period):
+                due = base if started is None else self._wait_adaptive(started)
+                if due is None:
+                    break
+            else:
+                due = base + slot * self.period
+                if self.stopped.wait(max(0.0, due - time.monotonic())):
+                    break
+            started = time.monotonic()
+            self.late.append(started - due)
+            try:
+                with span(f"stage_{self.name}"):
+                    result = self.measure()
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ {self.name} stage: {e}")
+                result = None
+            self.items += 1
+            if result is not None:
+                for q in self.outputs:
+                    q.put(result)
+            if callable(self.period):
+                continue
+            # Next slot that is still in the future
+            nxt = max(slot + 1, int((time.monotonic() - base) / self.period) + 1) if self.period else slot + 1
+            self.skipped += nxt - slot - 1
+            slot = nxt
+        for q in self.outputs:
+            q.close()
+
+    def _wait_adaptive(self, started):
+        """Sleep until started + period(); returns that time, or None if stopped meanwhile"""
+        while True:
+            due = started + self.period()
+            remaining = due - time.monotonic()
+            if remaining <= 0:
+                return due
+            if self.stopped.wait(min(remaining, POLICY_POLL)):
+                return None
+
+    def stop(self):
+        self.stopped.set()
+
+    def stats(self):
+        late = np.array(self.late) * 1000 if self.late else np.zeros(1)
+        return {"items": self.items, "skipped": self.skipped, "errors": self.errors,
+                "late_p50_ms": round(float(np.percentile(late, 50)), 3),
+                "late_max_ms": round(float(late.max()), 3)}
+
+# -------- Pipeline -------- #
+class Pipeline:
+    """A source Ticker plus downstream Stages and the queues between them"""
+
+    def __init__(self):
+        self.source = None
+        self.stages = []
+        self.queues = {}
+
+    def queue(self, name, maxsize=1024, policy=BLOCK, merge=None):
+        q = self.queues[name] = StageQueue(maxsize, policy, merge)
+        gauge(f"queue_depth_{name}", lambda: len(q.items))
+        return q
+
+    def add(self, stage):
+        if isinstance(stage, Ticker):
+            self.source = stage
+        else:
+            self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self.source.start()
+        return self
+
+    def running(self):
+        return any(s.is_alive() for s in [self.source] + self.stages)
+
+    def stop(self, timeout=None):
+        """Stop measuring, then let the other stages drain what is queued"""
+        self.source.stop()
+        for q in self.source.outputs:
+            # An in-flight measurement is abandoned rather than waited for
+            q.close()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def join(self):
+        self.source.join()
+        for stage in self.stages:
+            stage.join()
+
+    def stats(self):
+        out = {s.name: s.stats() for s in [self.source] + self.stages}
+        out.update({f"queue:{name}": q.stats() for name, q in self.queues.items()})
+        return out
+
+    def print_stats(self):
+        for name, s in self.stats().items():
+            print(f"  {name:<16} " + ", ".join(f"{k}={v}" for k, v in s.items()))
+
+# -------- Test Pipeline -------- #
+def concat_records(old, new):
+    return np.concatenate([old, new])
+
+def test_pipeline(measure, store, target, period, predictor=None, detector=None, count=None,
+                  persist_batch=64, ui=True, policy=None):
+    """measure() every `period` s -> predictor/detector -> `store`, plus a coalesced UI queue; returns (pipeline, ui_queue)"""
+    from wifi_store import to_records, flag_bits
+    pipe = Pipeline()
+    measured = pipe.queue("measured", 4096)
+    enriched = pipe.queue("enriched", 4096)
+    outputs = [enriched]
+    ui_queue = None
+    if ui is True:
+        # One pending update at most: everything not yet drawn is merged into it
+        ui_queue = pipe.queue("ui", 1, COALESCE, concat_records)
+    elif ui:
+        ui_queue = pipe.queues["ui"] = ui
+        gauge("queue_depth_ui", lambda: len(ui.items))
+    if ui_queue is not None:
+        outputs.append(ui_queue)
+    target_id = store.target_id(target)
+    if predictor is not None:
+        from features import FeatureBuilder
+        features = FeatureBuilder()
+        features.prime(store, target_id)
+
+    def enrich(samples):
+        # The batch becomes one records array; its features are built column-wise for the model
+        records = to_records(samples, target_id)
+        if predictor is not None:
+            records["predicted_degraded"] = predictor.predict_batch(features.transform(records))
+        flagged = [detector.update(m) for m in samples] if detector is not None else [None] * len(samples)
+        if detector is not None:
+            records["flags"] |= np.array([flag_bits(f) for f in flagged], dtype=np.uint8)
+        if policy is not None:
+            for m, f, predicted in zip(samples, flagged, records["predicted_degraded"]):
+                policy.observe(target, m, f, predicted)
+        return records
+
+    def persist(batches):
+        store.append_records(np.concatenate(batches))
+
+    if policy is not None:
+        period = lambda: policy.interval(target)
+    pipe.add(Ticker("measure", measure, period, [measured], count))
+    pipe.add(Stage("enrich", enrich, measured, outputs, batch=64))
+    pipe.add(Stage("persist", persist, enriched, batch=persist_batch, max_delay=0.5))
+    return pipe, ui_queue
@@ -1,21 +1,11 @@
-import pandas as pd
 import matplotlib.pyplot as plt
+from wifi_store import default_store
+from rollups import load_report_data
 
-# -------- Load Results -------- #
-file_name = "wifi_results.csv"
-df = pd.read_csv(file_name)
-
-# -------- Convert timestamp to datetime -------- #
-df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-# -------- Detect anomalies (same logic as framework) -------- #
-def detect_anomalies(df, metric):
-    values = df[metric].dropna()
-    if len(values) < 2:
-        return []
-    mean = values.mean()
-    std = values.std()
-    return df.loc[(df[metric] - mean).abs() > 2 * std]
+# -------- Load Results + Detect Anomalies -------- #
+# Raw rows (same detector as the framework) for short histories; for long
+# ones, per-bucket means from the coarsest rollup level with ~2000 buckets
+df, masks, _ = load_report_data(default_store(), points=2000)
 
 # -------- Plot Metrics with Anomalies -------- #
 metrics = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
@@ -26,7 +16,7 @@ for metric in metrics:
         plt.plot(df["timestamp"], df[metric], marker="o", label=metric)
 
         # Highlight anomalies
-        anomalies = detect_anomalies(df, metric)
+        anomalies = df.loc[masks[metric]]
         if not anomalies.empty:
             plt.scatter(anomalies["timestamp"], anomalies[metric], 
                         color="red", s=100, label="Anomaly", zorder=5)
@@ -1,9 +1,8 @@
-import pandas as pd
 import matplotlib.pyplot as plt
+from result_query import ResultQuery
 
-# Load results from CSV
-file_name = "wifi_results.csv"
-df = pd.read_csv(file_name)
+# Only the two plotted columns are read and converted
+df = ResultQuery().frame(columns=["timestamp", "throughput_mbps"])
 
 print("📊 Data loaded:")
 print(df.head())
@@ -0,0 +1,308 @@
+import os, sys, time, queue, threading
+from concurrent.futures import Future
+import numpy as np
+from instrumentation import span
+
+FEATURES = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
+PREDICT_CHUNK = 4096       # rows scored at once by FlatForest (memory ~ rows * trees * 40 B)
+SKLEARN_ROWS = 2048        # batches this large go to the sklearn forest (FlatForest is faster below)
+
+# -------- Flat Forest -------- #
+class FlatForest:
+    """
+    A fitted RandomForestClassifier exported to flat NumPy arrays.
+
+    All trees' nodes live in one set of arrays, so scoring a batch walks
+    every (sample, tree) pair one level per step with vectorized indexing,
+    without sklearn. Predictions match RandomForestClassifier.predict.
+    Input columns past `n_features` are ignored (feature sets only ever
+    grow at the end, see features.FEATURE_NAMES). Batches of SKLEARN_ROWS
+    or more are handed to the sklearn forest (`sklearn`, or the path of its
+    pickle, unpickled on first use) when there is one.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, classes, is_leaf=None,
+                 n_features=None, sklearn=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.classes = classes
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+        self.n_features = n_features
+        self.sklearn = sklearn
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        feature, threshold, left, right, missing, value, roots = [], [], [], [], [], [], []
+        offset = 0
+        n_classes = len(forest.classes_)
+        for est in forest.estimators_:
+            t = est.tree_
+            is_leaf = t.children_left < 0
+            roots.append(offset)
+            feature.append(np.where(is_leaf, 0, t.feature))
+            threshold.append(t.threshold)
+            # Leaves point at themselves, which is how is_leaf is derived
+            node_ids = np.arange(t.node_count) + offset
+            left.append(np.where(is_leaf, node_ids, t.children_left + offset))
+            right.append(np.where(is_leaf, node_ids, t.children_right + offset))
+            missing.append(getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=np.uint8)).astype(bool))
+            # Same per-tree normalisation as DecisionTreeClassifier.predict_proba
+            v = t.value[:, 0, :n_classes].astype(np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0] = 1.0
+            value.append(v / norm)
+            offset += t.node_count
+        return cls(
+            np.concatenate(feature).astype(np.intp),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.intp),
+            np.concatenate(right).astype(np.intp),
+            np.concatenate(missing),
+            np.concatenate(value),
+            np.asarray(roots, dtype=np.intp),
+            np.asarray(forest.classes_),
+            n_features=int(forest.n_features_in_),
+            sklearn=forest,
+        )
+
+    def _forest(self):
+        """The sklearn forest these arrays were exported from, or None"""
+        if isinstance(self.sklearn, str):
+            import joblib
+            try:
+                forest = joblib.load(self.sklearn)
+            except (OSError, ValueError, EOFError):
+                forest = None
+            # A pickle retrained after the export would score differently by batch size
+            same = (forest is not None and len(forest.estimators_) == len(self.roots)
+                    and sum(e.tree_.node_count for e in forest.estimators_) == len(self.left))
+            self.sklearn = forest if same else None
+        return self.sklearn
+
+    def apply(self, X):
+        """Leaf index of every (sample, tree) pair"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n, n_trees = len(X), len(self.roots)
+        nodes = np.tile(self.roots, n)
+        sample = np.repeat(np.arange(n), n_trees)
+        active = np.arange(n * n_trees)
+        # Each step moves every unfinished walk one level down, then drops
+        # the walks that reached a leaf
+        while active.size:
+            node = nodes[active]
+            x = X[sample[active], self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+            nodes[active] = node
+            active = active[~self.is_leaf[node]]
+        return nodes.reshape(n, n_trees)
+
+    def predict_proba(self, X, chunk_rows=PREDICT_CHUNK):
+        X = np.asarray(X)
+        if self.n_features is not None and X.ndim == 2 and X.shape[1] != self.n_features:
+            if X.shape[1] < self.n_features:
+                raise ValueError(f"model expects {self.n_features} features, got {X.shape[1]}")
+            X = X[:, :self.n_features]
+        if len(X) >= SKLEARN_ROWS and self._forest() is not None:
+            return self.sklearn.predict_proba(X)
+        proba = np.empty((len(X), self.value.shape[1]))
+        # apply() keeps one walk per (sample, tree): bound it by scoring in chunks
+        for start in range(0, len(X), chunk_rows):
+            leaves = self.apply(X[start:start + chunk_rows])
+            out = np.zeros((len(leaves), self.value.shape[1]))
+            # Accumulate tree by tree, in the same order as sklearn
+            for t in range(leaves.shape[1]):
+                out += self.value[leaves[:, t]]
+            proba[start:start + chunk_rows] = out / leaves.shape[1]
+        return proba
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+# -------- Micro-batching Service -------- #
+class MicroBatchPredictor:
+    """
+    Collects predict requests from any number of threads and scores them
+    together: a batch closes after `max_batch` items or `max_delay` seconds
+    after its first item, whichever comes first. A request that finds no
+    other queued is scored at once.
+    """
+
+    def __init__(self, model, max_batch=256, max_delay=0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def set_model(self, model):
+        """Swap the model; batches already being scored finish on the old one"""
+        with self._lock:
+            self.model = model
+
+    def submit(self, features):
+        fut = Future()
+        self._queue.put((features, fut))
+        return fut
+
+    def predict(self, features):
+        """Blocking single-sample predict (batched with concurrent callers)"""
+        return self.submit(features).result()
+
+    def predict_batch(self, X):
+        """Score a batch the caller already collected, without queueing it"""
+        with self._lock:
+            model = self.model
+        with span("predict_batch"):
+            return model.predict(np.asarray(X, dtype=float))
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # A lone request is scored at once; the linger only helps when others are already queued
+            deadline = time.monotonic() + (self.max_delay if not self._queue.empty() else 0)
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            X = np.array([features for features, _ in batch], dtype=float)
+            with self._lock:
+                model = self.model
+            try:
+                with span("predict_batch"):
+                    preds = model.predict(X)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), pred in zip(batch, preds):
+                fut.set_result(pred)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+# -------- Shared Predictor -------- #
+ML_MODEL_FILE = "wifi_rf_model.pkl"
+MODEL_DIR = "models"          # versioned models written by online_training.py
+LATEST_FILE = "LATEST"        # name of the current version inside MODEL_DIR
+_predictor = None
+_loaded = None                # path of the model the predictor is serving
+
+_watcher = None
+
+def latest_model_file(model_dir=MODEL_DIR):
+    """Path stem (no extension) of the current published version, or None"""
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(model_dir, name[:-4] if name.endswith(".pkl") else name)
+
+def get_predictor(model_file=ML_MODEL_FILE, watch=False):
+    """
+    Load the model on first use and return the process-wide predictor.
+    Models are memory-mapped from their .flat copy when there is one (see
+    model_store). With watch=True, newly published versions are swapped in
+    by a background thread.
+    """
+    global _predictor, _watcher
+    from model_store import load_model, ModelWatcher
+    if _predictor is None:
+        # The newest trained version wins over the single-file model
+        loaded = latest_model_file() or model_file
+        _predictor = MicroBatchPredictor(load_model(loaded))
+        _watcher = ModelWatcher(_predictor, current=loaded)
+    if watch and not _watcher._thread.is_alive():
+        _watcher.start()
+    return _predictor
+
+def refresh_predictor(model_dir=MODEL_DIR):
+    """Hot-swap to a newer published version, if any; True if the model changed"""
+    if _predictor is None:
+        return False
+    _watcher.model_dir = model_dir
+    return _watcher.check()
+
+# -------- Benchmark -------- #
+def benchmark(n_samples=20000, n_single=500, threads=32):
+    import warnings
+    from sklearn.ensemble import RandomForestClassifier
+    warnings.filterwarnings("ignore")
+
+    rng = np.random.default_rng(0)
+    X_train = rng.gamma(2.0, 10.0, (5000, 4))
+    y_train = ((X_train[:, 1] > 40) | (X_train[:, 0] < 8)).astype(int)
+    clf = RandomForestClassifier(n_estimators=100, random_state=42).fit(X_train, y_train)
+    flat = FlatForest.from_sklearn(clf)
+    X = rng.gamma(2.0, 10.0, (n_samples, 4))
+
+    start = time.perf_counter()
+    for row in X[:n_single]:
+        clf.predict([row])
+    per_call = n_single / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in X[:n_single]:
+        flat.predict([row])
+    flat_per_call = n_single / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    sk = clf.predict(X)
+    sk_batch = n_samples / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    fl = flat.predict(X)
+    flat_batch = n_samples / (time.perf_counter() - start)
+
+    service = MicroBatchPredictor(flat)
+    per_thread = n_samples // threads
+    results = [None] * threads
+
+    def worker(i):
+        rows = X[i * per_thread:(i + 1) * per_thread]
+        results[i] = [service.predict(r) for r in rows]
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    service_rate = per_thread * threads / (time.perf_counter() - start)
+    service.close()
+    served = np.concatenate(results)
+
+    identical = np.array_equal(sk, fl) and np.array_equal(sk[:len(served)], served)
+    print(f"per-sample clf.predict     : {per_call:>12,.0f} predictions/s")
+    print(f"per-sample FlatForest      : {flat_per_call:>12,.0f} predictions/s")
+    print(f"batched clf.predict        : {sk_batch:>12,.0f} predictions/s")
+    print(f"batched FlatForest         : {flat_batch:>12,.0f} predictions/s")
+    print(f"micro-batch service ({threads} thr): {service_rate:>9,.0f} predictions/s")
+    print(f"identical predictions      : {identical}")
+    return identical
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        sys.exit(0 if benchmark() else 1)
+    print("usage: python predictor_service.py --bench")
@@ -1,55 +1,25 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from wifi_store import default_store, ANOMALY_FLAGS
+from anomaly_detector import AnomalyDetector
+from result_follower import ResultFollower
+from dashboard_engine import LiveDashboard
 
-file_name = "wifi_results.csv"
-
-# -------- Load Data Function -------- #
-def load_data():
-    try:
-        df = pd.read_csv(file_name)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        return df
-    except Exception:
-        return pd.DataFrame()
-
-# -------- Anomaly Detection -------- #
-def detect_anomalies(series):
-    if len(series) < 2:
-        return []
-    mean = series.mean()
-    std = series.std()
-    return series[(series - mean).abs() > 2 * std]
+# -------- Follow New Results -------- #
+# Only rows appended since the last refresh are read; the most recent
+# `capacity` rows are kept in memory and flagged as they arrive
+follower = ResultFollower(default_store(), capacity=100000, detector=AnomalyDetector())
 
 # -------- Plot Setup -------- #
+# Artists are created once and blitted; long histories are min/max decimated
 metrics = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
-fig, axs = plt.subplots(len(metrics), 1, figsize=(10, 12))
-plt.subplots_adjust(hspace=0.5)
+dashboard = LiveDashboard(metrics, figsize=(10, 12))
 
-# -------- Animation Function -------- #
-def update(frame):
-    df = load_data()
-    if df.empty:
+# -------- Refresh Function -------- #
+def update(force=False):
+    new = follower.poll()
+    if len(follower.ring) == 0 or (not force and len(new) == 0):
         return
-    
-    for i, metric in enumerate(metrics):
-        axs[i].clear()
-        axs[i].set_title(f"Real-Time Wi-Fi Performance: {metric}")
-        axs[i].set_xlabel("Time")
-        axs[i].set_ylabel(metric)
-
-        if metric in df.columns:
-            axs[i].plot(df["timestamp"], df[metric], marker="o", label=metric)
-
-            # highlight anomalies
-            anomalies = detect_anomalies(df[metric].dropna())
-            if not anomalies.empty:
-                anomaly_points = df.loc[df[metric].isin(anomalies)]
-                axs[i].scatter(anomaly_points["timestamp"], anomaly_points[metric], 
-                               color="red", s=80, label="Anomaly", zorder=5)
-
-            axs[i].legend()
+    dashboard.update_records(follower.records(), ANOMALY_FLAGS)
 
-# -------- Start Animation -------- #
-ani = FuncAnimation(fig, update, interval=2000)  # refresh every 2 sec
-plt.show()
+# -------- Start Dashboard -------- #
+update(force=True)
+dashboard.run(update, interval=2000)  # refresh every 2 sec
@@ -0,0 +1,196 @@
+import os, io, hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dashboard_engine import minmax_decimate, ns_to_days, MARKER_POINTS
+
+# ----------------- Configuration ----------------- #
+CACHE_DIR = ".report_cache"
+REPORT_POINTS = 1000      # min/max buckets per plot (about the plot's pixel width)
+MAX_MARKERS = 2000        # anomaly / prediction dots drawn per plot
+STYLE = {"figsize": (8, 4), "dpi": 100, "version": 2}
+SECTION_FIGSIZE = (11, 7.5)   # one grid of all metrics per streamed report page
+# Fixed margins for the section grid: tight_layout costs a second full draw per page
+SECTION_MARGINS = {"left": 0.07, "right": 0.98, "bottom": 0.12, "top": 0.96, "hspace": 0.55, "wspace": 0.22}
+
+# -------- Plot Jobs -------- #
+def _thin(x, y, limit=MAX_MARKERS):
+    if len(x) <= limit:
+        return x, y
+    keep = np.linspace(0, len(x) - 1, limit).astype(int)
+    return x[keep], y[keep]
+
+def make_job(metric, timestamps, values, anomaly_mask=None, predicted_mask=None):
+    """Downsample one metric's series into a small, picklable plot job"""
+    x = ns_to_days(timestamps)
+    y = np.asarray(values, dtype=float)
+    xd, yd = minmax_decimate(x, y, REPORT_POINTS)
+    job = {"metric": metric, "x": xd, "y": yd, "rows": len(x),
+           "t_range": (int(timestamps[0]), int(timestamps[-1])) if len(x) else (0, 0)}
+    if anomaly_mask is not None:
+        job["anomalies"] = _thin(x[anomaly_mask], y[anomaly_mask])
+    if predicted_mask is not None:
+        job["predicted"] = _thin(x[predicted_mask], y[predicted_mask])
+    return job
+
+def bucket_job(metric, rows, width, predicted=False):
+    """
+    A plot job from rollup bucket rows (rollups.StreamingStats): each bucket's
+    min and max at its midpoint, like minmax_decimate, and markers at the
+    mean of buckets holding anomalies / predicted degradations.
+    """
+    r = rows[rows[f"{metric}_count"] > 0]
+    t = r["bucket"] + width // 2
+    mean = r[f"{metric}_sum"] / r[f"{metric}_count"]
+    job = {"metric": metric, "x": ns_to_days(np.repeat(t, 2)),
+           "y": np.column_stack([r[f"{metric}_min"], r[f"{metric}_max"]]).astype(float).ravel(),
+           "rows": int(r["rows"].sum()), "t_range": (int(r["bucket"][0]), int(r["bucket"][-1])) if len(r) else (0, 0)}
+    hit = r[f"{metric}_anomalies"] > 0
+    job["anomalies"] = _thin(ns_to_days(t[hit]), mean[hit])
+    if predicted:
+        hit = r["predicted"] > 0
+        job["predicted"] = _thin(ns_to_days(t[hit]), mean[hit])
+    return job
+
+def job_key(job):
+    """Cache key: data range, metric, style and the (small) downsampled data"""
+    h = hashlib.sha256()
+    h.update(repr((job["metric"], job["rows"], job["t_range"], sorted(STYLE.items()))).encode())
+    for name in ("x", "y"):
+        h.update(np.ascontiguousarray(job[name]).tobytes())
+    for name in ("anomalies", "predicted"):
+        if name in job:
+            h.update(name.encode())
+            for arr in job[name]:
+                h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+def section_key(section):
+    """Cache key of a section page: its title, layout and the keys of its panels"""
+    h = hashlib.sha256(repr((section["title"], SECTION_FIGSIZE, sorted(SECTION_MARGINS.items()),
+                             sorted(STYLE.items()))).encode())
+    for job in section["panels"]:
+        h.update(job_key(job).encode())
+    return h.hexdigest()
+
+# -------- Rendering -------- #
+def _draw(ax, job, title):
+    metric = job["metric"]
+    ax.plot(job["x"], job["y"], marker="o" if len(job["x"]) <= MARKER_POINTS else "", label=metric)
+    if "anomalies" in job and len(job["anomalies"][0]):
+        ax.scatter(*job["anomalies"], color="red", s=80, label="Anomaly", zorder=3)
+    if "predicted" in job and len(job["predicted"][0]):
+        ax.scatter(*job["predicted"], color="orange", s=80, label="Predicted Degradation", zorder=3)
+    ax.xaxis_date()
+    ax.set_title(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel(metric)
+    ax.tick_params(axis="x", rotation=45)
+    ax.legend()
+
+def _png(fig, tight=True):
+    # A bare Figure draws with Agg without touching pyplot's backend or figure list
+    if tight:
+        fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=STYLE["dpi"])
+    return buf.getvalue()
+
+def render_job(job):
+    """Render one metric figure to PNG bytes (runs inside a pool worker)"""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=STYLE["figsize"])
+    _draw(fig.subplots(), job, f"Wi-Fi Performance: {job['metric']}")
+    return _png(fig)
+
+_section_figures = {}   # panel count -> (figure, axes, artists), reused by every section a process renders
+
+def _section_figure(n):
+    """A grid figure for n panels, built once per process: new axes and ticks cost more than a redraw"""
+    if n not in _section_figures:
+        from matplotlib.figure import Figure
+        ncols = min(2, n)
+        fig = Figure(figsize=SECTION_FIGSIZE)
+        axes = fig.subplots(-(-n // ncols), ncols, squeeze=False).flat
+        artists = []
+        for ax in axes[:n]:
+            artists.append((ax.plot([], [])[0], ax.scatter([], [], color="red", s=80, zorder=3),
+                            ax.scatter([], [], color="orange", s=80, zorder=3)))
+            ax.xaxis_date()
+            ax.set_xlabel("Time")
+            ax.tick_params(axis="x", rotation=45)
+        for ax in axes[n:]:
+            ax.set_visible(False)
+        fig.subplots_adjust(**SECTION_MARGINS)
+        _section_figures[n] = (fig, axes[:n], artists)
+    return _section_figures[n]
+
+def render_section(section):
+    """Render every panel of a section into one grid figure (one image per page)"""
+    panels = section["panels"]
+    fig, axes, artists = _section_figure(len(panels))
+    for ax, (line, anomalies, predicted), job in zip(axes, artists, panels):
+        metric = job["metric"]
+        line.set_data(job["x"], job["y"])
+        line.set_marker("o" if len(job["x"]) <= MARKER_POINTS else "")
+        line.set_label(metric)
+        for dots, name, label in ((anomalies, "anomalies", "Anomaly"), (predicted, "predicted", "Predicted Degradation")):
+            x, y = job.get(name, ((), ()))
+            dots.set_offsets(np.column_stack([x, y]) if len(x) else np.empty((0, 2)))
+            dots.set_label(label if len(x) else "_" + label)   # "_" keeps it out of the legend
+        ax.relim()
+        ax.autoscale_view()
+        ax.set_title(metric)
+        ax.set_ylabel(metric)
+        ax.legend()
+    return _png(fig, tight=False)
+
+def render_plots(jobs, workers=None, cache_dir=CACHE_DIR, render=render_job, key=job_key, load=True, pool=None):
+    """
+    Render jobs to PNG bytes, in order. Images already in the cache are
+    reused; the rest are rendered in parallel worker processes (in `pool`
+    if given, so a caller with many batches starts its workers once), or
+    in this process when there is one CPU. With load=False the images are
+    only written to the cache and their paths returned, so a caller can
+    draw them one at a time.
+    """
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    keys = [key(job) for job in jobs]
+    paths = [os.path.join(cache_dir, k + ".png") if cache_dir else None for k in keys]
+    images = [None] * len(jobs)
+    missing = []
+    for i, path in enumerate(paths):
+        if path and os.path.exists(path):
+            if load:
+                with open(path, "rb") as f:
+                    images[i] = f.read()
+        else:
+            missing.append(i)
+
+    workers = workers or min(len(missing), os.cpu_count() or 1)
+    if len(missing) > 1 and pool is not None:
+        rendered = list(pool.map(render, [jobs[i] for i in missing]))
+    elif len(missing) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render, [jobs[i] for i in missing]))
+    else:
+        rendered = [render(jobs[i]) for i in missing]
+
+    for i, png in zip(missing, rendered):
+        if load:
+            images[i] = png
+        if cache_dir:
+            tmp = os.path.join(cache_dir, f"{keys[i]}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(png)
+            os.replace(tmp, paths[i])
+    return images if load else paths
+
+def render_metric_plots(df, metrics, masks, predicted=False, workers=None, cache_dir=CACHE_DIR):
+    """One PNG per metric for a results DataFrame; returns [(metric, png bytes)]"""
+    timestamps = df["timestamp"].values.astype("datetime64[ns]").astype(np.int64)
+    predicted_mask = (df["predicted_degraded"] == 1).values if predicted else None
+    metrics = [m for m in metrics if m in df.columns]
+    jobs = [make_job(m, timestamps, df[m].values, masks.get(m), predicted_mask) for m in metrics]
+    return list(zip(metrics, render_plots(jobs, workers, cache_dir)))
@@ -0,0 +1,224 @@
+import os
+import numpy as np
+from wifi_store import ANOMALY_FLAGS, default_store
+
+# -------- Ring Buffer -------- #
+class RingBuffer:
+    """Fixed-capacity buffer of structured records; the oldest rows fall off"""
+
+    def __init__(self, capacity, dtype):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.start = 0
+        self.size = 0
+
+    def extend(self, records):
+        if len(records) >= self.capacity:
+            self.data[:] = records[-self.capacity:]
+            self.start, self.size = 0, self.capacity
+            return
+        end = (self.start + self.size) % self.capacity
+        first = min(len(records), self.capacity - end)
+        self.data[end:end + first] = records[:first]
+        self.data[:len(records) - first] = records[first:]
+        overflow = max(0, self.size + len(records) - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + len(records))
+
+    def view(self):
+        """Records oldest -> newest (a copy only when the buffer has wrapped)"""
+        end = self.start + self.size
+        if end <= self.capacity:
+            return self.data[self.start:end]
+        return np.concatenate([self.data[self.start:], self.data[:end - self.capacity]])
+
+    def __len__(self):
+        return self.size
+
+# -------- Store Follower -------- #
+def row_hashes(records):
+    """64-bit hash of every record's bytes (identical rows hash alike)"""
+    records = np.ascontiguousarray(records)
+    raw = records.view(np.uint8).reshape(len(records), records.dtype.itemsize).astype(np.uint64)
+    h = np.full(len(records), 1469598103934665603, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for col in raw.T:
+            h = (h ^ col) * np.uint64(1099511628211)
+    return h
+
+def content_hashes(records):
+    """row_hashes ignoring predicted_degraded (backfill rewrites it in place)"""
+    if "predicted_degraded" in records.dtype.names:
+        records = records.copy()
+        records["predicted_degraded"] = 0
+    return row_hashes(records)
+
+def drop_seen(records, seen, hashes=None):
+    """`records` minus the multiset of rows whose content hashes are in `seen`, keeping their order"""
+    h = content_hashes(records) if hashes is None else hashes
+    values, counts = np.unique(seen, return_counts=True)
+    order = np.argsort(h, kind="stable")
+    hs = h[order]
+    rank = np.arange(len(hs)) - np.searchsorted(hs, hs, "left")
+    pos = np.minimum(np.searchsorted(values, hs), max(len(values) - 1, 0))
+    already = np.where(values[pos] == hs, counts[pos], 0) if len(values) else np.zeros(len(hs), dtype=np.int64)
+    return records[np.sort(order[rank >= already])]
+
+class ResultFollower:
+    """
+    Tails the result store like `tail -f`.
+
+    Remembers the byte offset into the active segment and on each poll()
+    parses only the batches appended since whose CRC matches (see
+    SegmentLog), so it never reads a torn or garbled write. A shrinking or
+    replaced file (truncation) restarts the segment from the beginning. Once the
+    followed segment is sealed it is finished from the same offset, and
+    segments sealed after it are read whole. If a compaction merged rows
+    already seen, the new segments are read again minus those rows (by
+    row hash, kept for the segments compaction can still merge).
+    """
+
+    def __init__(self, store=None, capacity=5000, detector=None, backfill=True):
+        self.store = store if store is not None else default_store()
+        self.dtype = self.store.dtype
+        self.ring = RingBuffer(capacity, self.dtype)
+        self.detector = detector
+        self._name = None
+        self._inode = None
+        self._offset = 0
+        self._hashes = []         # hashes of the rows read from the followed segment
+        self._known = {}          # sealed segment -> row hashes (None once too big to be compacted)
+        self.store.refresh()
+        if backfill:
+            self._ingest(self.store.tail(capacity))
+        self._seek_end()
+        for s in self.store.manifest["segments"]:
+            self._remember(s, None)
+
+    def _compactable(self, segment):
+        return segment["rows"] < self.store.segment_rows * self.store.compact_every
+
+    def _remember(self, segment, data):
+        if not self._compactable(segment):
+            self._known[segment["name"]] = None
+            return
+        if data is None:
+            data = np.fromfile(os.path.join(self.store.path, segment["name"]), dtype=self.dtype,
+                               count=segment["rows"])
+        self._known[segment["name"]] = content_hashes(data)
+
+    def _seek_end(self):
+        self._name = self.store.manifest["active"]
+        path = os.path.join(self.store.path, self._name)
+        try:
+            self._inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            self._inode = None
+        self._offset = 0
+        self._hashes = []
+        seen = self._read_active()
+        self._hashes = [content_hashes(seen)] if len(seen) else []
+
+    def _ingest(self, records):
+        if len(records) == 0:
+            return records
+        if self.detector is not None:
+            records = np.array(records)
+            for i, row in enumerate(records):
+                flagged = self.detector.update({m: float(row[m]) for m in self.detector.metrics})
+                for metric in flagged:
+                    records["flags"][i] |= ANOMALY_FLAGS.get(metric, 0)
+        self.ring.extend(records)
+        return records
+
+    def _read_active(self, rows=None):
+        """Checked batches of the followed segment past the offset (up to `rows` once it is sealed)"""
+        path = os.path.join(self.store.path, self._name)
+        batches = self.store.read_batches(self._name) if rows is None else None
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self._inode or st.st_size < self._offset:
+                    # Truncated or replaced: start over from the top of the file
+                    self._inode, self._offset, self._hashes = st.st_ino, 0, []
+                if rows is not None:
+                    end = rows * self.dtype.itemsize
+                elif batches is None:
+                    # Sealed since the manifest was read (or written before checksums)
+                    end = st.st_size - st.st_size % self.dtype.itemsize
+                else:
+                    end = int(batches["end"][-1]) if len(batches) else 0
+                f.seek(self._offset)
+                chunk = f.read(max(end - self._offset, 0))
+        except FileNotFoundError:
+            return np.empty(0, dtype=self.dtype)
+        if batches is not None:
+            # Stop at the first batch whose CRC doesn't match; a writer cuts it on recovery
+            good = 0
+            for batch in batches[np.searchsorted(batches["end"], self._offset, "right"):]:
+                n = int(batch["end"]) - self._offset - good
+                if n > len(chunk) - good or self.store.checksum(chunk[good:good + n]) != batch["crc"]:
+                    break
+                good += n
+            chunk = chunk[:good]
+        chunk = chunk[:len(chunk) - len(chunk) % self.dtype.itemsize]
+        self._offset += len(chunk)
+        records = np.frombuffer(chunk, dtype=self.dtype)
+        if len(records):
+            self._hashes.append(content_hashes(records))
+        return records
+
+    def _read_sealed(self):
+        """Rows of the segments sealed since the last poll that this follower hasn't seen"""
+        segments = self.store.manifest["segments"]
+        live = {s["name"] for s in segments}
+        new = [s for s in segments if s["name"] not in self._known]
+        parts = []
+        if self._name in live and all(name in live for name in self._known):
+            # No compaction touched what we've seen: finish our segment from the
+            # saved offset, then read the ones sealed after it whole
+            for s in new:
+                if s["name"] == self._name:
+                    data = self._read_active(s["rows"])
+                    seen = np.concatenate(self._hashes) if self._hashes else np.empty(0, dtype=np.uint64)
+                    self._known[s["name"]] = seen if self._compactable(s) else None
+                else:
+                    data = np.fromfile(os.path.join(self.store.path, s["name"]), dtype=self.dtype, count=s["rows"])
+                    self._remember(s, data)
+                parts.append(data)
+        else:
+            # Rows we already saw were merged into new segments: re-read those minus the seen rows
+            seen = [h for name, h in self._known.items() if name not in live and h is not None] + self._hashes
+            data = [np.fromfile(os.path.join(self.store.path, s["name"]), dtype=self.dtype, count=s["rows"])
+                    for s in new]
+            for s, d in zip(new, data):
+                self._remember(s, d)
+            if data:
+                data = np.concatenate(data)
+                data = data[np.argsort(data["timestamp"], kind="stable")]
+                parts.append(drop_seen(data, np.concatenate(seen) if seen else np.empty(0, dtype=np.uint64)))
+        for name in [name for name in self._known if name not in live]:
+            del self._known[name]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=self.dtype)
+
+    def poll(self):
+        """Read rows appended since the last poll; returns them (already in the ring)"""
+        self.store.refresh()
+        new = []
+        if self.store.manifest["active"] != self._name:
+            new.append(self._read_sealed())
+            self._name = self.store.manifest["active"]
+            self._inode, self._offset, self._hashes = None, 0, []
+        new.append(self._read_active())
+        records = np.concatenate(new) if len(new) > 1 else new[0]
+        return self._ingest(records)
+
+    def records(self):
+        return self.ring.view()
+
+    def frame(self):
+        """Ring contents as a DataFrame (no CSV or timestamp string parsing)"""
+        return self.store.to_frame(self.ring.view())
+
+    def anomaly_mask(self, metric):
+        return (self.ring.view()["flags"] & ANOMALY_FLAGS[metric]) != 0
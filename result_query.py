@@ -0,0 +1,393 @@
+"""Indexed queries over the result store: per-segment zone maps and target / flag postings in <store>/index/"""
+import os, re, sys, time
+import numpy as np
+from wifi_store import RESULT_DTYPE, TEST_TYPES, ANOMALY_FLAGS, to_ns, default_store
+
+BLOCK_ROWS = 4096
+ZONE_METRICS = ["throughput_mbps", "retransmits", "lost_percent", "jitter_ms", "latency_ms"]
+INDEXED = ["target", "test_type", "flags"]
+POSTINGS_SELECTIVITY = 0.25   # use postings when they cover less than this share of the range
+INDEX_VERSION = 2
+
+OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal,
+       "==": np.equal, "!=": np.not_equal}
+_PREDICATE = re.compile(r"^\s*(\w+)\s*(>=|<=|==|!=|>|<)\s*(\S+)\s*$")
+
+ZONE_DTYPE = np.dtype([("t_min", "<i8"), ("t_max", "<i8"), ("flags", "u1"), ("predicted", "i1"),
+                       ("targets", "<u8"), ("test_types", "u1")] +
+                      [(f"{m}_{s}", "<f4") for m in ZONE_METRICS for s in ("min", "max")])
+
+# -------- Segment Index -------- #
+def _bits(values, width):
+    """One bit per value; values >= width-1 share the top bit (so pruning stays conservative)"""
+    return np.left_shift(np.uint64(1), np.minimum(values, width - 1).astype(np.uint64))
+
+class SegmentIndex:
+    """Zone maps + postings for one immutable sealed segment"""
+
+    def __init__(self, zones, postings):
+        self.zones = zones
+        self.postings = postings      # {field: (values, offsets, rows)}
+
+    @classmethod
+    def build(cls, data):
+        n = len(data)
+        starts = np.arange(0, n, BLOCK_ROWS)
+        zones = np.zeros(len(starts), dtype=ZONE_DTYPE)
+        t = np.asarray(data["timestamp"])
+        zones["t_min"] = np.minimum.reduceat(t, starts)
+        zones["t_max"] = np.maximum.reduceat(t, starts)
+        zones["flags"] = np.bitwise_or.reduceat(np.asarray(data["flags"]), starts)
+        zones["predicted"] = np.maximum.reduceat(np.asarray(data["predicted_degraded"]), starts)
+        zones["targets"] = np.bitwise_or.reduceat(_bits(np.asarray(data["target"]), 64), starts)
+        zones["test_types"] = np.bitwise_or.reduceat(_bits(np.asarray(data["test_type"]), 8), starts)
+        for m in ZONE_METRICS:
+            v = np.asarray(data[m])
+            # fmin/fmax ignore NaN; an all-NaN block stays NaN and fails every comparison
+            zones[f"{m}_min"] = np.fmin.reduceat(v, starts)
+            zones[f"{m}_max"] = np.fmax.reduceat(v, starts)
+        postings = {}
+        for field in INDEXED:
+            col = np.asarray(data[field])
+            rows = np.argsort(col, kind="stable").astype(np.int32)
+            values, first = np.unique(col[rows], return_index=True)
+            postings[field] = (values, np.append(first, n).astype(np.int64), rows)
+        return cls(zones, postings)
+
+    def save(self, prefix):
+        tmp = f"{prefix}.tmp-{os.getpid()}"
+        arrays = {"version": np.array(INDEX_VERSION), "zones": self.zones}
+        for field, (values, offsets, rows) in self.postings.items():
+            np.save(f"{tmp}.{field}.npy", rows)
+            os.replace(f"{tmp}.{field}.npy", f"{prefix}.{field}.npy")
+            arrays[f"{field}_values"], arrays[f"{field}_offsets"] = values, offsets
+        # The .npz goes last: its presence means the index is complete
+        np.savez(tmp + ".npz", **arrays)
+        os.replace(tmp + ".npz", prefix + ".npz")
+
+    @classmethod
+    def load(cls, prefix):
+        with np.load(prefix + ".npz") as f:
+            if int(f["version"]) != INDEX_VERSION:
+                raise ValueError("stale index")
+            zones = f["zones"]
+            postings = {field: (f[f"{field}_values"], f[f"{field}_offsets"],
+                                np.load(f"{prefix}.{field}.npy", mmap_mode="r")) for field in INDEXED}
+        return cls(zones, postings)
+
+    def rows_for(self, field, ids, lo, hi):
+        """Ascending row ids in [lo, hi) whose `field` is one of `ids`"""
+        values, offsets, rows = self.postings[field]
+        parts = []
+        for i in np.flatnonzero(np.isin(values, ids)):
+            r = rows[offsets[i]:offsets[i + 1]]
+            # Stable argsort keeps each group in row order
+            parts.append(r[np.searchsorted(r, lo):np.searchsorted(r, hi)])
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+# -------- Query -------- #
+def parse_predicate(p):
+    """"latency_ms > 50" or ("latency_ms", ">", 50) -> (field, op, value)"""
+    if isinstance(p, str):
+        m = _PREDICATE.match(p)
+        if not m:
+            raise ValueError(f"can't parse predicate {p!r}")
+        field, op, value = m.group(1), m.group(2), float(m.group(3))
+    else:
+        field, op, value = p
+    if field not in RESULT_DTYPE.names or op not in OPS:
+        raise ValueError(f"bad predicate {p!r}")
+    return field, op, value
+
+class _Plan:
+    """A query's filters in store terms (ns times, integer ids, flag bits)"""
+
+    def __init__(self, store, start, end, target, test_type, where, anomalies, predicted):
+        self.start = None if start is None else to_ns(start)
+        self.end = None if end is None else to_ns(end)
+        self.targets = None
+        if target is not None:
+            names = store.target_names()
+            wanted = [target] if isinstance(target, (str, int, np.integer)) else list(target)
+            self.targets = np.array([t if isinstance(t, (int, np.integer)) else
+                                     (names.index(t) if t in names else -1) for t in wanted])
+        self.test_types = None
+        if test_type is not None:
+            wanted = [test_type] if isinstance(test_type, str) else list(test_type)
+            self.test_types = np.array([TEST_TYPES.index(t) for t in wanted])
+        self.where = [parse_predicate(p) for p in (where or ())]
+        self.flag_mask = None
+        self.flag_any = None
+        if anomalies is not None and anomalies is not False:
+            metrics = list(ANOMALY_FLAGS) if anomalies is True else (
+                [anomalies] if isinstance(anomalies, str) else list(anomalies))
+            self.flag_mask, self.flag_any = sum(ANOMALY_FLAGS[m] for m in metrics), True
+        elif anomalies is False:
+            self.flag_mask, self.flag_any = sum(ANOMALY_FLAGS.values()), False
+        self.predicted = predicted
+
+    def empty(self):
+        return self.targets is not None and (self.targets < 0).all()
+
+    def blocks(self, zones):
+        """Blocks whose zone map says they may contain a match"""
+        keep = np.ones(len(zones), dtype=bool)
+        if self.start is not None:
+            keep &= zones["t_max"] >= self.start
+        if self.end is not None:
+            keep &= zones["t_min"] < self.end
+        if self.targets is not None:
+            keep &= (zones["targets"] & np.bitwise_or.reduce(_bits(self.targets[self.targets >= 0], 64))) != 0
+        if self.test_types is not None:
+            keep &= (zones["test_types"] & np.bitwise_or.reduce(_bits(self.test_types, 8))) != 0
+        for field, op, value in self.where:
+            if field not in ZONE_METRICS:
+                continue
+            lo, hi = zones[f"{field}_min"], zones[f"{field}_max"]
+            if op in (">", ">="):
+                keep &= OPS[op](hi, value)
+            elif op in ("<", "<="):
+                keep &= OPS[op](lo, value)
+            elif op == "==":
+                keep &= (lo <= value) & (hi >= value)
+        if self.flag_any:
+            keep &= (zones["flags"] & self.flag_mask) != 0
+        if self.predicted:
+            keep &= zones["predicted"] >= 1
+        return keep
+
+    def postings(self, idx):
+        """(field, ids) lookups this plan can answer from postings lists"""
+        if self.targets is not None:
+            yield "target", self.targets
+        if self.test_types is not None:
+            yield "test_type", self.test_types
+        if self.flag_any:
+            values = idx.postings["flags"][0]
+            yield "flags", values[(values & self.flag_mask) != 0]
+
+    def mask(self, data, time=True, target=True):
+        """Row mask for the filters zone maps can't decide (None when everything matches)"""
+        mask = None
+
+        def both(m):
+            return m if mask is None else mask & m
+        if time and self.start is not None:
+            mask = both(data["timestamp"] >= self.start)
+        if time and self.end is not None:
+            mask = both(data["timestamp"] < self.end)
+        if target and self.targets is not None:
+            mask = both(np.isin(data["target"], self.targets))
+        if self.test_types is not None:
+            mask = both(np.isin(data["test_type"], self.test_types))
+        for field, op, value in self.where:
+            mask = both(OPS[op](data[field], value))
+        if self.flag_mask is not None:
+            hit = (data["flags"] & self.flag_mask) != 0
+            mask = both(hit if self.flag_any else ~hit)
+        if self.predicted is not None:
+            mask = both(data["predicted_degraded"] == 1 if self.predicted else data["predicted_degraded"] != 1)
+        return mask
+
+def _runs(keep):
+    """[start, end) pairs of consecutive True entries"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.view(np.int8), [0]])))
+    return zip(edges[::2], edges[1::2])
+
+class ResultQuery:
+    """Filtered reads of a ResultStore using per-segment zone maps and postings"""
+
+    def __init__(self, store=None, auto_index=True):
+        self.store = store if store is not None else default_store()
+        self.index_dir = os.path.join(self.store.path, "index")
+        self.auto_index = auto_index
+        self._indexes = {}
+        self.built = 0
+
+    # ---- indexes ---- #
+    def index(self, segment, data=None):
+        """The segment's index: cached, loaded from disk or built (None if auto_index is off)"""
+        name = segment["name"]
+        idx = self._indexes.get(name)
+        if idx is not None:
+            return idx
+        prefix = os.path.join(self.index_dir, name)
+        try:
+            idx = SegmentIndex.load(prefix)
+        except (FileNotFoundError, ValueError, KeyError):
+            if not self.auto_index:
+                return None
+            if data is None:
+                data = self.store._map(name, segment["rows"])
+            idx = SegmentIndex.build(data)
+            os.makedirs(self.index_dir, exist_ok=True)
+            idx.save(prefix)
+            self.built += 1
+            self._prune()
+        self._indexes[name] = idx
+        return idx
+
+    def build_indexes(self):
+        """Load or build the index of every sealed segment; returns how many were (re)built"""
+        self.store.refresh()
+        before = self.built
+        for s in self.store.manifest["segments"]:
+            self.index(s)
+        self._prune()
+        return self.built - before
+
+    def invalidate(self, name):
+        """Drop a segment's index after its rows were rewritten in place (it is rebuilt on next use)"""
+        self._indexes.pop(name, None)
+        prefix = os.path.join(self.index_dir, name)
+        # The .npz marks a complete index, so it goes first
+        for path in [prefix + ".npz"] + [f"{prefix}.{field}.npy" for field in INDEXED]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _prune(self):
+        """Drop indexes of segments that compaction has replaced"""
+        live = {s["name"] for s in self.store.manifest["segments"]}
+        for name in list(self._indexes):
+            if name not in live:
+                del self._indexes[name]
+        try:
+            files = os.listdir(self.index_dir)
+        except FileNotFoundError:
+            return
+        for f in files:
+            if f.split(".bin")[0] + ".bin" not in live and ".tmp-" not in f:
+                try:
+                    os.remove(os.path.join(self.index_dir, f))
+                except FileNotFoundError:
+                    pass
+
+    # ---- execution ---- #
+    def _scan_segment(self, data, segment, plan):
+        """Yield (rows, mask) pairs covering the matches in one sealed segment"""
+        lo, hi = 0, len(data)
+        if segment["sorted"]:
+            t = data["timestamp"]
+            if plan.start is not None:
+                lo = int(np.searchsorted(t, plan.start, "left"))
+            if plan.end is not None:
+                hi = int(np.searchsorted(t, plan.end, "left"))
+            if lo >= hi:
+                return
+        exact_time = segment["sorted"]
+        idx = self.index(segment, data)
+        if idx is None:
+            view = data[lo:hi]
+            yield view, plan.mask(view, time=not exact_time)
+            return
+        keep = plan.blocks(idx.zones)
+        keep[:lo // BLOCK_ROWS] = False
+        keep[(hi - 1) // BLOCK_ROWS + 1:] = False
+        if not keep.any():
+            return
+        # Read through the most selective postings list when it is short enough
+        best = None
+        for field, ids in plan.postings(idx):
+            rows = idx.rows_for(field, ids, lo, hi)
+            if best is None or len(rows) < len(best):
+                best = rows
+        if best is not None and len(best) < (hi - lo) * POSTINGS_SELECTIVITY:
+            rows = best[keep[best // BLOCK_ROWS]]
+            if len(rows):
+                picked = data[rows]
+                yield picked, plan.mask(picked, time=not exact_time)
+            return
+        for a, b in _runs(keep):
+            view = data[max(a * BLOCK_ROWS, lo):min(b * BLOCK_ROWS, hi)]
+            yield view, plan.mask(view, time=not exact_time)
+
+    def _scan(self, plan):
+        if plan.empty():
+            return
+        store = self.store
+        for _ in range(3):
+            store.refresh()
+            segments = [s for s in store.manifest["segments"]
+                        if not ((plan.start is not None and s["t_max"] < plan.start) or
+                                (plan.end is not None and s["t_min"] >= plan.end))]
+            try:
+                maps = [(s, np.memmap(store._file(s["name"]), dtype=store.dtype, mode="r", shape=(s["rows"],)))
+                        for s in segments]
+                break
+            except FileNotFoundError:
+                # A compaction replaced a segment under us; reload and retry
+                store._manifest_mtime = None
+        else:
+            raise RuntimeError(f"could not read a consistent snapshot of {store.path}")
+        for s, data in maps:
+            yield from self._scan_segment(data, s, plan)
+        # The active segment changes on every append, so it is scanned without an index
+        active = store._map(store.manifest["active"])
+        if len(active):
+            yield active, plan.mask(active)
+
+    def select(self, start=None, end=None, target=None, test_type=None, where=None, anomalies=None,
+               predicted=None, columns=None):
+        """
+        Matching records as a structured array.
+
+        start/end: anything wifi_store.to_ns accepts; target: name, id or list;
+        test_type: "tcp"/"udp" or list; where: ["latency_ms > 50", ("lost_percent", ">=", 5), ...];
+        anomalies: True (any flag), False (none), a metric or list of metrics;
+        predicted: True/False for predicted_degraded == 1; columns: field subset.
+        """
+        plan = _Plan(self.store, start, end, target, test_type, where, anomalies, predicted)
+        parts = [rows if mask is None else rows[mask] for rows, mask in self._scan(plan)]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            out = np.empty(0, dtype=self.store.dtype)
+        elif len(parts) == 1:
+            out = parts[0]                      # possibly a view of the mapped file
+        else:
+            out = np.concatenate(parts)
+        return out[list(columns)] if columns else out
+
+    def count(self, **filters):
+        """Number of matching rows; unfiltered ranges are counted without reading them"""
+        plan = _Plan(self.store, **{k: filters.get(k) for k in
+                                    ("start", "end", "target", "test_type", "where", "anomalies", "predicted")})
+        return sum(len(rows) if mask is None else int(np.count_nonzero(mask)) for rows, mask in self._scan(plan))
+
+    def frame(self, columns=None, **filters):
+        """select() as a DataFrame with the store's column conventions"""
+        import pandas as pd
+        records = self.select(**filters)
+        if columns is None:
+            return self.store.to_frame(records)
+        out = {}
+        for c in columns:
+            v = records[c]
+            if c == "timestamp":
+                out[c] = pd.to_datetime(v, unit="ns")
+            elif c == "target":
+                out[c] = self.store.target_labels(v)
+            elif c == "test_type":
+                out[c] = np.array(TEST_TYPES, dtype=object)[v]
+            elif c == "predicted_degraded":
+                out[c] = np.where(v < 0, np.nan, v).astype(float)
+            elif c == "flags":
+                out[c] = np.asarray(v)
+            else:
+                out[c] = np.asarray(v, dtype=float)
+        return pd.DataFrame(out)
+
+def query(store=None, **filters):
+    """One-off ResultQuery(store).select(**filters)"""
+    return ResultQuery(store).select(**filters)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        start = time.perf_counter()
+        n = ResultQuery().build_indexes()
+        print(f"✅ Indexed {n} segments in {time.perf_counter() - start:.1f} s")
+    else:
+        print("usage: python result_query.py build     # index every sealed segment now")
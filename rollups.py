@@ -0,0 +1,382 @@
+import os, shutil, sys, threading, time
+import numpy as np
+from wifi_store import SegmentLog, METRICS, ANOMALY_FLAGS, STORE_DIR, to_ns
+
+# ----------------- Configuration ----------------- #
+NS = 1_000_000_000
+# Resolutions, finest first. Each one is its own segment log under wifi_store/rollups/
+LEVELS = {"1min": 60 * NS, "1h": 3600 * NS, "1d": 86400 * NS}
+# Percentile sketches cost 1 KB per row, so the per-minute level keeps only
+# count/mean/std/min/max (a minute holds a handful of tests anyway)
+SKETCH_LEVELS = ("1h", "1d")
+SKETCH_BINS = 64
+SKETCH_MIN, SKETCH_MAX = 1e-3, 1e5
+GAMMA = (SKETCH_MAX / SKETCH_MIN) ** (1.0 / (SKETCH_BINS - 1))   # ~1.34: +/-15% per bin
+ROLLUP_SEGMENT_ROWS = 4096
+
+def rollup_dtype(sketch):
+    """
+    One row per (bucket, target). Every field is mergeable (sums, min, max,
+    histogram counts), so partial rows for the same bucket written by
+    different appends or processes are simply combined when read or compacted.
+    """
+    fields = [("bucket", "<i8"), ("target", "<u2"), ("rows", "<u4"), ("predicted", "<u4")]
+    for m in METRICS:
+        fields += [(f"{m}_count", "<u4"), (f"{m}_sum", "<f8"), (f"{m}_sumsq", "<f8"),
+                   (f"{m}_min", "<f4"), (f"{m}_max", "<f4"), (f"{m}_anomalies", "<u4")]
+        if sketch:
+            fields.append((f"{m}_hist", "<u4", (SKETCH_BINS,)))
+    return np.dtype(fields)
+
+# -------- Log-bucket Sketch -------- #
+def sketch_bins(values):
+    """Bin 0 holds values below SKETCH_MIN (mostly exact zeros); bin i covers [MIN*g^(i-1), MIN*g^i)"""
+    v = np.maximum(values, SKETCH_MIN)
+    idx = np.floor(np.log(v / SKETCH_MIN) / np.log(GAMMA)).astype(np.int64) + 1
+    idx[values < SKETCH_MIN] = 0
+    return np.clip(idx, 0, SKETCH_BINS - 1)
+
+def sketch_quantile(hist, q, lo, hi):
+    """Approximate q-quantile per row of a (rows, SKETCH_BINS) histogram, clipped to [lo, hi]"""
+    cum = np.cumsum(hist, axis=1)
+    total = cum[:, -1]
+    rank = np.maximum(np.ceil(q * total), 1)
+    idx = np.minimum((cum < rank[:, None]).sum(axis=1), SKETCH_BINS - 1)
+    # Interpolate (in log space) by where the rank falls inside its bin
+    rows = np.arange(len(hist))
+    in_bin = np.maximum(hist[rows, idx], 1)
+    before = cum[rows, idx] - hist[rows, idx]
+    frac = (rank - before - 0.5) / in_bin
+    value = np.where(idx == 0, 0.0, SKETCH_MIN * GAMMA ** (idx - 1 + frac))
+    value = np.clip(value, lo, hi)
+    return np.where(total > 0, value, np.nan)
+
+# -------- Vectorized Aggregation -------- #
+def _groups(bucket, target):
+    """Sort order and group start offsets for (bucket, target) keys"""
+    order = np.lexsort((target, bucket))
+    b, t = bucket[order], target[order]
+    starts = np.flatnonzero(np.r_[True, (b[1:] != b[:-1]) | (t[1:] != t[:-1])])
+    return order, starts
+
+def aggregate(records, width, dtype):
+    """Raw RESULT_DTYPE records -> partial rollup rows at one resolution"""
+    out = np.zeros(0, dtype=dtype)
+    if len(records) == 0:
+        return out
+    bucket = records["timestamp"] // width * width
+    order, starts = _groups(bucket, records["target"])
+    r = records[order]
+    n = len(starts)
+    out = np.zeros(n, dtype=dtype)
+    out["bucket"] = bucket[order][starts]
+    out["target"] = r["target"][starts]
+    out["rows"] = np.diff(np.r_[starts, len(r)])
+    out["predicted"] = np.add.reduceat((r["predicted_degraded"] == 1).astype(np.uint32), starts)
+    group = np.repeat(np.arange(n), out["rows"])
+    sketch = f"{METRICS[0]}_hist" in dtype.names
+    for m in METRICS:
+        v = r[m].astype(np.float64)
+        ok = ~np.isnan(v)
+        out[f"{m}_count"] = np.add.reduceat(ok.astype(np.uint32), starts)
+        out[f"{m}_sum"] = np.add.reduceat(np.where(ok, v, 0.0), starts)
+        out[f"{m}_sumsq"] = np.add.reduceat(np.where(ok, v * v, 0.0), starts)
+        out[f"{m}_min"] = np.minimum.reduceat(np.where(ok, v, np.inf), starts)
+        out[f"{m}_max"] = np.maximum.reduceat(np.where(ok, v, -np.inf), starts)
+        out[f"{m}_anomalies"] = np.add.reduceat(((r["flags"] & ANOMALY_FLAGS[m]) != 0).astype(np.uint32), starts)
+        if sketch:
+            flat = group[ok] * SKETCH_BINS + sketch_bins(v[ok])
+            out[f"{m}_hist"] = np.bincount(flat, minlength=n * SKETCH_BINS).reshape(n, SKETCH_BINS)
+    return out
+
+def prediction_rows(records, width, dtype):
+    """Partial rollup rows that only add predicted counts (predictions made after the rows were rolled up)"""
+    records = records[records["predicted_degraded"] == 1]
+    if len(records) == 0:
+        return np.zeros(0, dtype=dtype)
+    bucket = records["timestamp"] // width * width
+    order, starts = _groups(bucket, records["target"])
+    out = np.zeros(len(starts), dtype=dtype)
+    out["bucket"] = bucket[order][starts]
+    out["target"] = records["target"][order][starts]
+    out["predicted"] = np.diff(np.r_[starts, len(records)])
+    for m in METRICS:
+        out[f"{m}_min"] = np.inf
+        out[f"{m}_max"] = -np.inf
+    return out
+
+def merge_rows(rows):
+    """Combine partial rollup rows that share (bucket, target); result is sorted"""
+    if len(rows) == 0:
+        return rows
+    order, starts = _groups(rows["bucket"], rows["target"])
+    r = rows[order]
+    if len(starts) == len(r):
+        return r
+    out = np.zeros(len(starts), dtype=rows.dtype)
+    out["bucket"] = r["bucket"][starts]
+    out["target"] = r["target"][starts]
+    for name in rows.dtype.names:
+        if name in ("bucket", "target"):
+            continue
+        if name.endswith("_min"):
+            out[name] = np.minimum.reduceat(r[name], starts)
+        elif name.endswith("_max"):
+            out[name] = np.maximum.reduceat(r[name], starts)
+        else:
+            out[name] = np.add.reduceat(r[name], starts, axis=0)
+    return out
+
+class RollupLog(SegmentLog):
+    """Segment log of rollup rows; compaction also merges partial rows"""
+
+    def __init__(self, path, level):
+        super().__init__(path, rollup_dtype(level in SKETCH_LEVELS), segment_rows=ROLLUP_SEGMENT_ROWS,
+                         time_field="bucket")
+        self.level = level
+        self.width = LEVELS[level]
+
+    def _merge(self, data):
+        return merge_rows(data)
+
+# -------- Rollup Engine -------- #
+class RollupEngine:
+    """
+    Maintains 1 min / 1 h / 1 day rollups of a ResultStore as rows are
+    appended. Every append writes its partial rows to each level while the
+    raw store lock is held, so rollups never lag the raw rows, even after a
+    crash; readers and compaction merge partials.
+    """
+
+    def __init__(self, path=os.path.join(STORE_DIR, "rollups")):
+        self.path = path
+        self.logs = {level: RollupLog(os.path.join(path, level), level) for level in LEVELS}
+        self._lock = threading.Lock()
+
+    # ---- ingest ---- #
+    def add(self, records, rows=aggregate):
+        """Write the partial rollup rows of newly appended raw records"""
+        with self._lock:
+            for log in self.logs.values():
+                log.append_records(rows(records, log.width, log.dtype))
+
+    def add_predictions(self, records):
+        """Count the predictions of rows scored after ingest (backfill of rows that were unscored)"""
+        self.add(records, prediction_rows)
+
+    def rebuild(self, store, chunk_rows=1 << 20):
+        """Recompute every level from the raw store (appends wait: they write rollups under the same lock)"""
+        with store._locked(), self._lock:
+            for level in LEVELS:
+                self.logs[level].close()
+                shutil.rmtree(self.logs[level].path, ignore_errors=True)
+                self.logs[level] = RollupLog(os.path.join(self.path, level), level)
+            for chunk in store.iter_chunks(chunk_rows=chunk_rows):
+                for level, log in self.logs.items():
+                    log.append_records(aggregate(chunk, log.width, log.dtype))
+        self.compact()
+
+    def compact(self):
+        for log in self.logs.values():
+            log.compact()
+
+    # ---- queries ---- #
+    def read(self, level, start=None, end=None, by_target=True):
+        """Merged rollup rows of one level for buckets in [start, end)"""
+        log = self.logs[level]
+        start = None if start is None else to_ns(start) // log.width * log.width
+        rows = log.read_range(start, end)
+        if not by_target:
+            rows = rows.copy()
+            rows["target"] = 0
+        return merge_rows(rows)
+
+    def time_range(self):
+        """(first, last) timestamp covered, from the daily level"""
+        rows = self.read("1d", by_target=False)
+        if len(rows) == 0:
+            return None
+        return int(rows["bucket"][0]), int(rows["bucket"][-1]) + LEVELS["1d"]
+
+    def choose_level(self, start, end, points):
+        """Coarsest level that still gives `points` buckets over [start, end), or None for raw"""
+        resolution = (to_ns(end) - to_ns(start)) / max(points, 1)
+        for level in reversed(list(LEVELS)):
+            if LEVELS[level] <= resolution:
+                return level
+        return None
+
+    def frame(self, level, start=None, end=None, by_target=True, quantiles=(0.5, 0.99)):
+        """Rollup rows -> DataFrame with per-metric count/mean/std/min/max/anomalies (+ pXX)"""
+        import pandas as pd
+        rows = self.read(level, start, end, by_target)
+        cols = {"timestamp": pd.to_datetime(rows["bucket"], unit="ns"), "target": rows["target"],
+                "rows": rows["rows"], "predicted": rows["predicted"]}
+        for m in METRICS:
+            stats = column_stats(rows, m, quantiles)
+            cols.update({f"{m}_{k}" if k != "mean" else m: v for k, v in stats.items()})
+        return pd.DataFrame(cols)
+
+    def summarize(self, metrics=METRICS, start=None, end=None, quantiles=(0.5, 0.99)):
+        """
+        Whole-range stats per metric from the coarsest level aligned with
+        [start, end). The 1min level has no sketches: for ranges only it
+        aligns with, quantiles come from the hours overlapping the range.
+        """
+        level = "1min"
+        for name in reversed(list(LEVELS)):
+            if all(t is None or to_ns(t) % LEVELS[name] == 0 for t in (start, end)):
+                level = name
+                break
+        rows = self._total(level, start, end)
+        summary = {"rows": int(rows["rows"].sum()), "predicted": int(rows["predicted"].sum()), "level": level}
+        sketched = None if level in SKETCH_LEVELS else self._total(SKETCH_LEVELS[0], start, end)
+        for m in metrics:
+            stats = column_stats(rows, m, quantiles)
+            if sketched is not None:
+                hist = sketched[f"{m}_hist"]
+                for q in quantiles:
+                    stats[f"p{int(round(q * 100))}"] = sketch_quantile(hist, q, stats["min"], stats["max"])
+            summary[m] = {k: (float(v[0]) if len(v) else np.nan) for k, v in stats.items()}
+        return summary
+
+    def _total(self, level, start, end):
+        """One merged row for all buckets of `level` in [start, end) (none if the range is empty)"""
+        rows = self.read(level, start, end, by_target=False)
+        if len(rows):
+            rows = rows.copy()
+            rows["bucket"] = 0
+            rows = merge_rows(rows)
+        return rows
+
+def column_stats(rows, m, quantiles=(0.5, 0.99)):
+    """Vectorized per-row stats of one metric from rollup rows"""
+    count = rows[f"{m}_count"].astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = rows[f"{m}_sum"] / count
+        var = (rows[f"{m}_sumsq"] - count * mean * mean) / (count - 1)
+    empty = count == 0
+    lo = np.where(empty, np.nan, rows[f"{m}_min"].astype(np.float64))
+    hi = np.where(empty, np.nan, rows[f"{m}_max"].astype(np.float64))
+    stats = {"count": count, "mean": mean, "std": np.sqrt(np.maximum(var, 0)), "min": lo, "max": hi,
+             "anomalies": rows[f"{m}_anomalies"]}
+    if f"{m}_hist" in rows.dtype.names:
+        for q in quantiles:
+            stats[f"p{int(round(q * 100))}"] = sketch_quantile(rows[f"{m}_hist"], q, lo, hi)
+    return stats
+
+# -------- Streaming Stats -------- #
+class StreamingStats:
+    """
+    Single-pass stats over record chunks of any total size: every chunk is
+    folded into mergeable rollup rows, plot buckets of `width` ns (no
+    sketch) and one sketch row per target for the whole range, so memory
+    depends on the number of buckets and targets, never on the rows read.
+    """
+
+    def __init__(self, width, by_target=False):
+        self.width = width
+        self.by_target = by_target
+        self.buckets = np.zeros(0, dtype=rollup_dtype(False))
+        self.totals = np.zeros(0, dtype=rollup_dtype(True))
+
+    def add(self, records):
+        if len(records) == 0:
+            return
+        buckets = aggregate(records, self.width, self.buckets.dtype)
+        # A width past any timestamp puts the whole chunk in bucket 0
+        totals = aggregate(records, 1 << 62, self.totals.dtype)
+        if not self.by_target:
+            buckets["target"] = 0
+            totals["target"] = 0
+        self.buckets = merge_rows(np.concatenate([self.buckets, buckets]))
+        self.totals = merge_rows(np.concatenate([self.totals, totals]))
+
+    def targets(self):
+        return [int(t) for t in np.unique(self.totals["target"])]
+
+    def rows(self, target=None):
+        """Plot buckets (all targets merged unless `target`)"""
+        rows = self.buckets if target is None else self.buckets[self.buckets["target"] == target]
+        if target is None and self.by_target and len(rows):
+            rows = rows.copy()
+            rows["target"] = 0
+            rows = merge_rows(rows)
+        return rows
+
+    def summary(self, metrics=METRICS, target=None, quantiles=(0.5, 0.99)):
+        """Same shape as RollupEngine.summarize (quantiles from the log-bucket sketch)"""
+        rows = self.totals if target is None else self.totals[self.totals["target"] == target]
+        if len(rows) > 1:
+            rows = rows.copy()
+            rows["target"] = 0
+            rows = merge_rows(rows)
+        summary = {"rows": int(rows["rows"].sum()), "predicted": int(rows["predicted"].sum()), "level": "stream"}
+        for m in metrics:
+            stats = column_stats(rows, m, quantiles)
+            summary[m] = {k: (float(v[0]) if len(v) else np.nan) for k, v in stats.items()}
+        return summary
+
+# -------- Report Data -------- #
+def load_report_data(store, metrics=METRICS, points=1000, start=None, end=None):
+    """
+    (df, masks, summary) for reports and static dashboards. Long ranges are
+    read from the coarsest rollup level with at least `points` buckets (one
+    row per bucket, metric columns hold bucket means, masks mark buckets with
+    ingest-time anomalies); short ones fall back to raw rows and the detector.
+    """
+    from anomaly_detector import flag_anomalies
+    rollups = getattr(store, "rollups", None)
+    level = None
+    if rollups is not None:
+        span = rollups.time_range()
+        if span is not None:
+            level = rollups.choose_level(start or span[0], end or span[1], points)
+    if level is None:
+        df = store.read_frame(start, end)
+        masks = flag_anomalies(df, metrics=metrics)
+        summary = {"rows": len(df), "predicted": int((df["predicted_degraded"] == 1).sum()), "level": "raw"}
+        for m in metrics:
+            v = df[m]
+            summary[m] = {"count": int(v.count()), "mean": v.mean(), "std": v.std(), "min": v.min(),
+                          "max": v.max(), "p50": v.quantile(0.5), "p99": v.quantile(0.99),
+                          "anomalies": int(masks[m].sum()) if m in masks else 0}
+        return df, masks, summary
+
+    df = rollups.frame(level, start, end, by_target=False)
+    df["predicted_degraded"] = (df["predicted"] > 0).astype(float)
+    masks = {m: (df[f"{m}_anomalies"] > 0).values for m in metrics}
+    summary = rollups.summarize(metrics, start, end)
+    summary["level"] = level
+    return df, masks, summary
+
+def attach(store, path=None):
+    """Maintain rollups for `store`, building them from the raw rows the first time"""
+    path = path or os.path.join(store.path, "rollups")
+    fresh = not os.path.exists(path)
+    engine = RollupEngine(path)
+    if fresh and len(store):
+        engine.rebuild(store)
+    store.rollups = engine
+    return engine
+
+# -------- Command Line -------- #
+if __name__ == "__main__":
+    from wifi_store import open_store
+    usage = "usage: python rollups.py [rebuild | compact | info]"
+    store = open_store(legacy_csv=None)
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "info"
+    engine = store.rollups
+    if cmd == "rebuild":
+        start = time.perf_counter()
+        engine.rebuild(store)
+        print(f"✅ Rebuilt rollups for {len(store)} rows in {time.perf_counter() - start:.1f} s")
+    elif cmd == "compact":
+        engine.compact()
+        print("✅ Compacted rollups")
+    elif cmd == "info":
+        for level, log in engine.logs.items():
+            print(f"{level:>5}: {len(log)} rows ({log.dtype.itemsize} B each)")
+    else:
+        print(usage)
+        sys.exit(1)
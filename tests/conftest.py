@@ -0,0 +1,20 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import synthetic_records
+from wifi_store import ResultStore
+
+# -------- Fixtures -------- #
+@pytest.fixture
+def store(tmp_path):
+    """An empty store with small segments, so a few hundred rows seal and compact"""
+    s = ResultStore(str(tmp_path / "store"), segment_rows=64, compact_every=4)
+    yield s
+    s.close()
+
+@pytest.fixture
+def records():
+    """synthetic_records(n, seed=...): time-ordered rows over 4 targets"""
+    return synthetic_records
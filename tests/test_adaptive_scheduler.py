@@ -0,0 +1,87 @@
+import numpy as np
+from adaptive_scheduler import (AdaptivePolicy, STABLE, DRIFT, INCIDENT, incidents, replay, synthetic_histories,
+                                model_predictions)
+
+def normal(i):
+    """A quiet test: small alternating noise around a steady level"""
+    d = 1.0 if i % 2 else -1.0
+    return {"throughput_mbps": 100 + d, "latency_ms": 10 + d / 10, "jitter_ms": 1.0 + d / 100, "lost_percent": 0.0}
+
+def settle(policy, key="a", tests=30):
+    """Enough quiet tests for the decayed baseline's spread to catch up with the noise"""
+    for i in range(tests):
+        policy.observe(key, normal(i))
+
+# -------- Levels -------- #
+def test_stable_links_back_off_to_the_cap():
+    policy = AdaptivePolicy(duration=1.0, base_interval=4.0, max_interval=10.0, calm_tests=3)
+    for i in range(2):
+        assert policy.observe("a", normal(i)) == STABLE
+    assert policy.interval("a") == 4.0
+    policy.observe("a", normal(2))
+    assert policy.interval("a") == 6.0
+    settle(policy, tests=30)
+    assert policy.level("a") == STABLE and policy.interval("a") == 10.0
+
+def test_drift_halves_the_interval():
+    policy = AdaptivePolicy(duration=1.0, base_interval=8.0, min_interval=2.0)
+    settle(policy)
+    before = policy.interval("a")
+    stats = policy.links["a"].stats["throughput_mbps"]
+    sample = dict(normal(0), throughput_mbps=stats.mean + 3.5 * stats.std)
+    assert policy.observe("a", sample) == DRIFT
+    assert policy.interval("a") == before / 2 and policy.duration("a") == 1.0
+
+def test_incident_signals():
+    for signal in [dict(anomalies=["latency_ms"]), dict(degraded=1), dict(spike=True)]:
+        policy = AdaptivePolicy(duration=4.0, min_interval=2.0)
+        settle(policy)
+        sample = dict(normal(0), latency_ms=500.0) if signal.pop("spike", False) else normal(0)
+        assert policy.observe("a", sample, **signal) == INCIDENT
+        # Shorter tests at the incident rate; the interval never undercuts the test itself
+        assert policy.duration("a") == 2.0 and policy.interval("a") == 2.0
+
+def test_incident_steps_down_through_drift():
+    policy = AdaptivePolicy(duration=1.0, calm_tests=3)
+    settle(policy)
+    policy.observe("a", normal(0), anomalies=["throughput_mbps"])
+    # A normal test after an incident leaves it, but not straight back to stable
+    assert policy.observe("a", normal(1)) == DRIFT
+    policy.observe("a", normal(2))
+    assert policy.observe("a", normal(3)) == STABLE
+
+def test_incident_does_not_teach_the_baseline():
+    policy = AdaptivePolicy()
+    settle(policy)
+    mean = policy.links["a"].stats["latency_ms"].mean
+    policy.observe("a", dict(normal(0), latency_ms=900.0), anomalies=["latency_ms"])
+    assert policy.links["a"].stats["latency_ms"].mean == mean
+
+# -------- Budget -------- #
+def test_budget_stretches_calm_links_first():
+    policy = AdaptivePolicy(duration=2.0, min_duration=1.0, base_interval=4.0, min_interval=2.0, budget=1.0)
+    for key in "abcd":
+        settle(policy, key, tests=2)
+    assert abs(policy.airtime() - 1.0) < 1e-9
+    policy.observe("a", normal(0), degraded=1)
+    # The incident keeps its rate; the three others share what is left
+    assert policy.interval("a") == 2.0
+    assert abs(policy.airtime() - 1.0) < 1e-9
+    unlimited = AdaptivePolicy(duration=2.0, base_interval=4.0)
+    for key in "abcd":
+        settle(unlimited, key, tests=2)
+    assert unlimited.airtime() == 2.0
+
+# -------- Replay -------- #
+def test_incidents_merge_close_runs():
+    times = np.arange(10) * 30.0
+    degraded = np.array([0, 1, 1, 0, 1, 0, 0, 0, 0, 1])
+    assert incidents(times, degraded, merge_gap=90) == [(30.0, 120.0), (270.0, 270.0)]
+    assert incidents(times, degraded) == [(30.0, 60.0), (120.0, 120.0), (270.0, 270.0)]
+
+def test_adaptive_replay_spends_less_airtime():
+    histories = synthetic_histories(targets=3, hours=4, seed=1)
+    fixed = replay(histories, interval=5.0, duration=5.0)
+    adaptive = replay(histories, AdaptivePolicy(duration=5.0), predictions=model_predictions(histories, rows=20_000))
+    assert adaptive["airtime"] < 0.8 * fixed["airtime"]
+    assert adaptive["missed"] <= fixed["missed"] + 1
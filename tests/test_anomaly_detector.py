@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from anomaly_detector import AnomalyDetector, RunningStats, METRICS
+
+def noisy_frame(n=2000, seed=0):
+    """Gamma-distributed metrics with spikes and missing values"""
+    rng = np.random.default_rng(seed)
+    data = rng.gamma(2.0, 10.0, (n, len(METRICS)))
+    spikes = rng.random((n, len(METRICS))) < 0.03
+    data[spikes] *= 8
+    data[rng.random((n, len(METRICS))) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=METRICS)
+
+# -------- Streaming vs Batch -------- #
+@pytest.mark.parametrize("kwargs", [{}, {"window": 50}, {"halflife": 20}, {"threshold": 3.0, "min_samples": 10}])
+def test_stream_matches_batch(kwargs):
+    df = noisy_frame()
+    detector = AnomalyDetector(**kwargs)
+    for row in df.to_dict("records"):
+        detector.update(row)
+    masks = AnomalyDetector(**kwargs).flag_batch(df)
+    for metric in METRICS:
+        assert np.flatnonzero(masks[metric]).tolist() == detector.anomalies[metric], metric
+        assert masks[metric].any()
+
+def test_flag_batch_leaves_state_alone():
+    detector = AnomalyDetector()
+    detector.flag_batch(noisy_frame(100))
+    assert detector.rows == 0 and all(s.count == 0 for s in detector.stats.values())
+
+def test_nothing_flagged_before_min_samples():
+    calm = [1.0, 1.1, 0.9, 1.0, 1.05]
+    for seen in (4, 5):
+        detector = AnomalyDetector(min_samples=5)
+        for x in calm[:seen]:
+            assert detector.update({"latency_ms": x}) == []
+        assert detector.update({"latency_ms": 500.0}) == (["latency_ms"] if seen == 5 else [])
+
+# -------- Running Statistics -------- #
+def test_running_stats_window():
+    values = np.random.default_rng(1).normal(10, 3, 500)
+    stats = RunningStats(window=40)
+    for x in values:
+        stats.push(float(x))
+    assert stats.mean == pytest.approx(values[-40:].mean())
+    assert stats.std == pytest.approx(values[-40:].std(ddof=1))
+
+def test_running_stats_rejects_window_and_halflife():
+    with pytest.raises(ValueError):
+        RunningStats(window=10, halflife=5)
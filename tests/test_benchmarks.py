@@ -0,0 +1,57 @@
+import json
+import numpy as np
+import benchmarks
+from benchmarks import parse_size, synthetic_records, Suite, compare, key
+
+def result(stage, seconds, runs=None, peak=None, rows=1000):
+    return {"stage": stage, "rows": rows, "seconds": seconds, "runs": runs or [seconds], "peak_mb": peak}
+
+# -------- Synthetic Data -------- #
+def test_parse_size():
+    assert [parse_size(s) for s in ("1k", "100K", "1.5m", "250")] == [1000, 100_000, 1_500_000, 250]
+
+def test_synthetic_records_continue_across_chunks():
+    whole = synthetic_records(1000, targets=4)
+    assert np.all(np.diff(whole["timestamp"]) >= 0)
+    assert np.bincount(whole["target"]).tolist() == [250] * 4
+    later = synthetic_records(200, start_row=800, targets=4)
+    assert np.array_equal(later["timestamp"], whole["timestamp"][800:])
+    assert np.array_equal(later["target"], whole["target"][800:])
+    assert np.array_equal(synthetic_records(50, seed=3), synthetic_records(50, seed=3))
+
+# -------- Suite -------- #
+def test_suite_runs_selected_stages(tmp_path):
+    suite = Suite(str(tmp_path), stages={"kept"}, repeat=3)
+    calls = []
+    r = suite.run("kept", 10, 10, lambda x: calls.append(x), setup=lambda: "fresh")
+    assert calls == ["fresh"] * 4            # 3 timed runs + 1 traced
+    assert len(r["runs"]) == 3 and r["per_op_us"] > 0 and r["peak_mb"] is not None
+    assert suite.run("other", 10, 10, calls.append) is None and len(suite.results) == 1
+
+def test_suite_skips_stages_missing_a_capability(tmp_path):
+    suite = Suite(str(tmp_path), memory=False)
+
+    def probe():
+        raise PermissionError("no ICMP")
+    assert suite.run("probe", None, 1, probe) is None
+    assert suite.results == [{"stage": "probe", "rows": None, "skipped": "no ICMP"}]
+
+# -------- Baseline -------- #
+def test_compare_flags_only_real_regressions():
+    base = {"results": [result("fast", 0.100), result("noisy", 0.100, runs=[0.05, 0.1, 0.2]),
+                        result("tiny", 0.001), result("mem", 0.1, peak=10.0), {"stage": "skip", "rows": 1}]}
+    now = [result("fast", 0.200), result("noisy", 0.200, runs=[0.1, 0.2, 0.3]), result("tiny", 0.003),
+           result("mem", 0.1, peak=30.0), result("new", 1.0)]
+    # "noisy" doubled within its own spread; "tiny" is under the noise floor
+    assert compare(now, base) == [key(now[0]), f"{key(now[3])} (peak heap)"]
+
+def test_main_saves_then_checks_a_baseline(tmp_path, monkeypatch):
+    train_models = benchmarks.train_models
+    monkeypatch.setattr(benchmarks, "train_models", lambda: train_models(2000))
+    out, baseline = str(tmp_path / "out.json"), str(tmp_path / "base.json")
+    args = dict(sizes="1k", stages="ingest,read_frame", repeat=1, memory=False, out=out, baseline_file=baseline)
+    assert benchmarks.main(save_baseline=True, **args) == 0
+    with open(out) as f:
+        stages = {r["stage"] for r in json.load(f)["results"]}
+    assert stages == {"ingest", "read_frame"}
+    assert benchmarks.main(tolerance=1000.0, **args) == 0
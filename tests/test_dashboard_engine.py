@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from dashboard_engine import minmax_decimate, ns_to_days, NS_PER_DAY
+
+# -------- Decimation -------- #
+def test_decimate_keeps_extremes():
+    rng = np.random.default_rng(3)
+    x = np.arange(100_000, dtype=float)
+    y = rng.normal(size=len(x))
+    y[12_345], y[67_890] = 50.0, -50.0
+    xd, yd = minmax_decimate(x, y, 300)
+    assert len(xd) == len(yd) <= 600
+    assert yd.max() == 50.0 and yd.min() == -50.0
+    assert np.all(np.diff(xd) >= 0)
+
+def test_decimate_bucket_pairs_are_min_max():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 7)
+    xd, yd = minmax_decimate(x, y, 10)
+    lo, hi = yd[0::2], yd[1::2]
+    assert np.all(lo <= hi)
+    assert np.isclose(hi.max(), y.max()) and np.isclose(lo.min(), y.min())
+
+def test_decimate_short_series_and_nan():
+    x = np.arange(10, dtype=float)
+    y = x.copy()
+    y[3] = np.nan
+    xd, yd = minmax_decimate(x, y, 100)
+    assert 3.0 not in xd and len(xd) == 9 and not np.isnan(yd).any()
+    xd, yd = minmax_decimate(x, np.full(10, np.nan), 2)
+    assert len(xd) == len(yd) == 0
+
+def test_ns_to_days():
+    assert ns_to_days([0, NS_PER_DAY // 2]).tolist() == [0.0, 0.5]
+
+# -------- Dashboard -------- #
+@pytest.fixture
+def dashboard(monkeypatch):
+    import matplotlib
+    matplotlib.use("Agg")
+    from dashboard_engine import LiveDashboard
+    dash = LiveDashboard(predicted=True, figsize=(6, 8))
+    draws = []
+    original = dash.canvas.draw
+    monkeypatch.setattr(dash.canvas, "draw", lambda: (draws.append(1), original()))
+    yield dash, draws
+    dash.plt.close(dash.fig)
+
+def frame(n, scale=1.0):
+    t = np.datetime64("2024-01-01", "ns").astype(np.int64) + np.arange(n) * 5 * 10**9
+    return t, {m: np.linspace(1, 2, n) * scale for m in ("throughput_mbps", "latency_ms", "jitter_ms",
+                                                         "lost_percent")}
+
+def test_updates_blit_until_data_leaves_the_view(dashboard):
+    dash, draws = dashboard
+    t, cols = frame(100)
+    dash.update(t, cols)
+    assert len(draws) == 1                    # first frame lays out the axes
+    # The next few rows fit in the x headroom: blitted, no full redraw
+    t, cols = frame(105)
+    dash.update(t, cols)
+    assert len(draws) == 1
+    t, cols = frame(105, scale=10.0)          # values above the y view
+    dash.update(t, cols)
+    assert len(draws) == 2
+
+def test_long_series_are_decimated_without_markers(dashboard):
+    dash, _ = dashboard
+    t, cols = frame(50_000)
+    mask = np.zeros(50_000, dtype=bool)
+    mask[[10, 20_000]] = True
+    dash.update(t, cols, anomalies={"latency_ms": mask}, predicted=mask)
+    line = dash.lines["latency_ms"]
+    assert len(line.get_xdata()) <= 2 * dash.axs[1].bbox.width and line.get_marker() in ("", "None")
+    assert len(dash.anomalies["latency_ms"].get_offsets()) == 2
+    assert len(dash.anomalies["jitter_ms"].get_offsets()) == 0
+    assert len(dash.predicted["throughput_mbps"].get_offsets()) == 2
@@ -0,0 +1,58 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from features import FeatureBuilder, FEATURE_NAMES, WINDOW, QUANTILE, frame_features, rolling_quantile
+from predictor_service import FEATURES
+from benchmarks import synthetic_records, features_per_row
+
+@pytest.fixture(scope="module")
+def history():
+    rec = synthetic_records(20_000, seed=3, targets=6)
+    rng = np.random.default_rng(3)
+    rec["jitter_ms"][rng.random(len(rec)) < 0.05] = np.nan
+    return rec
+
+# -------- Chunked vs Whole -------- #
+@pytest.mark.parametrize("chunk", [1, 7, 1000, 4096])
+def test_chunked_matches_whole(history, chunk):
+    rec = history if chunk >= 1000 else history[:50 * WINDOW]   # per-call overhead dominates small chunks
+    whole = FeatureBuilder().transform(rec)
+    builder = FeatureBuilder()
+    chunked = np.concatenate([builder.transform(rec[i:i + chunk]) for i in range(0, len(rec), chunk)])
+    assert chunked.shape == (len(rec), len(FEATURE_NAMES))
+    np.testing.assert_allclose(chunked, whole, rtol=1e-9, atol=1e-9)
+
+def test_state_roundtrip(history):
+    first, rest = history[:7000], history[7000:]
+    builder = FeatureBuilder()
+    builder.transform(first)
+    resumed = FeatureBuilder(json.loads(json.dumps(builder.to_state())))
+    np.testing.assert_allclose(resumed.transform(rest), FeatureBuilder().transform(history)[7000:],
+                               rtol=1e-9, atol=1e-9)
+
+def test_matches_per_row_loop(history):
+    np.testing.assert_allclose(FeatureBuilder().transform(history[:2000]), features_per_row(history[:2000]),
+                               rtol=1e-6, atol=1e-6)
+
+def test_raw_metrics_first(history):
+    X = FeatureBuilder().transform(history[:100])
+    raw = np.column_stack([history[f][:100].astype(np.float64) for f in FEATURES])
+    np.testing.assert_array_equal(X[:, :len(FEATURES)], np.nan_to_num(raw))
+    assert not np.isnan(X).any()
+
+def test_frame_features_matches_records(history):
+    store_like = pd.DataFrame({"timestamp": pd.to_datetime(history["timestamp"], unit="ns"),
+                               "target": history["target"]})
+    for f in FEATURES:
+        store_like[f] = history[f].astype(float)
+    np.testing.assert_allclose(frame_features(store_like), FeatureBuilder().transform(history),
+                               rtol=1e-9, atol=1e-9)
+
+def test_empty_transform():
+    assert FeatureBuilder().transform(synthetic_records(0)).shape == (0, len(FEATURE_NAMES))
+
+def test_rolling_quantile_matches_pandas(history):
+    values = np.column_stack([history[f][:3000].astype(np.float64) for f in FEATURES])
+    expected = pd.DataFrame(values).rolling(WINDOW, min_periods=1).quantile(QUANTILE).to_numpy()
+    np.testing.assert_allclose(rolling_quantile(values, QUANTILE, WINDOW), expected, rtol=1e-9, equal_nan=True)
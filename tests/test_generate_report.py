@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import generate_report
+from generate_report import stream_report, DAY
+from rollups import StreamingStats, METRICS
+
+pytest.importorskip("reportlab")
+
+@pytest.fixture
+def named(store):
+    for t in range(4):
+        store.target_id(f"10.0.0.{t}:5201")
+    return store
+
+def pages(capsys):
+    """Page count from stream_report's closing line"""
+    line = capsys.readouterr().out.strip().splitlines()[-1]
+    return int(line.rsplit(", ", 1)[1].split()[0])
+
+# -------- Streaming Stats -------- #
+def test_chunks_fold_to_the_single_pass_stats(records):
+    rec = records(4000)
+    width = 600 * 10**9
+    whole, chunked = StreamingStats(width), StreamingStats(width)
+    whole.add(rec)
+    for i in range(0, len(rec), 333):
+        chunked.add(rec[i:i + 333])
+    chunked.add(rec[:0])
+    assert np.array_equal(whole.rows()["throughput_mbps_max"], chunked.rows()["throughput_mbps_max"])
+    assert np.array_equal(whole.rows()["rows"], chunked.rows()["rows"])
+    summary = chunked.summary()
+    assert summary["rows"] == 4000 and summary["predicted"] == int(rec["predicted_degraded"].sum())
+    for m in METRICS:
+        assert summary[m]["mean"] == pytest.approx(float(np.nanmean(rec[m])))
+        assert summary[m]["max"] == float(np.nanmax(rec[m]))
+    assert summary["latency_ms"]["p50"] == pytest.approx(float(np.median(rec["latency_ms"])), rel=0.1)
+
+def test_memory_follows_buckets_not_rows(records):
+    rec = records(4000)
+    stats = StreamingStats(600 * 10**9)
+    stats.add(rec)
+    buckets = len(stats.buckets)
+    for _ in range(5):
+        stats.add(rec)
+    assert len(stats.buckets) == buckets and len(stats.totals) == 1
+    assert stats.summary()["rows"] == 6 * 4000
+
+def test_per_target_rows_and_summaries(records):
+    rec = records(4000)
+    stats = StreamingStats(600 * 10**9, by_target=True)
+    stats.add(rec)
+    assert stats.targets() == [0, 1, 2, 3]
+    assert [stats.summary(target=t)["rows"] for t in range(4)] == [1000] * 4
+    # Unless asked for one target, the plot buckets are merged across all of them
+    assert (stats.rows()["target"] == 0).all() and stats.rows()["rows"].sum() == 4000
+    assert stats.rows(2)["rows"].sum() == 1000
+
+# -------- Streamed Report -------- #
+def test_target_sections(named, records, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(generate_report, "STREAM_CHUNK_ROWS", 256)
+    named.append_records(records(2000))
+    pdf = stream_report(named, pdf_name=str(tmp_path / "r.pdf"), cache_dir=str(tmp_path / "cache"))
+    # "All results" first, then one page per target
+    assert pages(capsys) == 5
+    with open(pdf, "rb") as f:
+        assert f.read(4) == b"%PDF"
+
+def test_day_sections_read_each_day(named, records, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(generate_report, "STREAM_CHUNK_ROWS", 256)
+    rec = records(2000)
+    rec["timestamp"] = rec["timestamp"][0] + np.arange(len(rec)) * (3 * DAY // len(rec))
+    named.append_records(rec)
+    reads = []
+    iter_chunks = named.iter_chunks
+    monkeypatch.setattr(named, "iter_chunks", lambda lo, hi, **kw: reads.append((lo, hi)) or iter_chunks(lo, hi, **kw))
+    stream_report(named, pdf_name=str(tmp_path / "r.pdf"), cache_dir=None)
+    assert pages(capsys) == 4 and len(reads) == 3
+    assert all(hi - lo <= DAY for lo, hi in reads)
+
+def test_empty_range(named, records, tmp_path, capsys):
+    assert stream_report(named, pdf_name=str(tmp_path / "r.pdf")) is None
+    named.append_records(records(100))
+    assert stream_report(named, start="2030-01-01", pdf_name=str(tmp_path / "r.pdf")) is None
+    assert "No results in range" in capsys.readouterr().out
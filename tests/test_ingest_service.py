@@ -0,0 +1,85 @@
+import socket, threading
+import numpy as np
+import pytest
+from ingest_service import IngestServer, IngestClient
+
+@pytest.fixture
+def server(store):
+    s = IngestServer(store).start()
+    yield s
+    s.close()
+
+def produce(store, rec):
+    client = IngestClient(store)
+    for i in range(len(rec)):
+        client.append_records(rec[i:i + 1])
+    assert client.flush()
+    client.close()
+    return client
+
+# -------- Group Commit -------- #
+def test_group_commit_keeps_every_row(server, store, records):
+    rec = records(4 * 500)
+    rec["retransmits"] = np.arange(len(rec))      # a unique key per row
+    clients = [None] * 4
+
+    def run(i):
+        clients[i] = produce(store, rec[i::4])
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert server.wait_for(len(rec), timeout=10)
+    got = store.read_range()
+    assert sorted(got["retransmits"].tolist()) == list(range(len(rec)))
+    assert sum(c.sent for c in clients) == len(rec) and sum(c.direct for c in clients) == 0
+    # One write + fsync per batch, not per row
+    assert server.commits < len(rec) and server.max_batch > 1
+
+def test_flush_means_committed(server, store, records):
+    rec = records(50)
+    produce(store, rec)
+    # flush() returned: the rows are readable without waiting on the server
+    assert len(store) == 50
+
+def test_close_commits_what_was_sent(store, records):
+    server = IngestServer(store).start()
+    client = IngestClient(store)
+    rec = records(300)
+    client.append_records(rec)
+    server.close()
+    assert len(store) == 300
+    client.close()
+
+def test_direct_fallback_without_service(store, records):
+    client = IngestClient(store)
+    rec = records(10)
+    client.append_records(rec)
+    assert client.direct == 10 and client.sent == 0
+    assert np.array_equal(store.read_range(), rec)
+
+def test_bad_magic_rejected(server, store, records):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(server.path)
+    sock.sendall(b"XXXX" + records(5).tobytes())
+    assert sock.recv(1) == b""
+    sock.close()
+    produce(store, records(3))
+    assert server.rejected == 1 and len(store) == 3
+
+def test_torn_record_dropped(server, store, records):
+    from ingest_service import MAGIC
+    rec = records(3)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(server.path)
+    sock.sendall(MAGIC + rec.tobytes()[:-5])      # the producer died mid-record
+    sock.shutdown(socket.SHUT_WR)
+    assert sock.recv(1) == b""
+    sock.close()
+    assert server.torn == 1
+    assert np.array_equal(store.read_range(), rec[:2])
+
+def test_second_server_refused(server, store):
+    with pytest.raises(RuntimeError):
+        IngestServer(store)
@@ -0,0 +1,102 @@
+import threading, time, urllib.request
+import pytest
+import instrumentation
+from instrumentation import Histogram, Registry, SamplingProfiler
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh REGISTRY for span / timed / count / gauge, with metrics on"""
+    r = Registry()
+    monkeypatch.setattr(instrumentation, "REGISTRY", r)
+    monkeypatch.setattr(instrumentation, "ENABLED", True)
+    return r
+
+# -------- Histograms -------- #
+def test_histogram_merges_thread_shards():
+    h = Histogram()
+
+    def observe():
+        for _ in range(1000):
+            h.observe(0.003)
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counts, total, count = h.snapshot()
+    assert count == 4000 and abs(total - 12.0) < 1e-6
+    assert h.quantile(0.5) == 0.0032 and h.quantile(0.99) == 0.0032   # 3 ms falls in (1.6, 3.2] ms
+
+def test_quantile_is_a_bucket_upper_bound():
+    h = Histogram()
+    for s in [0.00005] * 90 + [0.5] * 9 + [1000.0]:
+        h.observe(s)
+    assert h.quantile(0.5) == 1e-4 and h.quantile(0.95) == pytest.approx(0.8192)
+    assert h.quantile(1.0) == float("inf") and Histogram().quantile(0.5) == 0.0
+
+# -------- Spans -------- #
+def test_span_timed_count_gauge(registry):
+    with instrumentation.span("block"):
+        time.sleep(0.01)
+
+    @instrumentation.timed("func")
+    def work(x):
+        """doc"""
+        return x * 2
+    assert work(3) == 6 and work.__name__ == "work" and work.__doc__ == "doc"
+    instrumentation.count("dropped", 3)
+    instrumentation.gauge("depth", lambda: 7)
+    summary = registry.summary()
+    assert summary["block"][0] == 1 and summary["block"][1] >= 0.01
+    assert summary["func"][0] == 1
+    text = registry.render()
+    assert 'wifi_span_seconds_count{span="block"} 1' in text
+    assert 'wifi_span_seconds_bucket{span="func",le="+Inf"} 1' in text
+    assert 'wifi_events_total{event="dropped"} 3' in text and 'wifi_gauge{name="depth"} 7' in text
+
+def test_disabled_spans_are_free(registry, monkeypatch):
+    monkeypatch.setattr(instrumentation, "ENABLED", False)
+    assert instrumentation.span("x") is instrumentation.NULL_SPAN
+    func = lambda: 1
+    assert instrumentation.timed("y")(func) is func
+    instrumentation.count("z")
+    assert not registry.histograms and not registry.counters
+
+def test_broken_gauge_is_left_out(registry):
+    registry.gauge("ok", lambda: 1)
+    registry.gauge("broken", lambda: 1 / 0)
+    text = registry.render()
+    assert 'name="ok"' in text and 'name="broken"' not in text
+
+# -------- Export -------- #
+def test_serve_and_write_file(registry, tmp_path, capsys):
+    instrumentation.count("tests")
+    server = instrumentation.serve(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        assert 'wifi_events_total{event="tests"} 1' in urllib.request.urlopen(url).read().decode()
+    finally:
+        server.shutdown()
+    path = str(tmp_path / "metrics.prom")
+    instrumentation.write_file(path)
+    assert open(path).read() == registry.render()
+
+def test_profiler_writes_folded_stacks(tmp_path, capsys):
+    path = str(tmp_path / "profile.folded")
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    profiler = SamplingProfiler(path, interval=0.002).start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    profiler.stop()                      # second stop is a no-op
+    lines = open(path).read().splitlines()
+    assert profiler.samples > 10
+    assert any(line.startswith("busy;") and "test_instrumentation:busy_loop" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
@@ -0,0 +1,39 @@
+import numpy as np
+from interval_capture import IntervalCapture, SUM_STREAM
+
+START = 1_700_000_000 * 10**9
+
+def interval(end, sockets=(5, 7)):
+    """An iperf3 TCP interval with one stream per socket"""
+    streams = [{"socket": s, "end": end, "bytes": 1000 * s, "bits_per_second": 8e3 * s, "retransmits": 0,
+                "rtt": 1500} for s in sockets]
+    return {"streams": streams, "sum": {"end": end, "bytes": sum(x["bytes"] for x in streams),
+                                        "bits_per_second": sum(x["bits_per_second"] for x in streams)}}
+
+# -------- Rows -------- #
+def test_one_row_per_stream_plus_sum(store):
+    capture = IntervalCapture(store, flush_seconds=3600)
+    record = capture.recorder("10.0.0.1:5201", start_ns=START)
+    record(interval(1.0))
+    record(interval(2.0, sockets=(7, 5)))
+    assert len(capture.read()) == 0          # buffered until flushed
+    capture.flush()
+    rows = capture.read()
+    # Streams keep the id of their socket's first appearance
+    assert rows["stream"].tolist() == [SUM_STREAM, 0, 1, SUM_STREAM, 1, 0]
+    assert rows["bytes"].tolist() == [12000, 5000, 7000, 12000, 7000, 5000]
+    assert (rows["timestamp"][:3] == START + 10**9).all() and (rows["timestamp"][3:] == START + 2 * 10**9).all()
+    assert np.allclose(rows["rtt_ms"][rows["stream"] >= 0], 1.5)
+    assert np.isnan(rows["rtt_ms"][rows["stream"] == SUM_STREAM]).all()
+    assert (rows["target"] == store.target_id("10.0.0.1:5201")).all()
+
+def test_full_buffer_flushes_without_loss(store):
+    capture = IntervalCapture(store, capacity=8, flush_seconds=3600)
+    record = capture.recorder("10.0.0.1:5201", start_ns=START)
+    for i in range(10):
+        record(interval(float(i + 1)))
+    assert 0 < len(capture.read()) < 30 and capture.size <= 8
+    capture.flush()
+    rows = capture.read()
+    assert len(rows) == capture.rows_written == 30
+    assert np.array_equal(np.unique(rows["timestamp"]), START + np.arange(1, 11) * 10**9)
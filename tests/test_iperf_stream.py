@@ -0,0 +1,61 @@
+import asyncio, io, json, sys
+import pytest
+from iperf_stream import (IperfJsonScanner, iter_iperf_events, run_iperf_streaming, run_iperf_streaming_async,
+                          iperf_json_stream_cmd)
+
+def document(n=5):
+    return {"start": {"connected": [{"socket": 5}]},
+            "intervals": [{"sum": {"end": i + 1.0, "bytes": 1000 * i}, "streams": []} for i in range(n)],
+            "end": {"sum_received": {"bits_per_second": 8e6}}}
+
+def fake_iperf3(text, exit_code=0):
+    """A command that prints `text` the way iperf3 -J would, then exits"""
+    return [sys.executable, "-c", f"import sys; sys.stdout.write({text!r}); sys.exit({exit_code})"]
+
+# -------- Incremental Parse -------- #
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 16])
+def test_scanner_matches_json_loads(chunk):
+    text = json.dumps(document(), indent=2)
+    scanner = IperfJsonScanner()
+    events = []
+    for i in range(0, len(text), chunk):
+        events += scanner.feed(text[i:i + chunk])
+    scanner.close()
+    doc = document()
+    assert events == ([("start", doc["start"])] + [("interval", i) for i in doc["intervals"]] +
+                      [("end", doc["end"])])
+
+def test_truncated_output_raises():
+    text = json.dumps(document())
+    with pytest.raises(ValueError):
+        list(iter_iperf_events(io.StringIO(text[:len(text) // 2])))
+    with pytest.raises(ValueError):
+        list(iter_iperf_events(io.StringIO("iperf3: error")))
+
+def test_json_stream_lines():
+    lines = "".join(json.dumps({"event": e, "data": d}) + "\n"
+                    for e, d in [("start", {}), ("interval", {"sum": {}}), ("end", {"x": 1})])
+    assert [e for e, _ in iter_iperf_events(io.StringIO(lines), json_stream=True)] == ["start", "interval", "end"]
+    assert iperf_json_stream_cmd(["iperf3", "-c", "h", "-J"]) == ["iperf3", "-c", "h", "--json-stream"]
+
+# -------- Subprocess -------- #
+def test_run_keeps_start_and_end_only():
+    seen = []
+    doc = run_iperf_streaming(fake_iperf3(json.dumps(document(20))), on_interval=seen.append, json_stream=False)
+    assert set(doc) == {"start", "end", "intervals_seen"} and doc["intervals_seen"] == len(seen) == 20
+    doc = asyncio.run(run_iperf_streaming_async(fake_iperf3(json.dumps(document(3))), json_stream=False))
+    assert doc["end"] == document()["end"] and doc["intervals_seen"] == 3
+
+def test_failed_run_reports_iperf3_error():
+    # iperf3 -J still prints a document with "error" when it exits non-zero
+    with pytest.raises(RuntimeError, match="unable to connect"):
+        run_iperf_streaming(fake_iperf3(json.dumps({"start": {}, "intervals": [], "end": {},
+                                                    "error": "unable to connect"}), 1), json_stream=False)
+
+def test_live_reports_unreadable_output(monkeypatch, capsys):
+    import wifi_live
+    monkeypatch.setattr(wifi_live, "run_iperf_streaming",
+                        lambda cmd, on_interval=None: run_iperf_streaming(fake_iperf3('{"start": {'),
+                                                                          json_stream=False))
+    assert wifi_live.run_iperf_test() is None
+    assert "❌" in capsys.readouterr().out
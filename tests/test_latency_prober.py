@@ -0,0 +1,85 @@
+import asyncio, time
+import pytest
+import latency_prober
+from latency_prober import LatencyProber
+
+def icmp_allowed():
+    try:
+        sock, _ = latency_prober.open_icmp_socket()
+    except OSError:
+        return False
+    sock.close()
+    return True
+
+needs_icmp = pytest.mark.skipif(not icmp_allowed(), reason="no ICMP socket (ping_group_range / CAP_NET_RAW)")
+
+# -------- Measurement -------- #
+@needs_icmp
+def test_measure_target_closes_its_prober(monkeypatch):
+    import wifi_framework
+    from wifi_scheduler import Target
+    from traffic_engine import serve_in_thread
+    probers = []
+
+    class Recorded(LatencyProber):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            probers.append(self)
+    monkeypatch.setattr(wifi_framework, "LatencyProber", Recorded)
+    server = serve_in_thread()
+    try:
+        target = Target("127.0.0.1", server.port, duration=0.2, engine="native")
+        for _ in range(3):
+            sample = asyncio.run(wifi_framework.measure_target(target))
+            assert sample.latency_ms is not None
+    finally:
+        server.close()
+    assert len(probers) == 3 and all(p._sock is None for p in probers)
+
+# -------- Packets / Stats -------- #
+def test_echo_request_checksum():
+    packet = latency_prober.echo_request(0x1234, 7)
+    assert packet[0] == latency_prober.ICMP_ECHO_REQUEST and len(packet) == 8 + len(latency_prober.PAYLOAD)
+    # A packet carrying its own checksum sums to zero
+    assert latency_prober.icmp_checksum(packet) == 0
+    assert latency_prober.icmp_checksum(latency_prober.echo_request(1, 2, b"odd")) == 0
+
+def test_latency_stats():
+    s = latency_prober.latency_stats([1.0, 2.0, 3.0], 4)
+    assert (s["received"], s["loss_percent"], s["min"], s["avg"], s["p50"]) == (3, 25.0, 1.0, 2.0, 2.0)
+    s = latency_prober.latency_stats([], 3)
+    assert s["loss_percent"] == 100.0 and s["avg"] is None
+    assert latency_prober.latency_stats([], 0)["loss_percent"] is None
+
+# -------- Probing -------- #
+@needs_icmp
+def test_many_hosts_in_one_train_time():
+    hosts = [f"127.0.0.{i}" for i in range(1, 41)]
+    start = time.perf_counter()
+    results = latency_prober.probe_hosts(hosts, count=3, interval=0.05)
+    elapsed = time.perf_counter() - start
+    assert set(results) == set(hosts)
+    assert all(r["received"] == 3 and r["avg"] < 50 for r in results.values())
+    # Concurrent trains: about one train's length, not one per host
+    assert elapsed < 1.0
+
+@needs_icmp
+def test_unresolvable_host():
+    results = latency_prober.probe_hosts(["no-such-host.invalid", "127.0.0.1"], count=1)
+    assert results["no-such-host.invalid"]["sent"] == 0
+    assert results["127.0.0.1"]["received"] == 1
+
+@needs_icmp
+def test_probes_run_while_the_test_runs():
+    result, stats = latency_prober.run_with_probes("127.0.0.1", time.sleep, 0.3, interval=0.05)
+    assert result is None and stats["sent"] >= 4 and stats["received"] == stats["sent"]
+
+@needs_icmp
+def test_prober_is_bound_to_its_loop():
+    prober = LatencyProber()
+    asyncio.run(prober.probe("127.0.0.1", count=1))
+    try:
+        with pytest.raises(RuntimeError):
+            asyncio.run(prober.probe("127.0.0.1", count=1))
+    finally:
+        prober.close()
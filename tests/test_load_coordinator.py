@@ -0,0 +1,126 @@
+import asyncio, json, time
+import numpy as np
+import load_coordinator
+from load_coordinator import (Coordinator, Worker, read_frame, write_frame, encode_results, decode_results,
+                              HELLO, PLAN, RESULTS, ACK, SEQ)
+from wifi_scheduler import Target
+
+def batch(n, first):
+    from wifi_store import RESULT_DTYPE
+    records = np.zeros(n, dtype=RESULT_DTYPE)
+    records["retransmits"] = np.arange(first, first + n)     # row key
+    return records
+
+async def hello(port, worker="w1", session="a", acked=0):
+    """Raw worker connection: HELLO, then the PLAN and the coordinator's last ACK"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    write_frame(writer, HELLO, json.dumps({"worker": worker, "session": session, "target": "10.0.0.1:5201",
+                                           "time": time.time(), "acked": acked}).encode())
+    kind, _ = await read_frame(reader)
+    assert kind == PLAN
+    kind, payload = await read_frame(reader)
+    assert kind == ACK
+    return reader, writer, SEQ.unpack(payload)[0]
+
+async def send(writer, seq, records):
+    write_frame(writer, RESULTS, encode_results(seq, records))
+    await writer.drain()
+
+async def ack(reader):
+    while True:
+        kind, payload = await asyncio.wait_for(read_frame(reader), 5)
+        if kind == ACK:
+            return SEQ.unpack(payload)[0]
+
+async def with_coordinator(store, scenario):
+    coord = Coordinator(store, "127.0.0.1", 0, rounds=None, expect=1, lead=0.0)
+    task = asyncio.ensure_future(coord.run())
+    while coord.port == 0:
+        await asyncio.sleep(0.01)
+    try:
+        await scenario(coord)
+        await coord._flush()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    return coord
+
+def stored_keys(store):
+    return sorted(store.read_range()["retransmits"].astype(int).tolist())
+
+# -------- Wire Format -------- #
+def test_results_roundtrip():
+    seq, records = decode_results(encode_results(7, batch(3, 10)))
+    assert seq == 7 and records["retransmits"].tolist() == [10, 11, 12]
+
+# -------- Coordinator -------- #
+def test_resend_after_reconnect_is_deduplicated(store):
+    async def scenario(coord):
+        reader, writer, acked = await hello(coord.port)
+        assert acked == 0
+        await send(writer, 1, batch(4, 0))
+        await send(writer, 2, batch(4, 4))
+        assert await ack(reader) == 2
+        writer.close()
+        # Reconnected before hearing about seq 3: everything unacknowledged is resent
+        reader, writer, acked = await hello(coord.port)
+        assert acked == 2
+        await send(writer, 3, batch(4, 8))
+        writer.close()
+        reader, writer, acked = await hello(coord.port, acked=2)
+        await send(writer, 3, batch(4, 8))
+        await send(writer, 4, batch(4, 12))
+        assert await ack(reader) == 4
+        writer.close()
+    coord = asyncio.run(with_coordinator(store, scenario))
+    assert stored_keys(store) == list(range(16)) and coord.rows == 16
+
+def test_restarted_worker_starts_over(store):
+    async def scenario(coord):
+        reader, writer, _ = await hello(coord.port, session="a")
+        for seq in range(1, 6):
+            await send(writer, seq, batch(2, 2 * seq))
+        assert await ack(reader) == 5
+        writer.close()
+        # Same --id, new process: seq starts again at 1 and is not mistaken for a resend
+        reader, writer, acked = await hello(coord.port, session="b")
+        assert acked == 0
+        await send(writer, 1, batch(2, 100))
+        assert await ack(reader) == 1
+        writer.close()
+    coord = asyncio.run(with_coordinator(store, scenario))
+    assert stored_keys(store) == list(range(2, 12)) + [100, 101]
+    assert len(coord.workers) == 1
+
+# -------- Worker -------- #
+def test_worker_pauses_when_outbox_is_full(monkeypatch):
+    monkeypatch.setattr(load_coordinator, "MAX_OUTBOX", 3)
+    measured = []
+
+    async def measure(target):
+        measured.append(time.time())
+        return batch(1, len(measured))
+
+    async def silent_coordinator(reader, writer):
+        # Hands out a plan, then never acknowledges anything
+        await read_frame(reader)
+        plan = {"base": time.time(), "period": 0.01, "rounds": 50, "duration": 0, "time": time.time()}
+        write_frame(writer, PLAN, json.dumps(plan).encode())
+        await writer.drain()
+        while True:
+            await read_frame(reader)
+
+    async def scenario():
+        server = await asyncio.start_server(silent_coordinator, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        worker = Worker(f"127.0.0.1:{port}", Target(duration=0), measure, worker_id="w", batch_rows=1)
+        task = asyncio.ensure_future(worker.run())
+        await asyncio.sleep(1.0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        server.close()
+        return worker
+    worker = asyncio.run(scenario())
+    # Every measured batch is still queued for resending: none was dropped to make room
+    assert len(measured) == 3
+    assert [seq for seq, _ in worker._outbox] == [1, 2, 3]
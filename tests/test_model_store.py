@@ -0,0 +1,81 @@
+import json, os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from predictor_service import FlatForest, MicroBatchPredictor, LATEST_FILE
+from model_store import save_flat, load_flat, load_model, flat_path, ModelWatcher
+
+def forest(seed, trees=8):
+    rng = np.random.default_rng(seed)
+    X = rng.gamma(2.0, 10.0, (1000, 4))
+    y = (X[:, seed % 4] > 20).astype(int)
+    return RandomForestClassifier(n_estimators=trees, max_depth=8, random_state=seed).fit(X, y), X
+
+def publish(model_dir, version, clf):
+    """What online_training.publish leaves behind for serving: the pickle, its .flat copy and LATEST"""
+    stem = os.path.join(model_dir, f"model-{version:06d}")
+    joblib.dump(clf, stem + ".pkl")
+    save_flat(FlatForest.from_sklearn(clf), stem + ".flat")
+    with open(os.path.join(model_dir, LATEST_FILE), "w") as f:
+        f.write(os.path.basename(stem))
+    return stem
+
+# -------- Artifacts -------- #
+def test_flat_roundtrip_is_memory_mapped(tmp_path):
+    clf, X = forest(1)
+    path = save_flat(FlatForest.from_sklearn(clf), str(tmp_path / "m.flat"))
+    mapped = load_flat(path)
+    assert isinstance(mapped.threshold, np.memmap)
+    assert not isinstance(load_flat(path, mmap=False).threshold, np.memmap)
+    np.testing.assert_array_equal(mapped.predict(X[:100]), clf.predict(X[:100]))
+    with open(os.path.join(path, "meta.json")) as f:
+        assert json.load(f)["trees"] == 8
+
+def test_save_replaces_existing(tmp_path):
+    path = str(tmp_path / "m.flat")
+    save_flat(FlatForest.from_sklearn(forest(1)[0]), path)
+    clf, X = forest(2, trees=3)
+    save_flat(FlatForest.from_sklearn(clf), path)
+    assert len(load_flat(path).roots) == 3
+    assert os.listdir(tmp_path) == ["m.flat"]
+
+def test_unknown_format_is_refused(tmp_path):
+    path = save_flat(FlatForest.from_sklearn(forest(1)[0]), str(tmp_path / "m.flat"))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"format": 99}, f)
+    with pytest.raises(ValueError):
+        load_flat(path)
+
+def test_load_model_prefers_flat_copy(tmp_path):
+    clf, X = forest(3)
+    pkl = str(tmp_path / "wifi_rf_model.pkl")
+    joblib.dump(clf, pkl)
+    assert flat_path(pkl) == str(tmp_path / "wifi_rf_model.flat")
+    from_pickle = load_model(pkl)
+    assert not isinstance(from_pickle.threshold, np.memmap)
+    save_flat(from_pickle, flat_path(pkl))
+    assert isinstance(load_model(pkl).threshold, np.memmap)
+    np.testing.assert_array_equal(load_model(pkl[:-4]).predict(X[:50]), clf.predict(X[:50]))
+
+# -------- Hot Reload -------- #
+def test_watcher_swaps_new_versions(tmp_path, capsys):
+    models = str(tmp_path)
+    first, X = forest(0)
+    stem = publish(models, 1, first)
+    predictor = MicroBatchPredictor(load_model(stem))
+    watcher = ModelWatcher(predictor, model_dir=models, current=stem)
+    try:
+        assert not watcher.check()
+        second, _ = forest(1)
+        assert (second.predict(X) != first.predict(X)).any()
+        stem = publish(models, 2, second)
+        assert watcher.check() and watcher.current == stem
+        assert predictor.predict_batch(X).tolist() == second.predict(X).tolist()
+        # A version pruned before it could be loaded is skipped, not fatal
+        with open(os.path.join(models, LATEST_FILE), "w") as f:
+            f.write("model-000009")
+        assert not watcher.check() and watcher.current == stem
+        assert "could not load" in capsys.readouterr().out
+    finally:
+        predictor.close()
@@ -0,0 +1,69 @@
+import json, os
+import numpy as np
+import pytest
+import online_training
+from online_training import degraded_labels, label_chunk, Reservoir, update, load_state
+from predictor_service import latest_model_file
+
+@pytest.fixture
+def small_forest(monkeypatch):
+    monkeypatch.setattr(online_training, "INITIAL_TREES", 4)
+
+def train(store, model_dir, **kwargs):
+    return update(store, model_dir=str(model_dir), trees=2, n_jobs=1, **kwargs)
+
+# -------- Labels -------- #
+def test_degraded_labels():
+    X = np.array([[100, 10, 1, 0], [100, 60, 1, 0], [100, 10, 1, 6], [40, 10, 1, 0], [40, 10, 1, 0]], float)
+    baseline = np.array([100, 100, 100, 100, np.nan])
+    assert degraded_labels(X, baseline).tolist() == [0, 1, 1, 1, 0]
+
+def test_labels_carry_across_chunks(records):
+    rec = records(600)
+    X, y = label_chunk(rec, {})
+    tails, builder = {}, online_training.FeatureBuilder()
+    parts = [label_chunk(rec[i:i + 97], tails, builder=builder) for i in range(0, 600, 97)]
+    assert np.array_equal(np.concatenate([p[1] for p in parts]), y)
+    assert np.allclose(np.concatenate([p[0] for p in parts]), X, equal_nan=True)
+
+def test_reservoir_is_bounded_and_uniform():
+    r = Reservoir(1000, seed=1)
+    for i in range(0, 100_000, 10_000):
+        X = np.arange(i, i + 10_000, dtype=float)[:, None].repeat(len(online_training.FEATURE_NAMES), 1)
+        r.add(X, np.zeros(10_000, dtype=np.int8))
+    assert len(r.X) == 1000 and r.seen == 100_000
+    # Old and new rows are kept alike
+    assert 400 < (r.X[:, 0] < 50_000).sum() < 600
+
+# -------- Incremental Runs -------- #
+def test_runs_read_each_row_once(store, records, tmp_path, small_forest):
+    rec = records(400)
+    models = tmp_path / "models"
+    for i in range(0, 200, 20):
+        store.append_records(rec[i:i + 20])
+    assert train(store, models).endswith("model-000001.pkl")
+    assert latest_model_file(str(models)) == str(models / "model-000001")
+    assert train(store, models) is None
+    # More rows, some of them compacted together with rows the last run already read
+    for i in range(200, 400, 20):
+        store.append_records(rec[i:i + 20])
+    train(store, models)
+    state, clf, history, _ = load_state(str(models))
+    assert state["version"] == 2 and state["rows"] == 400
+    assert len(clf.estimators_) == 4 + 2
+    assert len(history.X) == 400 and history.seen == 400
+
+def test_full_rebuild_and_pruning(store, records, tmp_path, small_forest, monkeypatch):
+    monkeypatch.setattr(online_training, "KEEP_VERSIONS", 2)
+    models = tmp_path / "models"
+    rec = records(300)
+    for i in range(0, 300, 100):
+        store.append_records(rec[i:i + 100])
+        train(store, models)
+    path = train(store, models, full=True)
+    state, clf, _, _ = load_state(str(models))
+    assert state["version"] == 4 and state["rows"] == 300 and len(clf.estimators_) == 4
+    assert sorted(f for f in os.listdir(models) if f.endswith(".pkl")) == ["model-000003.pkl", "model-000004.pkl"]
+    assert os.path.isdir(path[:-4] + ".flat")
+    with open(models / "state.json") as f:
+        assert json.load(f)["model"] == "model-000004.pkl"
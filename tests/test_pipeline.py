@@ -0,0 +1,100 @@
+import itertools, threading, time
+import numpy as np
+import pytest
+import pipeline
+from pipeline import StageQueue, Stage, Ticker, BLOCK, DROP_OLDEST, COALESCE, concat_records
+from wifi_store import Sample, now_ns
+
+# -------- Queue Policies -------- #
+def test_drop_oldest_keeps_the_newest():
+    q = StageQueue(3, DROP_OLDEST)
+    for i in range(10):
+        assert q.put(i)
+    assert q.get_batch(10) == [7, 8, 9]
+    assert q.stats()["dropped"] == 7 and q.stats()["high_water"] == 3
+
+def test_coalesce_merges_into_the_last_item():
+    q = StageQueue(1, COALESCE, concat_records)
+    for i in range(5):
+        q.put(np.arange(i * 2, i * 2 + 2))
+    (merged,) = q.get_batch(5)
+    assert merged.tolist() == list(range(10)) and q.stats()["coalesced"] == 4
+    q.put(np.arange(2))
+    assert q.get_batch(1)[0].tolist() == [0, 1]
+
+def test_block_waits_for_room():
+    q = StageQueue(2, BLOCK)
+    q.put(0)
+    q.put(1)
+    done = threading.Event()
+    threading.Thread(target=lambda: (q.put(2), done.set()), daemon=True).start()
+    assert not done.wait(0.1)
+    assert q.get_batch(1) == [0]
+    assert done.wait(1.0) and q.get_batch(5) == [1, 2]
+    # Closing releases a blocked producer
+    q.put(3)
+    q.put(4)
+    threading.Thread(target=lambda: (q.put(5), done.set()), daemon=True).start()
+    done.clear()
+    q.close()
+    assert done.wait(1.0) and not q.put(6)
+
+def test_get_batch_delay_timeout_and_close():
+    q = StageQueue()
+    assert q.get_batch(timeout=0.01) == []
+    q.put(1)
+    threading.Timer(0.05, q.put, (2,)).start()
+    assert q.get_batch(4, max_delay=0.5) == [1, 2]
+    q.put(3)
+    q.close()
+    assert q.get_batch(4) == [3] and q.get_batch(4) is None
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        StageQueue(policy="spill")
+
+# -------- Stages -------- #
+def test_stage_survives_errors_and_closes_outputs(capsys):
+    inbox, out = StageQueue(), StageQueue()
+
+    def func(batch):
+        if 3 in batch:
+            raise RuntimeError("bad batch")
+        return sum(batch)
+    stage = Stage("sum", func, inbox, [out], batch=2)
+    stage.start()
+    for i in range(6):
+        inbox.put(i)
+    inbox.close()
+    stage.join(2)
+    assert out.get_batch(10) == [1, 9] and out.get_batch(1) is None
+    assert stage.stats()["errors"] == 1 and stage.stats()["items"] == 6
+    assert "❌ sum stage: bad batch" in capsys.readouterr().out
+
+def test_ticker_skips_overrun_slots():
+    out = StageQueue()
+    durations = iter([0.0, 0.25, 0.0, 0.0])
+
+    def measure():
+        time.sleep(next(durations))
+        return 1
+    ticker = Ticker("measure", measure, 0.1, [out], count=4)
+    ticker.start()
+    ticker.join(2)
+    # The 0.25 s test overran two 0.1 s slots; later tests keep to the grid instead of drifting
+    assert ticker.items == 4 and ticker.skipped == 2
+    assert len(out.get_batch(10)) == 4 and out.get_batch(1) is None
+
+# -------- Test Pipeline -------- #
+def test_pipeline_persists_every_sample(store):
+    n = itertools.count()
+    measure = lambda: Sample(now_ns(), throughput_mbps=100.0 + next(n), latency_ms=5.0)
+    pipe, ui = pipeline.test_pipeline(measure, store, "10.0.0.1:5201", period=0, count=50, persist_batch=8)
+    pipe.start()
+    pipe.join()
+    rows = store.read_range()
+    assert len(rows) == 50 and sorted(rows["throughput_mbps"].tolist()) == [100.0 + i for i in range(50)]
+    assert (rows["target"] == store.target_id("10.0.0.1:5201")).all()
+    # The UI tap holds one coalesced update with everything it was given
+    (update,) = ui.get_batch(10)
+    assert len(update) == 50
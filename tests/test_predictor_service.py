@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from predictor_service import FlatForest, MicroBatchPredictor, SKLEARN_ROWS
+
+@pytest.fixture(scope="module")
+def forests():
+    rng = np.random.default_rng(4)
+    X = rng.gamma(2.0, 10.0, (4000, 6))
+    y = (X[:, 0] + rng.normal(0, 5, len(X)) > 25).astype(int) + (X[:, 1] > 35)
+    X[rng.random(X.shape) < 0.03] = np.nan          # trained with missing values
+    clf = RandomForestClassifier(n_estimators=30, max_depth=12, random_state=0).fit(X, y)
+    return clf, FlatForest.from_sklearn(clf)
+
+def queries(n, seed=5, features=6):
+    rng = np.random.default_rng(seed)
+    X = rng.gamma(2.0, 10.0, (n, features))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+# -------- FlatForest vs sklearn -------- #
+def test_predict_matches_sklearn(forests):
+    clf, flat = forests
+    X = queries(SKLEARN_ROWS - 1)              # below the hand-off: scored by the flat arrays
+    np.testing.assert_array_equal(flat.predict(X), clf.predict(X))
+    np.testing.assert_allclose(flat.predict_proba(X), clf.predict_proba(X), rtol=1e-12, atol=1e-12)
+
+def test_chunked_walk_matches_sklearn(forests):
+    clf, flat = forests
+    X = queries(1000, seed=6)
+    np.testing.assert_allclose(flat.predict_proba(X, chunk_rows=64), clf.predict_proba(X), rtol=1e-12, atol=1e-12)
+
+def test_without_sklearn_matches(forests):
+    clf, flat = forests
+    bare = FlatForest(flat.feature, flat.threshold, flat.left, flat.right, flat.missing_left, flat.value,
+                      flat.roots, flat.classes, n_features=flat.n_features)
+    X = queries(SKLEARN_ROWS * 2, seed=7)
+    np.testing.assert_array_equal(bare.predict(X), clf.predict(X))
+
+def test_extra_columns_ignored(forests):
+    clf, flat = forests
+    X = queries(200, seed=8)
+    wide = np.hstack([X, np.full((len(X), 3), 1e9)])
+    np.testing.assert_array_equal(flat.predict(wide), clf.predict(X))
+    with pytest.raises(ValueError):
+        flat.predict(X[:, :4])
+
+def test_micro_batch_predictor(forests):
+    clf, flat = forests
+    X = queries(50, seed=9)
+    predictor = MicroBatchPredictor(flat)
+    try:
+        assert [predictor.predict(x) for x in X] == clf.predict(X).tolist()
+    finally:
+        predictor.close()
@@ -0,0 +1,74 @@
+import os
+import numpy as np
+from report_render import make_job, job_key, render_plots, render_job, render_metric_plots, REPORT_POINTS
+
+PNG = b"\x89PNG"
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.datetime64("2024-01-01", "ns").astype(np.int64) + np.arange(n) * 5 * 10**9
+    return t, rng.gamma(2.0, 8.0, n)
+
+class Counting:
+    """A stand-in renderer that records which jobs it was asked for"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, job):
+        self.calls.append(job["metric"])
+        return f"png:{job['metric']}:{job['rows']}".encode()
+
+# -------- Jobs -------- #
+def test_job_is_downsampled_with_markers():
+    t, y = series(100_000)
+    mask = np.zeros(len(t), dtype=bool)
+    mask[::10] = True
+    job = make_job("latency_ms", t, y, anomaly_mask=mask)
+    assert len(job["x"]) <= 2 * REPORT_POINTS and job["rows"] == 100_000
+    assert job["y"].max() == y.max()
+    assert len(job["anomalies"][0]) <= 2000
+
+def test_key_follows_the_data():
+    t, y = series(500)
+    key = job_key(make_job("latency_ms", t, y))
+    assert key == job_key(make_job("latency_ms", t, y.copy()))
+    y[7] += 1
+    assert key != job_key(make_job("latency_ms", t, y))
+    assert key != job_key(make_job("jitter_ms", t, y))
+
+# -------- Cache -------- #
+def test_second_build_is_served_from_cache(tmp_path):
+    t, y = series(500)
+    jobs = [make_job(m, t, y * i) for i, m in enumerate(["a", "b", "c"], 1)]
+    render = Counting()
+    first = render_plots(jobs, workers=1, cache_dir=str(tmp_path), render=render)
+    assert render.calls == ["a", "b", "c"]
+    again = render_plots(jobs, workers=1, cache_dir=str(tmp_path), render=render)
+    assert again == first and len(render.calls) == 3
+    # One changed plot is the only one rendered again
+    jobs[1] = make_job("b", t, y * 5)
+    render_plots(jobs, workers=1, cache_dir=str(tmp_path), render=render)
+    assert render.calls == ["a", "b", "c", "b"]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+def test_paths_only(tmp_path):
+    t, y = series(50)
+    paths = render_plots([make_job("a", t, y)], workers=1, cache_dir=str(tmp_path), render=Counting(), load=False)
+    assert os.path.dirname(paths[0]) == str(tmp_path) and open(paths[0], "rb").read() == b"png:a:50"
+
+def test_parallel_render_matches_serial(tmp_path):
+    t, y = series(3000)
+    jobs = [make_job(m, t, y + i) for i, m in enumerate(["throughput_mbps", "latency_ms"])]
+    serial = render_plots(jobs, workers=1, cache_dir=None)
+    parallel = render_plots(jobs, workers=2, cache_dir=str(tmp_path))
+    assert all(png.startswith(PNG) for png in serial)
+    assert serial == parallel
+
+def test_metric_plots_from_store_frame(store, records):
+    store.append_records(records(300))
+    df = store.read_frame()
+    masks = {"latency_ms": (df["latency_ms"] > 40).values}
+    out = render_metric_plots(df, ["latency_ms", "not_a_column"], masks, predicted=True, cache_dir=None)
+    assert [m for m, _ in out] == ["latency_ms"] and out[0][1].startswith(PNG)
+    assert render_job(make_job("x", *series(10))).startswith(PNG)
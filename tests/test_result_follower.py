@@ -0,0 +1,96 @@
+import numpy as np
+from result_follower import ResultFollower
+from anomaly_detector import AnomalyDetector
+
+def follow(store, **kwargs):
+    return ResultFollower(store, capacity=10_000, backfill=False, **kwargs)
+
+def same_rows(a, b):
+    key = ["timestamp", "target"]
+    return np.array_equal(np.sort(a, order=key), np.sort(b, order=key))
+
+# -------- Tailing -------- #
+def test_backfill_then_tail(store, records):
+    rec = records(100)
+    store.append_records(rec[:30])
+    follower = ResultFollower(store, capacity=20)
+    assert np.array_equal(follower.records(), rec[10:30])
+    store.append_records(rec[30:40])
+    assert np.array_equal(follower.poll(), rec[30:40])
+    assert len(follower.poll()) == 0
+
+def test_rotation_on_seal(store, records):
+    rec = records(200)
+    follower = follow(store)
+    got = []
+    # 10-row appends: the followed segment is sealed mid-way, several times
+    for i in range(0, 200, 10):
+        store.append_records(rec[i:i + 10])
+        got.append(follower.poll())
+    assert np.array_equal(np.concatenate(got), rec)
+
+def test_rotation_across_several_seals_between_polls(store, records):
+    rec = records(150)
+    follower = follow(store)
+    store.append_records(rec[:20])
+    follower.poll()
+    for i in range(20, 150, 10):
+        store.append_records(rec[i:i + 10])
+    assert np.array_equal(follower.poll(), rec[20:])
+
+def test_compaction_does_not_repeat_rows(store, records):
+    rec = records(4 * 64 + 30)
+    follower = follow(store)
+    got = []
+    for i in range(0, len(rec), 16):
+        store.append_records(rec[i:i + 16])
+        if i % 48 == 0:
+            got.append(follower.poll())
+    got.append(follower.poll())
+    assert len(store.manifest["segments"]) == 1       # the four sealed segments were merged
+    got = np.concatenate(got)
+    assert len(got) == len(rec) and same_rows(got, rec)
+
+def test_truncated_segment_restarts(store, records):
+    rec = records(30)
+    follower = follow(store)
+    store.append_records(rec[:20])
+    follower.poll()
+    active = store._file(store.manifest["active"])
+    crc = store.crc_file(store.manifest["active"])
+    store.close()
+    open(active, "wb").close()
+    open(crc, "wb").close()
+    store.append_records(rec[20:])
+    assert np.array_equal(follower.poll(), rec[20:])
+
+def test_unchecked_batch_is_not_read(store, records):
+    rec = records(20)
+    follower = follow(store)
+    store.append_records(rec[:10])
+    with open(store._file(store.manifest["active"]), "ab") as f:
+        f.write(rec[10:].tobytes())     # written without its .crc entry
+    assert np.array_equal(follower.poll(), rec[:10])
+
+def test_detector_flags_followed_rows(store, records):
+    rec = records(200)
+    rec["flags"] = 0
+    rec["latency_ms"][150] = 1e4
+    follower = follow(store, detector=AnomalyDetector())
+    store.append_records(rec)
+    follower.poll()
+    assert follower.anomaly_mask("latency_ms")[150]
+
+def test_backfill_then_compaction_emits_no_duplicates(store, records):
+    rec = records(4 * 64)
+    rec["predicted_degraded"] = -1
+    follower = follow(store)
+    for i in range(0, 3 * 64, 16):
+        store.append_records(rec[i:i + 16])
+    assert len(follower.poll()) == 3 * 64
+    # backfill scores the sealed rows in place, then the next seal compacts them
+    for seg in store.manifest["segments"]:
+        store.write_field(seg["name"], "predicted_degraded", np.arange(seg["rows"]), np.ones(seg["rows"], np.int8))
+    store.append_records(rec[3 * 64:])
+    assert len(store.manifest["segments"]) == 1
+    assert np.array_equal(follower.poll(), rec[3 * 64:])
@@ -0,0 +1,144 @@
+import operator
+import numpy as np
+import pytest
+from wifi_store import ResultStore, ANOMALY_FLAGS, TEST_TYPES
+from result_query import ResultQuery, BLOCK_ROWS, ZONE_METRICS
+from benchmarks import synthetic_records
+
+ROWS = 60_000
+TARGETS = 8
+QUERIES = 300
+PY_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+          "==": operator.eq, "!=": operator.ne}
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory):
+    """A store of sorted, compacted and late-appended (unsorted) segments, with indexes"""
+    rng = np.random.default_rng(7)
+    rec = synthetic_records(ROWS, seed=7, targets=TARGETS)
+    rec["retransmits"] = np.arange(ROWS)         # unique row key
+    rec["test_type"] = rng.integers(0, len(TEST_TYPES), ROWS)
+    rec["flags"] = np.where(rng.random(ROWS) < 0.1, rng.integers(1, 16, ROWS), 0)
+    rec["predicted_degraded"] = rng.integers(-1, 2, ROWS)
+    rec["jitter_ms"][rng.random(ROWS) < 0.02] = np.nan
+    # A few runs of late rows, so some segments overlap in time and are not sorted
+    late = np.zeros(ROWS, dtype=bool)
+    for start in rng.integers(0, ROWS - 500, 6):
+        late[start:start + 500] = True
+    on_time = np.flatnonzero(~late)
+    order = np.concatenate([on_time[:40_000], np.flatnonzero(late), on_time[40_000:]])
+    store = ResultStore(str(tmp_path_factory.mktemp("query") / "store"), segment_rows=BLOCK_ROWS * 2,
+                        compact_every=0)
+    for t in range(TARGETS):
+        store.target_id(f"10.0.0.{t}:5201")
+    for i in range(0, ROWS, 3000):
+        store.append_records(rec[order[i:i + 3000]])
+        if i == ROWS // 2:
+            store.compact()
+    ResultQuery(store).build_indexes()
+    yield store, rec
+    store.close()
+
+def random_filters(rng, rec, names):
+    t = rec["timestamp"]
+    filters = {}
+    if rng.random() < 0.6:
+        a, b = np.sort(rng.integers(int(t[0]) - 10**10, int(t[-1]) + 10**10, 2))
+        filters["start"], filters["end"] = (int(a), int(b)) if rng.random() < 0.7 else (
+            (int(a), None) if rng.random() < 0.5 else (None, int(b)))
+    if rng.random() < 0.5:
+        picks = list(rng.choice(TARGETS, rng.integers(1, 4), replace=False))
+        picks = [names[p] if rng.random() < 0.5 else int(p) for p in picks]
+        filters["target"] = picks[0] if len(picks) == 1 else picks
+    if rng.random() < 0.3:
+        filters["test_type"] = str(rng.choice(TEST_TYPES))
+    if rng.random() < 0.6:
+        where = []
+        for _ in range(rng.integers(1, 3)):
+            field = str(rng.choice(ZONE_METRICS))
+            op = str(rng.choice(list(PY_OPS)))
+            values = rec[field][~np.isnan(rec[field].astype(float))]
+            value = float(values[rng.integers(len(values))]) if op in ("==", "!=") else \
+                float(np.quantile(values, rng.choice([0.01, 0.5, 0.9, 0.999])))
+            where.append((field, op, value) if rng.random() < 0.5 else f"{field} {op} {value!r}")
+        filters["where"] = where
+    if rng.random() < 0.3:
+        filters["anomalies"] = [True, False, "latency_ms", ["jitter_ms", "lost_percent"]][rng.integers(4)]
+    if rng.random() < 0.3:
+        filters["predicted"] = bool(rng.random() < 0.5)
+    return filters
+
+def brute_force(rec, names, start=None, end=None, target=None, test_type=None, where=None,
+                anomalies=None, predicted=None):
+    keep = np.ones(len(rec), dtype=bool)
+    if start is not None:
+        keep &= rec["timestamp"] >= start
+    if end is not None:
+        keep &= rec["timestamp"] < end
+    if target is not None:
+        ids = [t if isinstance(t, int) else names.index(t) for t in (target if isinstance(target, list) else [target])]
+        keep &= np.isin(rec["target"], ids)
+    if test_type is not None:
+        keep &= rec["test_type"] == TEST_TYPES.index(test_type)
+    for p in where or ():
+        field, op, value = p if isinstance(p, tuple) else (p.split()[0], p.split()[1], float(p.split()[2]))
+        keep &= PY_OPS[op](rec[field], value)
+    if anomalies is not None:
+        metrics = list(ANOMALY_FLAGS) if isinstance(anomalies, bool) else (
+            [anomalies] if isinstance(anomalies, str) else anomalies)
+        hit = (rec["flags"] & sum(ANOMALY_FLAGS[m] for m in metrics)) != 0
+        keep &= hit if anomalies is not False else ~hit
+    if predicted is not None:
+        keep &= (rec["predicted_degraded"] == 1) == predicted
+    return rec[keep]
+
+# -------- Parity -------- #
+def test_history_layout(history):
+    store, _ = history
+    segments = store.manifest["segments"]
+    assert len(segments) > 3 and any(s["rows"] > BLOCK_ROWS * 2 for s in segments)
+    assert not all(s["sorted"] for s in segments)
+    assert len(store._map(store.manifest["active"])) > 0
+
+def test_random_queries_match_brute_force(history):
+    store, rec = history
+    names = store.target_names()
+    rng = np.random.default_rng(11)
+    query = ResultQuery(store)
+    for i in range(QUERIES):
+        filters = random_filters(rng, rec, names)
+        got = query.select(**filters)
+        expected = brute_force(rec, names, **filters)
+        assert sorted(got["retransmits"].tolist()) == sorted(expected["retransmits"].tolist()), (i, filters)
+        assert query.count(**filters) == len(expected), (i, filters)
+
+def test_queries_without_indexes(history):
+    store, rec = history
+    names = store.target_names()
+    rng = np.random.default_rng(12)
+    query = ResultQuery(store, auto_index=False)
+    for seg in store.manifest["segments"]:
+        query.invalidate(seg["name"])
+    for i in range(30):
+        filters = random_filters(rng, rec, names)
+        assert len(query.select(**filters)) == len(brute_force(rec, names, **filters)), (i, filters)
+    assert ResultQuery(store).build_indexes() == len(store.manifest["segments"])
+
+def test_unknown_target_is_empty(history):
+    store, _ = history
+    assert len(ResultQuery(store).select(target="192.0.2.1:5201")) == 0
+
+def test_frame_labels_unknown_targets(store, records):
+    rec = records(4)
+    rec["target"] = [0, 1, 0, 9]
+    store.target_id("10.0.0.1:5201")
+    store.append_records(rec)
+    df = ResultQuery(store).frame(columns=["target", "latency_ms"])
+    assert df["target"].tolist() == ["10.0.0.1:5201", "unknown:1", "10.0.0.1:5201", "unknown:9"]
+
+def test_bad_predicate():
+    from result_query import parse_predicate
+    with pytest.raises(ValueError):
+        parse_predicate("latency_ms >> 5")
+    with pytest.raises(ValueError):
+        parse_predicate("nope > 5")
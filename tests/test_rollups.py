@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from rollups import LEVELS, SKETCH_LEVELS, METRICS, aggregate, merge_rows, prediction_rows, rollup_dtype, attach
+
+HOUR = LEVELS["1h"]
+
+@pytest.fixture
+def rolled(store, records):
+    """A store with rollups attached and 3 hours of rows appended in small batches"""
+    engine = attach(store)
+    rec = records(4 * 720 * 3)                    # 4 targets, one test every 5 s
+    rec["jitter_ms"][::37] = np.nan
+    for i in range(0, len(rec), 500):
+        store.append_records(rec[i:i + 500])
+    return engine, rec
+
+# -------- Merging -------- #
+def test_partial_rows_merge_to_whole(records):
+    rec = records(2000)
+    dtype = rollup_dtype(True)
+    whole = aggregate(rec, HOUR, dtype)
+    # Out of order, uneven chunks: every field must combine to the single-pass result
+    parts = [aggregate(rec[i:j], HOUR, dtype) for i, j in [(1500, 2000), (0, 7), (7, 900), (900, 1500)]]
+    merged = merge_rows(np.concatenate(parts))
+    for name in dtype.names:
+        if name.endswith("_sum") or name.endswith("_sumsq"):
+            assert np.allclose(merged[name], whole[name]), name
+        else:
+            assert np.array_equal(merged[name], whole[name]), name
+
+def test_prediction_rows_only_add_counts(records):
+    rec = records(400)
+    rec["predicted_degraded"] = -1
+    dtype = rollup_dtype(False)
+    base = aggregate(rec, HOUR, dtype)
+    rec["predicted_degraded"][::4] = 1
+    merged = merge_rows(np.concatenate([base, prediction_rows(rec, HOUR, dtype)]))
+    assert merged["predicted"].sum() == 100
+    assert np.array_equal(merged["rows"], base["rows"])
+    assert np.array_equal(merged["latency_ms_min"], base["latency_ms_min"])
+
+# -------- Engine -------- #
+def test_levels_match_raw_rows(rolled):
+    engine, rec = rolled
+    for level in LEVELS:
+        rows = engine.read(level, by_target=False)
+        assert rows["rows"].sum() == len(rec), level
+        for m in METRICS:
+            v = rec[m][~np.isnan(rec[m])]
+            assert rows[f"{m}_count"].sum() == len(v)
+            assert np.isclose(rows[f"{m}_sum"].sum(), v.astype(np.float64).sum())
+            assert rows[f"{m}_min"].min() == v.min() and rows[f"{m}_max"].max() == v.max()
+    assert "latency_ms_hist" not in engine.read("1min").dtype.names
+    assert all("latency_ms_hist" in engine.read(level).dtype.names for level in SKETCH_LEVELS)
+
+def test_compaction_keeps_totals(rolled):
+    engine, rec = rolled
+    before = engine.read("1h")
+    engine.compact()
+    assert np.array_equal(engine.read("1h"), before)
+
+def test_summarize_aligned_range(rolled):
+    engine, rec = rolled
+    start = int(rec["timestamp"][0]) + HOUR
+    summary = engine.summarize(start=start, end=start + HOUR)
+    assert summary["level"] == "1h"
+    hour = rec[(rec["timestamp"] >= start) & (rec["timestamp"] < start + HOUR)]
+    assert summary["rows"] == len(hour)
+    assert np.isclose(summary["latency_ms"]["mean"], hour["latency_ms"].astype(np.float64).mean())
+
+def test_summarize_unaligned_range_has_quantiles(rolled):
+    engine, rec = rolled
+    start = int(rec["timestamp"][0]) + HOUR + LEVELS["1min"] * 10
+    end = start + HOUR
+    summary = engine.summarize(start=start, end=end)
+    assert summary["level"] == "1min"
+    part = rec[(rec["timestamp"] >= start) & (rec["timestamp"] < end)]
+    assert summary["rows"] == len(part)
+    for m in METRICS:
+        s = summary[m]
+        assert s["min"] <= s["p50"] <= s["p99"] <= s["max"]
+        # Sketch bins are +/-15% wide, and the quantiles cover the overlapping hours
+        assert abs(s["p50"] - np.nanmedian(part[m])) <= 0.3 * np.nanmedian(part[m])
+
+def test_report_summary_lines_on_unaligned_range(rolled):
+    from generate_report import _summary_lines
+    engine, rec = rolled
+    start = int(rec["timestamp"][0]) + LEVELS["1min"] * 30
+    lines = list(_summary_lines(engine.summarize(start=start, end=start + HOUR)))
+    assert len(lines) == 4 and all("p99=" in line for line in lines)
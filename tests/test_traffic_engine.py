@@ -0,0 +1,63 @@
+import asyncio, socket
+import pytest
+from traffic_engine import serve_in_thread, run_test, run_test_async, parse_bandwidth
+
+@pytest.fixture(scope="module")
+def server():
+    s = serve_in_thread()
+    yield s
+    s.close()
+
+# -------- Loopback -------- #
+def test_tcp_flows(server):
+    intervals = []
+    doc = asyncio.run(run_test_async("127.0.0.1", server.port, duration=0.5, flows=4, interval=0.1,
+                                     on_interval=intervals.append))
+    end = doc["end"]
+    assert len(end["streams"]) == 4
+    # Everything sent was received: the server reports its byte counts back per flow
+    for stream in end["streams"]:
+        assert stream["receiver"]["bytes"] == stream["sender"]["bytes"] > 0
+    assert end["sum_received"]["bytes"] == end["sum_sent"]["bytes"]
+    assert end["sum_received"]["bits_per_second"] > 0
+    assert doc["intervals_seen"] == len(intervals) == 5
+    assert sum(i["sum"]["bytes"] for i in intervals) <= end["sum_sent"]["bytes"]
+    assert all(len(i["streams"]) == 4 for i in intervals)
+    assert doc["start"]["test_start"] == {"protocol": "TCP", "num_streams": 4, "blksize": 128 * 1024,
+                                          "duration": 0.5}
+
+def test_udp_paced(server):
+    doc = run_test("127.0.0.1", server.port, duration=0.5, flows=2, udp=True, bandwidth=parse_bandwidth("5M"))
+    s = doc["end"]["sum_received"]
+    assert s["packets"] > 0 and s["lost_percent"] < 5.0
+    # Paced to the requested rate, not flat out
+    assert s["bits_per_second"] < 2 * 2 * 5e6
+    assert {"jitter_ms", "lost_percent", "out_of_order"} <= set(s)
+
+def test_extract_metrics_shape(server):
+    from wifi_framework import extract_metrics
+    doc = run_test("127.0.0.1", server.port, duration=0.2, flows=2)
+    sample = extract_metrics(doc, latency={"avg": 1.0})
+    assert sample.throughput_mbps > 0 and sample.latency_ms == 1.0
+
+def test_unreachable_server():
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    with pytest.raises(RuntimeError):
+        run_test("127.0.0.1", port, duration=0.1)
+
+def test_zero_elapsed_summary():
+    from traffic_engine import _Flows, _summarize
+    state = _Flows([])
+    state.bytes = state.packets = state.retrans_start = [0, 0]
+    tcp = _summarize([(None, None, 0, 0.0)] * 2, state, False, 0.0)["end"]
+    assert tcp["sum_sent"]["bits_per_second"] == tcp["sum_received"]["bits_per_second"] == 0.0
+    udp = _summarize([(0, 0, 0, 0.0, 0.0)] * 2, state, True, 0.0)["end"]
+    assert udp["sum_received"]["bits_per_second"] == 0.0 and udp["sum_received"]["lost_percent"] == 0.0
+
+def test_parse_bandwidth():
+    assert parse_bandwidth("100M") == 100e6
+    assert parse_bandwidth("1.5G") == 1.5e9
+    assert parse_bandwidth(None) is None
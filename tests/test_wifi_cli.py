@@ -0,0 +1,40 @@
+import json, os, subprocess, sys
+import pytest
+import wifi_cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def imported_after(argv=None):
+    """Top-level packages a fresh interpreter has loaded after wifi_cli.main(argv) (or just importing it)"""
+    code = ("import json, sys, wifi_cli; " + ("wifi_cli.main(sys.argv[1:]); " if argv else "") +
+            "print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})))")
+    out = subprocess.run([sys.executable, "-c", code] + (argv or []), cwd=ROOT, capture_output=True, text=True,
+                         check=True)
+    return set(json.loads(out.stdout.splitlines()[-1]))
+
+# -------- Lazy Imports -------- #
+def test_plain_run_skips_heavy_modules():
+    loaded = imported_after(["run", "--dry-run"])
+    assert "wifi_framework" in loaded
+    assert not loaded & set(wifi_cli.HEAVY_MODULES)
+
+def test_cli_module_imports_no_framework_code():
+    loaded = imported_after()
+    assert not loaded & ({"numpy", "wifi_store", "wifi_framework"} | set(wifi_cli.HEAVY_MODULES))
+
+# -------- Arguments -------- #
+def test_every_subcommand_parses():
+    parser = wifi_cli.build_parser()
+    for argv in (["run", "--targets", "10.0.0.2:5201", "--tests", "3", "--adaptive"], ["live"], ["ingest"],
+                 ["report", "--stream", "--since", "7d"], ["query", "--where", "latency_ms > 50", "--count"],
+                 ["train", "--full"], ["predict", "100", "5", "1", "0"], ["backfill", "--rescore"],
+                 ["startup-bench"]):
+        assert parser.parse_args(argv).func.__name__ == "cmd_" + argv[0].replace("-", "_")
+    with pytest.raises(SystemExit):
+        parser.parse_args(["run", "--engine", "ns3"])
+
+def test_since():
+    from wifi_store import now_ns
+    assert wifi_cli._since(None) is None
+    assert abs(now_ns() - wifi_cli._since("2h") - 2 * 3600 * 10**9) < 10**9
+    assert abs(now_ns() - wifi_cli._since("1.5d") - 1.5 * 86400 * 10**9) < 10**9
@@ -0,0 +1,82 @@
+import asyncio, threading, time
+import pytest
+from wifi_scheduler import TestScheduler as Scheduler, Target, parse_targets, iperf_command
+
+class Recorder:
+    """A measure() that tracks how many tests run at once, overall and per target"""
+
+    def __init__(self, seconds=0.02, fail=()):
+        self.seconds = seconds
+        self.fail = fail
+        self.running = {}
+        self.peak = {}
+        self.total = self.peak_total = 0
+
+    async def __call__(self, target):
+        self.running[target.key] = self.running.get(target.key, 0) + 1
+        self.peak[target.key] = max(self.peak.get(target.key, 0), self.running[target.key])
+        self.total += 1
+        self.peak_total = max(self.peak_total, sum(self.running.values()))
+        try:
+            await asyncio.sleep(self.seconds)
+            if target.server_ip in self.fail:
+                raise RuntimeError("unreachable")
+            return {"throughput_mbps": 1.0}
+        finally:
+            self.running[target.key] -= 1
+
+def targets(spec):
+    return parse_targets(spec, interval=0)
+
+# -------- Concurrency -------- #
+def test_same_target_never_overlaps():
+    measure = Recorder()
+    # Three entries for one ip:port, two for another
+    scheduler = Scheduler(targets("10.0.0.1,10.0.0.1,10.0.0.1,10.0.0.2:5202,10.0.0.2:5202"),
+                          measure, sink=lambda t, m: None, max_workers=8, jitter=0)
+    assert scheduler.sweep(rounds=3) == 15
+    assert measure.peak == {("10.0.0.1", 5201): 1, ("10.0.0.2", 5202): 1}
+    assert measure.peak_total == 2
+
+def test_max_workers_caps_tests_in_flight():
+    measure = Recorder()
+    scheduler = Scheduler(targets(",".join(f"10.0.0.{i}" for i in range(10))), measure,
+                          sink=lambda t, m: None, max_workers=3, jitter=0)
+    assert scheduler.sweep(rounds=2) == 20
+    assert measure.peak_total == 3
+
+def test_slow_sink_applies_backpressure():
+    measure = Recorder(seconds=0.001)
+    sunk = []
+    ahead = []
+    lock = threading.Lock()
+
+    def sink(target, metrics):
+        with lock:
+            ahead.append(measure.total - len(sunk))
+            sunk.append(target)
+        time.sleep(0.01)
+    scheduler = Scheduler(targets("10.0.0.1,10.0.0.2,10.0.0.3,10.0.0.4"), measure, sink,
+                          queue_size=2, jitter=0)
+    assert scheduler.sweep(rounds=10) == 40
+    # Measured results never run further ahead of the sink than the queue plus one per target
+    assert max(ahead) <= 2 + 4 + 1
+
+def test_failures_are_counted_and_others_continue(capsys):
+    measure = Recorder(fail=("10.0.0.9",))
+    got = []
+    scheduler = Scheduler(targets("10.0.0.1,10.0.0.9"), measure, sink=lambda t, m: got.append(t.server_ip),
+                          jitter=0)
+    assert scheduler.sweep(rounds=3) == 3
+    assert scheduler.failed == 3 and got == ["10.0.0.1"] * 3
+    assert "❌ Target(10.0.0.9:5201)" in capsys.readouterr().out
+
+# -------- Targets -------- #
+def test_parse_targets_and_command():
+    a, b = parse_targets("10.0.0.1, 10.0.0.2:5300,", duration=2.4, parallel=4, udp=True, bandwidth="10M")
+    assert (a.key, b.key) == (("10.0.0.1", 5201), ("10.0.0.2", 5300))
+    assert iperf_command(b) == ["iperf3", "-c", "10.0.0.2", "-t", "2", "-J", "-p", "5300", "-P", "4", "-u",
+                            "-b", "10M"]
+    assert parse_targets("10.0.0.1", engine="native")[0].port == 5202
+    with pytest.raises(ValueError):
+        Target(engine="nope")
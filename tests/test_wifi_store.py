@@ -0,0 +1,159 @@
+import os
+import numpy as np
+import pytest
+from wifi_store import (ResultStore, SegmentLog, Sample, SampleBuffer, RESULT_DTYPE, BATCH_DTYPE, ANOMALY_FLAGS,
+                        make_record, to_records)
+
+def reopen(store):
+    store.close()
+    return ResultStore(store.path, segment_rows=store.segment_rows, compact_every=store.compact_every)
+
+# -------- Append / Read -------- #
+def test_append_read_roundtrip(store, records):
+    rec = records(100)
+    for i in range(0, 100, 7):
+        store.append_records(rec[i:i + 7])
+    assert len(store) == 100
+    assert np.array_equal(np.sort(store.read_range(), order="timestamp"), rec)
+    assert np.array_equal(store.tail(10), rec[-10:])
+
+def test_read_range_is_half_open(store, records):
+    rec = records(300)
+    store.append_records(rec)
+    t = rec["timestamp"]
+    out = store.read_range(int(t[50]), int(t[200]))
+    expected = rec[(t >= t[50]) & (t < t[200])]
+    assert np.array_equal(np.sort(out, order=["timestamp", "target"]), np.sort(expected, order=["timestamp", "target"]))
+
+def test_append_one_metrics_dict(store):
+    store.append({"timestamp": "2030-01-01 00:00:00", "throughput_mbps": 200.0, "latency_ms": 12.0,
+                  "anomalies": ["latency_ms"]}, target="10.0.0.1:5201")
+    row = store.tail(1)[0]
+    assert store.target_names() == ["10.0.0.1:5201"]
+    assert row["throughput_mbps"] == np.float32(200.0) and np.isnan(row["jitter_ms"])
+
+def test_frame_labels_unknown_targets(store, records):
+    rec = records(3)
+    rec["target"] = [0, 1, 5]
+    store.target_id("10.0.0.1:5201")
+    store.target_id("10.0.0.2:5201")
+    store.append_records(rec)
+    df = store.read_frame()
+    assert df["target"].tolist() == ["10.0.0.1:5201", "10.0.0.2:5201", "unknown:5"]
+
+# -------- Seal / Compact -------- #
+def test_seal_records_time_range(store, records):
+    rec = records(64)
+    store.append_records(rec)
+    seg, = store.manifest["segments"]
+    assert seg["rows"] == 64 and seg["sorted"]
+    assert (seg["t_min"], seg["t_max"]) == (int(rec["timestamp"][0]), int(rec["timestamp"][-1]))
+    assert not os.path.exists(store.crc_file(seg["name"]))
+    assert len(store._map(store.manifest["active"])) == 0
+
+def test_compaction_merges_and_sorts(store, records):
+    rec = records(4 * 64)
+    # Out of time order across segments: compaction has to sort them back
+    for i in [3, 1, 0, 2]:
+        store.append_records(rec[i * 64:(i + 1) * 64])
+    seg, = store.manifest["segments"]
+    assert seg["rows"] == 256 and seg["sorted"]
+    assert np.array_equal(store.read_range(), rec)
+    # The merged segments are deleted (the next active one is created on the first append)
+    assert [f for f in os.listdir(store.path) if f.endswith(".bin")] == [seg["name"]]
+
+def test_compact_on_demand(store, records):
+    rec = records(3 * 64 + 10)
+    for i in range(0, len(rec), 64):
+        store.append_records(rec[i:i + 64])
+    assert len(store.manifest["segments"]) == 3
+    store.compact()
+    assert len(store.manifest["segments"]) == 1
+    assert np.array_equal(store.read_range(), rec)
+
+def test_reopen_with_other_layout_fails(store):
+    with pytest.raises(ValueError):
+        SegmentLog(store.path, np.dtype([("timestamp", "<i8")]))
+
+# -------- Recovery -------- #
+def test_recover_torn_tail(store, records):
+    rec = records(20)
+    store.append_records(rec[:10])
+    store.append_records(rec[10:])
+    active = store._file(store.manifest["active"])
+    with open(active, "ab") as f:
+        f.write(rec[:1].tobytes()[:13])          # a crash mid-record
+    store = reopen(store)
+    store.append_records(rec[:1])                # the next writer cuts the tail off first
+    assert len(store) == 21
+    assert os.path.getsize(active) == 21 * RESULT_DTYPE.itemsize
+
+def test_recover_garbled_batch(store, records):
+    rec = records(30)
+    for i in range(0, 30, 10):
+        store.append_records(rec[i:i + 10])
+    active = store._file(store.manifest["active"])
+    with open(active, "r+b") as f:
+        f.seek(15 * RESULT_DTYPE.itemsize)
+        f.write(b"\0" * RESULT_DTYPE.itemsize)   # right length, wrong bytes
+    store = reopen(store)
+    store.append_records(rec[20:21])
+    # Everything from the garbled batch on is dropped, then the new row is appended
+    assert np.array_equal(store.read_range(), np.concatenate([rec[:10], rec[20:21]]))
+    assert os.path.getsize(store.crc_file(store.manifest["active"])) == 2 * BATCH_DTYPE.itemsize
+
+def test_recover_torn_crc_entry(store, records):
+    rec = records(10)
+    store.append_records(rec[:5])
+    store.append_records(rec[5:])
+    crc = store.crc_file(store.manifest["active"])
+    with open(crc, "r+b") as f:
+        f.truncate(os.path.getsize(crc) - 3)     # the data write landed, its .crc entry didn't
+    store = reopen(store)
+    store.append_records(rec[:1])
+    assert np.array_equal(store.read_range(), np.concatenate([rec[:5], rec[:1]]))
+
+def test_write_field_predictions(store, records):
+    rec = records(100)
+    store.append_records(rec)
+    seg = store.manifest["segments"][0]["name"]
+    assert store.write_field(seg, "predicted_degraded", np.arange(64), np.ones(64, dtype=np.int8))
+    assert (store.read_range()["predicted_degraded"][:64] == 1).all()
+    assert not store.write_field("seg-999999.bin", "predicted_degraded", np.arange(1), np.ones(1, dtype=np.int8))
+
+# -------- Samples -------- #
+def test_sample_reads_like_the_old_dicts():
+    s = Sample("2030-01-01 00:00:00", throughput_mbps=250, latency_ms=None, anomalies=["jitter_ms"])
+    assert s["throughput_mbps"] == 250.0 and s.get("latency_ms") is None and s.get("latency_ms", 0) == 0
+    assert s["anomalies"] == ["jitter_ms"] and s["predicted_degraded"] is None
+    s["predicted_degraded"] = 1
+    s["anomalies"] = ["latency_ms", "lost_percent"]
+    assert s["predicted_degraded"] == 1 and s.flags == ANOMALY_FLAGS["latency_ms"] | ANOMALY_FLAGS["lost_percent"]
+    with pytest.raises(KeyError):
+        s["nope"]
+    with pytest.raises(KeyError):
+        s["nope"] = 1
+    with pytest.raises(AttributeError):
+        s.extra = 1                       # slots, no per-sample dict
+
+def test_samples_and_dicts_make_the_same_rows():
+    metrics = {"timestamp": "2030-01-01 00:00:05", "throughput_mbps": 90.5, "retransmits": 3, "lost_percent": 0.5,
+               "jitter_ms": None, "latency_ms": 12.0, "predicted_degraded": 0, "anomalies": ["latency_ms"]}
+    sample = Sample.from_dict(metrics)
+    a, b = to_records([metrics, sample], target_id=2)
+    assert a.tobytes() == b.tobytes() and a["target"] == 2 and np.isnan(a["jitter_ms"])
+    assert make_record(metrics, target_id=2).tobytes() == a.tobytes()
+
+def test_sample_buffer_grows_in_place():
+    buf = SampleBuffer(capacity=2)
+    for i in range(5):
+        buf.append({"timestamp": i, "throughput_mbps": float(i), "latency_ms": None}, target_id=1)
+    buf.extend(to_records([Sample(5, throughput_mbps=5.0)]))
+    view = buf.view()
+    assert len(buf) == 6 and len(buf.data) >= 6 and np.shares_memory(view, buf.data)
+    assert view["throughput_mbps"].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    X = buf.features(["throughput_mbps", "latency_ms"])
+    assert X.shape == (6, 2) and (X[:, 1] == 0.0).all()
+    assert np.isnan(buf.features(["latency_ms"], missing=None)).all()
+    buf.clear()
+    assert len(buf) == 0 and len(buf.view()) == 0
@@ -1,24 +1,17 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-import joblib
+from online_training import update
+from predictor_service import latest_model_file
 
-# Load data
-df = pd.read_csv("wifi_results.csv")
+def main(full=False):
+    # Trains on the rows stored since the last run (or everything with full=True),
+    # labelled against a rolling per-target baseline; see online_training.py
+    path = update(full=full)
+    if path is None:
+        return
 
-# Define degraded: latency>50ms OR lost_percent>5 OR throughput < 50% mean
-df["degraded"] = ((df["latency_ms"] > 50) | 
-                  (df["lost_percent"] > 5) | 
-                  (df["throughput_mbps"] < df["throughput_mbps"].mean() * 0.5)).astype(int)
+    # Callers load the published version (latest_model_file); the tracked
+    # wifi_rf_model.pkl is only the fallback when models/ has none yet
+    print(f"✅ ML model trained; serving {latest_model_file()}")
 
-X = df[["throughput_mbps","latency_ms","jitter_ms","lost_percent"]]
-y = df["degraded"]
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
-clf.fit(X_train, y_train)
-
-# Save model
-joblib.dump(clf, "wifi_rf_model.pkl")
-print("✅ ML model trained and saved as wifi_rf_model.pkl")
+if __name__ == "__main__":
+    import sys
+    main(full="--full" in sys.argv)
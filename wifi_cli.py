@@ -0,0 +1,207 @@
+"""
+Single entry point for the framework.
+
+    python wifi_cli.py run        [--targets 10.0.0.2:5201,...] [--tests 8] [--duration 5] [--intervals]
+                                  [--engine iperf3|native] [--adaptive [--airtime-budget 0.5]]
+    python wifi_cli.py live
+    python wifi_cli.py ingest        [--store wifi_store]
+    python wifi_cli.py report        [--stream [--sections auto|day|target|none] [--since 30d]]
+    python wifi_cli.py query         [--since 1d] [--target T] [--where "latency_ms > 50"] [--anomalies] [--csv FILE]
+    python wifi_cli.py train         [--full]
+    python wifi_cli.py predict THROUGHPUT LATENCY JITTER LOSS
+    python wifi_cli.py startup-bench [--budget-ms 300]
+
+Only the standard library is imported up front. Each subcommand imports
+the modules it needs when it runs, so `run` never pays for pandas,
+matplotlib, reportlab or sklearn at startup.
+"""
+import argparse, os, re, subprocess, sys, time
+
+RUN_STARTUP_BUDGET_MS = 300   # import cost of a plain `run`, measured by startup-bench
+HEAVY_MODULES = ["pandas", "matplotlib", "reportlab", "sklearn", "joblib"]
+
+# -------- Subcommands -------- #
+def cmd_run(args):
+    import wifi_framework
+    if args.dry_run:
+        return 0
+    wifi_framework.main(args.targets, num_tests=args.tests, duration=args.duration,
+                        intervals=args.intervals, engine=args.engine, adaptive=args.adaptive,
+                        airtime_budget=args.airtime_budget)
+    return 0
+
+def cmd_live(args):
+    import wifi_full_framework
+    wifi_full_framework.main()
+    return 0
+
+def cmd_ingest(args):
+    from ingest_service import IngestServer
+    from wifi_store import open_store
+    IngestServer(open_store(args.store, legacy_csv=None)).serve_forever()
+    return 0
+
+def cmd_report(args):
+    import generate_report
+    if args.stream:
+        generate_report.stream_report(start=_since(args.since), sections=args.sections)
+    else:
+        generate_report.main()
+    return 0
+
+def _since(value):
+    """"30m" / "12h" / "7d" -> start timestamp in ns (None when not given)"""
+    if not value:
+        return None
+    from wifi_store import now_ns
+    units = {"m": 60, "h": 3600, "d": 86400}
+    return now_ns() - int(float(value[:-1]) * units[value[-1]] * 1e9)
+
+def cmd_query(args):
+    from result_query import ResultQuery
+    start = _since(args.since) if args.since else args.start
+    q = ResultQuery()
+    filters = dict(start=start, end=args.end, target=args.target, where=args.where,
+                   anomalies=True if args.anomalies else None, predicted=True if args.predicted else None)
+    if args.count:
+        print(q.count(**filters))
+        return 0
+    df = q.frame(**filters)
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"✅ {len(df)} rows written to {args.csv}")
+    else:
+        print(df.tail(args.limit).to_string(index=False))
+        print(f"({len(df)} rows)")
+    return 0
+
+def cmd_train(args):
+    import train_wifi_model
+    train_wifi_model.main(full=args.full)
+    return 0
+
+def cmd_predict(args):
+    from predictor_service import get_predictor
+    from features import FeatureBuilder
+    from wifi_store import make_record
+    predictor = get_predictor(args.model)
+    # A lone sample has no history: its rolling features are those of a first test
+    record = make_record({"throughput_mbps": args.throughput, "latency_ms": args.latency,
+                          "jitter_ms": args.jitter, "lost_percent": args.loss})
+    pred = int(predictor.predict(FeatureBuilder().transform(record)[0]))
+    print("⚠️ degraded" if pred else "✅ ok")
+    return 0
+
+def cmd_backfill(args):
+    import backfill
+    backfill.backfill(model_file=args.model, rescore=args.rescore, workers=args.workers)
+    return 0
+
+def cmd_startup_bench(args):
+    """Time `run --dry-run` under -X importtime and check it against the budget"""
+    cmd = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "run", "--dry-run"]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr)
+        return 1
+
+    # "import time: self [us] | cumulative | imported package"
+    top_level = []
+    imported = set()
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if not m:
+            continue
+        imported.add(m.group(4).split(".")[0])
+        if len(m.group(3)) == 1:
+            top_level.append((int(m.group(2)), m.group(4)))
+    import_ms = sum(us for us, _ in top_level) / 1000
+    heavy = [m for m in HEAVY_MODULES if m in imported]
+
+    print(f"run startup: {import_ms:.0f} ms in imports, {wall_ms:.0f} ms wall (budget {args.budget_ms} ms)")
+    for us, name in sorted(top_level, reverse=True)[:8]:
+        print(f"  {us / 1000:>8.1f} ms  {name}")
+    if heavy:
+        print(f"❌ heavy modules imported at startup: {', '.join(heavy)}")
+    ok = import_ms <= args.budget_ms and not heavy
+    print("✅ within budget" if ok else "❌ over budget")
+    return 0 if ok else 1
+
+# -------- Argument Parsing -------- #
+def build_parser():
+    parser = argparse.ArgumentParser(prog="wifi_cli.py", description="Wi-Fi performance testing framework")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run test rounds against one or more iperf3 targets")
+    p.add_argument("--targets", help="comma separated ip[:port] list (default: $WIFI_TARGETS or 127.0.0.1)")
+    p.add_argument("--tests", type=int, default=8, help="test rounds per target")
+    p.add_argument("--duration", type=float, default=5, help="seconds per test (whole seconds for iperf3)")
+    p.add_argument("--engine", choices=["iperf3", "native"], default="iperf3",
+                   help="fork iperf3 per test, or the built-in traffic engine (traffic_engine.py server, port 5202)")
+    p.add_argument("--adaptive", action="store_true",
+                   help="back off on stable links, test drifting ones more often (adaptive_scheduler.py)")
+    p.add_argument("--airtime-budget", type=float,
+                   help="with --adaptive: max test-seconds per second summed over all targets")
+    p.add_argument("--intervals", action="store_true", help="also record every iperf3 interval and per-stream sample")
+    p.add_argument("--dry-run", action="store_true", help="load everything a run needs, then exit")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("live", help="continuous tests with ML prediction and live dashboard")
+    p.set_defaults(func=cmd_live)
+
+    p = sub.add_parser("ingest", help="single-writer ingest service for concurrent producers")
+    p.add_argument("--store", default="wifi_store")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("report", help="generate a PDF report from stored results")
+    p.add_argument("--stream", action="store_true",
+                   help="read raw rows in chunks with bounded memory, one page per day or target")
+    p.add_argument("--sections", choices=["auto", "day", "target", "none"], default="auto",
+                   help="with --stream (auto: per day above 2 days, else per target)")
+    p.add_argument("--since", help="with --stream: only the last N m/h/d, e.g. 30d")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("query", help="filter stored results (indexed)")
+    p.add_argument("--since", help="relative start, e.g. 30m, 6h, 7d")
+    p.add_argument("--start", help="absolute start time")
+    p.add_argument("--end", help="absolute end time")
+    p.add_argument("--target", action="append", help="target ip:port (repeatable)")
+    p.add_argument("--where", action="append", help='metric predicate, e.g. "latency_ms > 50" (repeatable)')
+    p.add_argument("--anomalies", action="store_true", help="only rows flagged as anomalies")
+    p.add_argument("--predicted", action="store_true", help="only rows predicted degraded")
+    p.add_argument("--count", action="store_true", help="print the number of matching rows only")
+    p.add_argument("--limit", type=int, default=20, help="rows to print")
+    p.add_argument("--csv", help="write all matching rows to this CSV file")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser("train", help="train the degradation model")
+    p.add_argument("--full", action="store_true", help="retrain on the whole history instead of new rows only")
+    p.set_defaults(func=cmd_train)
+
+    p = sub.add_parser("predict", help="predict degradation for one sample")
+    p.add_argument("throughput", type=float, help="Mbps")
+    p.add_argument("latency", type=float, help="ms")
+    p.add_argument("jitter", type=float, help="ms")
+    p.add_argument("loss", type=float, help="percent")
+    p.add_argument("--model", default="wifi_rf_model.pkl")
+    p.set_defaults(func=cmd_predict)
+
+    p = sub.add_parser("backfill", help="score stored results and write the predictions back")
+    p.add_argument("--rescore", action="store_true", help="overwrite existing predictions too (after retraining)")
+    p.add_argument("--workers", type=int, help="scoring processes (default: one per CPU)")
+    p.add_argument("--model", help="model file (default: the newest published version)")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser("startup-bench", help="measure import cost of a plain run")
+    p.add_argument("--budget-ms", type=float, default=RUN_STARTUP_BUDGET_MS)
+    p.set_defaults(func=cmd_startup_bench)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,18 @@
-import subprocess, json, os, time
-import pandas as pd
-from datetime import datetime
-from ping3 import ping
+import os, asyncio
+from functools import partial
 import numpy as np
+from wifi_scheduler import TestScheduler, parse_targets, run_iperf_test_async
+from wifi_store import default_store, Sample, now_ns
+from ingest_service import default_writer
+from iperf_stream import run_iperf_streaming
+from anomaly_detector import AnomalyDetector, flag_anomalies
+from latency_prober import LatencyProber, probe_hosts
+from instrumentation import span, timed, enable_from_env, REGISTRY
 
 # -------- Run iperf3 Test -------- #
-def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None):
-    cmd = ["iperf3", "-c", server_ip, "-t", str(duration), "-J", "-p", "5201"]
+@timed("iperf3")
+def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None, port=5201, on_interval=None):
+    cmd = ["iperf3", "-c", server_ip, "-t", str(duration), "-J", "-p", str(port)]
     if parallel > 1:
         cmd += ["-P", str(parallel)]
     if udp:
@@ -14,67 +20,106 @@ def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, ban
         if bandwidth:
             cmd += ["-b", str(bandwidth)]
 
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr)
-    return json.loads(proc.stdout)
+    # Parsed incrementally: only start/end are kept, intervals go to on_interval
+    return run_iperf_streaming(cmd, on_interval=on_interval)
 
 # -------- Extract Metrics -------- #
-def extract_metrics(iperf_json, server_ip="127.0.0.1"):
+@timed("extract_metrics")
+def extract_metrics(iperf_json, server_ip="127.0.0.1", latency=None):
     end = iperf_json.get("end", {})
     summary = end.get("sum_received") or end.get("sum_sent") or {}
 
-    # Ping latency test
-    latency_ms = ping(server_ip, unit="ms")
-    
-    return {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "throughput_mbps": summary.get("bits_per_second", 0) / 1e6,
-        "retransmits": summary.get("retransmits"),
-        "lost_percent": summary.get("lost_percent"),
-        "jitter_ms": summary.get("jitter_ms"),
-        "latency_ms": latency_ms,
-    }
+    # Latency stats come from a probe train run during the test; probe now if there was none
+    if latency is None:
+        with span("latency_probe"):
+            latency = probe_hosts([server_ip])[server_ip]
+
+    return Sample(now_ns(), throughput_mbps=summary.get("bits_per_second", 0) / 1e6,
+                  retransmits=summary.get("retransmits"), lost_percent=summary.get("lost_percent"),
+                  jitter_ms=summary.get("jitter_ms"), latency_ms=latency.get("avg"))
+
+# -------- Concurrent Measurement -------- #
+async def measure_target(target, capture=None, prober=None):
+    on_interval = capture.recorder(f"{target.server_ip}:{target.port}") if capture else None
+    with span("measure"):
+        test = asyncio.ensure_future(run_iperf_test_async(target, on_interval=on_interval))
+        # Probe latency for as long as the throughput test runs (latency under load)
+        own = prober is None
+        prober = prober or LatencyProber()
+        try:
+            latency = await prober.probe(target.server_ip, until=test.done)
+        except OSError as e:
+            print(f"❌ latency probe for {target}: {e}")
+            latency = {}
+        finally:
+            if own:
+                prober.close()
+        result = await test
+    return extract_metrics(result, target.server_ip, latency)
 
 # -------- Anomaly Detection -------- #
 def detect_anomalies(df):
+    """Timestamps of rows where any metric is > 2 std from its target's history"""
     anomalies = []
-    for metric in ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]:
-        if metric in df.columns:
-            values = df[metric].dropna()
-            if len(values) > 1:
-                mean = values.mean()
-                std = values.std()
-                # Mark anomalies if > 2 standard deviations away
-                anomalies += list(df.loc[(df[metric] - mean).abs() > 2*std, "timestamp"])
-    return anomalies
-
-# -------- Save to CSV -------- #
-def save_results(metrics, file_name="wifi_results.csv"):
-    df = pd.DataFrame([metrics])
-    if os.path.exists(file_name):
-        df.to_csv(file_name, mode="a", header=False, index=False)
-    else:
-        df.to_csv(file_name, index=False)
+    for _, group in df.groupby("target", sort=False):
+        masks = flag_anomalies(group)
+        if masks:
+            hit = np.logical_or.reduce(list(masks.values()))
+            anomalies += list(group.loc[hit, "timestamp"])
+    return sorted(anomalies)
+
+# -------- Save to Result Store -------- #
+@timed("save")
+def save_results(metrics, target=None):
+    default_writer().append(metrics, target=target)
 
 # -------- Automation Loop -------- #
-if __name__ == "__main__":
-    server_ip = "127.0.0.1"
-    num_tests = 8       # more runs to catch anomalies
-    duration = 5        # each test length (seconds)
-
-    print(f"🚀 Running {num_tests} Wi-Fi performance tests...\n")
-    
-    for i in range(num_tests):
-        print(f"▶ Test {i+1}/{num_tests}...")
-        j = run_iperf_test(server_ip, duration=duration, parallel=1, udp=False)
-        metrics = extract_metrics(j, server_ip)
-        print(metrics)
-        save_results(metrics)
-        time.sleep(2)   # wait before next test
-    
-    # Load results for anomaly detection
-    df = pd.read_csv("wifi_results.csv")
+def main(targets_spec=None, num_tests=8, duration=5, intervals=False, engine="iperf3", adaptive=False,
+         airtime_budget=None):
+    # Comma separated ip[:port] list, e.g. "10.0.0.2:5201,10.0.0.3:5201,10.0.0.3:5202"
+    # (port defaults to 5201 for iperf3, 5202 for the native engine)
+    targets_spec = targets_spec or os.environ.get("WIFI_TARGETS", "127.0.0.1")
+    # WIFI_METRICS_PORT / WIFI_METRICS_FILE / WIFI_PROFILE (see instrumentation.py)
+    profiler = enable_from_env()
+
+    targets = parse_targets(targets_spec, duration=duration, parallel=1, udp=False, interval=2, engine=engine)
+    print(f"🚀 Running {num_tests} Wi-Fi performance tests against {len(targets)} target(s)...\n")
+
+    detectors = {t.key: AnomalyDetector() for t in targets}
+    # adaptive: stable links are tested less often, drifting ones more (adaptive_scheduler.py)
+    policy = None
+    if adaptive:
+        from adaptive_scheduler import AdaptivePolicy
+        policy = AdaptivePolicy(duration, budget=airtime_budget)
+
+    def sink(target, metrics):
+        # Flag at ingest time; the flags are stored with the row
+        with span("detect"):
+            metrics["anomalies"] = detectors[target.key].update(metrics)
+        if policy is not None:
+            policy.observe(target.key, metrics, metrics["anomalies"])
+        print(f"▶ {target}: {metrics}")
+        save_results(metrics, target=f"{target.server_ip}:{target.port}")
+
+    # intervals=True also records every iperf3 interval/stream sample
+    capture = None
+    if intervals:
+        from interval_capture import default_capture
+        capture = default_capture()
+
+    # One ICMP socket serves every target's probe trains
+    prober = LatencyProber()
+    scheduler = TestScheduler(targets, measure=partial(measure_target, capture=capture, prober=prober),
+                              sink=sink, max_workers=16, policy=policy)
+    scheduler.sweep(rounds=num_tests)
+    prober.close()
+    if capture:
+        capture.flush()
+        print(f"📈 {capture.rows_written} interval samples saved to {capture.log.path}/")
+
+    # Load results for anomaly detection (once the ingest service has committed ours)
+    default_writer().flush()
+    df = default_store().read_frame()
     anomalies = detect_anomalies(df)
 
     if anomalies:
@@ -83,3 +128,11 @@ if __name__ == "__main__":
             print(" -", a)
     else:
         print("\n✅ No anomalies detected")
+
+    print("\n⏱️ Time per stage:")
+    REGISTRY.print_summary()
+    if profiler:
+        profiler.stop()
+
+if __name__ == "__main__":
+    main()
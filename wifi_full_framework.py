@@ -1,36 +1,36 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import subprocess
-import time
 from datetime import datetime
-import io
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-import joblib
+from wifi_store import default_store, Sample, now_ns, ANOMALY_FLAGS
+from ingest_service import default_writer
+from iperf_stream import run_iperf_streaming
+from anomaly_detector import AnomalyDetector
+from result_follower import RingBuffer
+from dashboard_engine import LiveDashboard
+import generate_report
+from predictor_service import get_predictor
+from pipeline import test_pipeline
+from instrumentation import span, timed, enable_from_env, REGISTRY
 
 # ----------------- Configuration ----------------- #
-TEST_INTERVAL = 5  # seconds
-CSV_FILE = "wifi_results.csv"
+TEST_INTERVAL = 5  # seconds, start to start (until the adaptive policy has seen the link)
+TEST_DURATION = 10  # with ADAPTIVE: seconds per iperf3 test, halved during incidents
+ADAPTIVE = False    # test stable links less often and drifting ones more (adaptive_scheduler.py)
+AIRTIME_BUDGET = None  # max test-seconds per second across targets; None = no cap
+TARGET = "127.0.0.1:5201"
 PDF_FOLDER = "."
 ML_MODEL_FILE = "wifi_rf_model.pkl"
 
-# Load trained ML model
-clf = joblib.load(ML_MODEL_FILE)
-
-# Initialize CSV
-try:
-    df = pd.read_csv(CSV_FILE)
-except FileNotFoundError:
-    df = pd.DataFrame(columns=["timestamp","throughput_mbps","latency_ms","jitter_ms","lost_percent","predicted_degraded"])
-    df.to_csv(CSV_FILE,index=False)
+# The ML model is loaded on first prediction (see get_predictor): samples are
+# scored through a micro-batching service on a flat NumPy copy of the forest.
+# Heavy libraries (matplotlib, reportlab, sklearn) are imported only when used.
 
 # ----------------- Utility Functions ----------------- #
-def run_iperf_test():
-    """Run iperf3 test and return metrics as dictionary"""
-    result = subprocess.run(["iperf3", "-c", "127.0.0.1", "-J"], capture_output=True, text=True)
-    import json
-    data = json.loads(result.stdout)
+@timed("iperf3")
+def run_iperf_test(duration=None):
+    """Run iperf3 test and return metrics as a Sample"""
+    cmd = ["iperf3", "-c", "127.0.0.1", "-J"]
+    if duration:
+        cmd += ["-t", str(max(1, round(duration)))]
+    data = run_iperf_streaming(cmd)
     try:
         throughput = data['end']['sum_received']['bits_per_second'] / 1e6
         latency = data.get('end', {}).get('streams', [{}])[0].get('sender', {}).get('mean_rtt', 0)
@@ -38,139 +38,87 @@ def run_iperf_test():
         lost_percent = data.get('end', {}).get('streams', [{}])[0].get('lost_percent', 0)
     except:
         throughput = latency = jitter = lost_percent = 0
-    return {
-        "timestamp": datetime.now(),
-        "throughput_mbps": throughput,
-        "latency_ms": latency,
-        "jitter_ms": jitter,
-        "lost_percent": lost_percent
-    }
-
-def detect_anomalies(series):
-    """Detect anomalies using 2-sigma rule"""
-    if len(series) < 2:
-        return []
-    mean = series.mean()
-    std = series.std()
-    return series[(series - mean).abs() > 2 * std]
+    return Sample(now_ns(), throughput_mbps=throughput, latency_ms=latency, jitter_ms=jitter,
+                  lost_percent=lost_percent)
 
+@timed("save")
 def save_metrics(metrics):
-    global df
-    # Save timestamp as ISO format
-    metrics["timestamp"] = metrics["timestamp"].isoformat()
-    df = pd.concat([df, pd.DataFrame([metrics])], ignore_index=True)
-    df.to_csv(CSV_FILE,index=False)
+    # O(1) append; nothing already written is touched again
+    default_writer().append(metrics, target=TARGET)
+
+def load_results():
+    return default_store().read_frame()
 
 # ----------------- PDF Report ----------------- #
+@timed("pdf_report")
 def generate_pdf_report():
-    metrics_list = ["throughput_mbps","latency_ms","jitter_ms","lost_percent"]
-    pdf_name = f"{PDF_FOLDER}/wifi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    c = canvas.Canvas(pdf_name,pagesize=A4)
-    width, height = A4
-
-    # Title
-    c.setFont("Helvetica-Bold",18)
-    c.drawCentredString(width/2,height-50,"Wi-Fi Performance Report")
-
-    # Summary table
-    c.setFont("Helvetica",12)
-    y = height-100
-    c.drawString(50,y,"Summary of Tests:")
-    y -= 20
-
-    for metric in metrics_list:
-        if metric in df.columns:
-            mean_val = df[metric].mean()
-            max_val = df[metric].max()
-            min_val = df[metric].min()
-            anomaly_count = len(detect_anomalies(df[metric]))
-            predicted_count = df["predicted_degraded"].sum()
-            line = f"{metric}: mean={mean_val:.2f}, min={min_val:.2f}, max={max_val:.2f}, anomalies={anomaly_count}, predicted_degraded={predicted_count}"
-            c.drawString(60,y,line)
-            y -= 15
-
-    # Plots
-    plot_images = []
-    for metric in metrics_list:
-        if metric in df.columns:
-            plt.figure(figsize=(8,4))
-            timestamps = pd.to_datetime(df["timestamp"], errors='coerce', infer_datetime_format=True)
-            plt.plot(timestamps, df[metric], marker="o", label=metric)
-            anomalies = detect_anomalies(df[metric])
-            if len(anomalies) > 0:
-                anomaly_points = df.loc[df[metric].isin(anomalies)]
-                plt.scatter(pd.to_datetime(anomaly_points["timestamp"], errors='coerce', infer_datetime_format=True),
-                            anomaly_points[metric],
-                            color="red", s=80, label="Anomaly")
-            pred_points = df[df["predicted_degraded"]==1]
-            if len(pred_points)>0:
-                plt.scatter(pd.to_datetime(pred_points["timestamp"], errors='coerce', infer_datetime_format=True),
-                            pred_points[metric],
-                            color="orange", s=80, label="Predicted Degradation")
-            plt.title(f"Wi-Fi Performance: {metric}")
-            plt.xlabel("Time")
-            plt.ylabel(metric)
-            plt.xticks(rotation=45)
-            plt.legend()
-            plt.tight_layout()
-            buf = io.BytesIO()
-            plt.savefig(buf,format="png")
-            plt.close()
-            buf.seek(0)
-            plot_images.append(buf)
-
-    for img in plot_images:
-        c.showPage()
-        c.drawImage(ImageReader(img),50,150,width-100,height-300)
-
-    c.save()
-    print(f"✅ PDF report generated: {pdf_name}")
+    generate_report.main(default_store(), f"{PDF_FOLDER}/wifi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                         predicted=True)
 
 # ----------------- Live Dashboard ----------------- #
-plt.ion()
-fig, axs = plt.subplots(2,2,figsize=(12,8))
-axs = axs.flatten()
-
-def update_dashboard():
-    for i, metric in enumerate(["throughput_mbps","latency_ms","jitter_ms","lost_percent"]):
-        axs[i].clear()
-        axs[i].set_title(f"Real-Time Wi-Fi Performance: {metric}")
-        axs[i].set_xlabel("Time")
-        axs[i].set_ylabel(metric)
-        if metric in df.columns:
-            timestamps = pd.to_datetime(df["timestamp"], errors='coerce', infer_datetime_format=True)
-            axs[i].plot(timestamps, df[metric], marker="o", label=metric)
-
-            anomalies = detect_anomalies(df[metric])
-            if len(anomalies) > 0:
-                anomaly_points = df.loc[df[metric].isin(anomalies)]
-                axs[i].scatter(pd.to_datetime(anomaly_points["timestamp"], errors='coerce', infer_datetime_format=True),
-                               anomaly_points[metric],
-                               color="red", s=80, label="Anomaly", zorder=5)
-
-            pred_points = df[df["predicted_degraded"]==1]
-            if len(pred_points)>0:
-                axs[i].scatter(pd.to_datetime(pred_points["timestamp"], errors='coerce', infer_datetime_format=True),
-                               pred_points[metric],
-                               color="orange", s=80, label="Predicted Degradation", zorder=4)
-            axs[i].legend()
-    plt.pause(0.01)
+dashboard = None
+history = None
+
+def init_dashboard():
+    global dashboard, history
+    import matplotlib.pyplot as plt
+    plt.ion()
+    dashboard = LiveDashboard(["throughput_mbps","latency_ms","jitter_ms","lost_percent"],
+                              nrows=2, ncols=2, figsize=(12,8), predicted=True)
+    store = default_store()
+    history = RingBuffer(100000, store.dtype)
+    history.extend(store.tail(100000))
+
+def update_dashboard(ui_queue, wait=0.2):
+    """Draw whatever the pipeline produced since the last frame (one merged batch)"""
+    if dashboard is None:
+        init_dashboard()
+    batch = ui_queue.get_batch(timeout=wait)
+    if batch:
+        with span("dashboard"):
+            history.extend(batch[0])
+            dashboard.update_records(history.view(), ANOMALY_FLAGS)
+    dashboard.pump(0.01)
+    return batch is not None
 
 # ----------------- Main Test Loop ----------------- #
 def run_tests():
-    while True:
-        metrics = run_iperf_test()
-        # Predict degradation
-        features = [[metrics["throughput_mbps"], metrics["latency_ms"], metrics["jitter_ms"], metrics["lost_percent"]]]
-        metrics["predicted_degraded"] = int(clf.predict(features)[0])
-
-        save_metrics(metrics)
-        update_dashboard()
-        time.sleep(TEST_INTERVAL)
-
-# Run in main thread
-try:
-    run_tests()
-except KeyboardInterrupt:
-    print("Stopping tests...")
-    generate_pdf_report()
+    """
+    Tests run on their own thread every TEST_INTERVAL seconds, adapted to
+    the link when ADAPTIVE; prediction, anomaly flags, storage and the
+    dashboard are pipeline stages behind it, so a slow redraw or disk never
+    delays the next test.
+    """
+    # Memory-mapped model; new versions from online_training.py are swapped in by a watcher thread
+    predictor = get_predictor(ML_MODEL_FILE, watch=True)
+    policy, measure = None, run_iperf_test
+    if ADAPTIVE:
+        from adaptive_scheduler import AdaptivePolicy
+        policy = AdaptivePolicy(TEST_DURATION, base_interval=TEST_INTERVAL, budget=AIRTIME_BUDGET)
+        measure = lambda: run_iperf_test(policy.duration(TARGET))
+    pipe, ui_queue = test_pipeline(measure, default_writer(), TARGET, TEST_INTERVAL,
+                                   predictor=predictor, detector=AnomalyDetector(), policy=policy)
+    pipe.start()
+    try:
+        # matplotlib must stay on the main thread
+        while update_dashboard(ui_queue):
+            pass
+    finally:
+        pipe.stop()
+        default_writer().flush()
+        pipe.print_stats()
+        REGISTRY.print_summary()
+
+def main():
+    # WIFI_METRICS_PORT / WIFI_METRICS_FILE / WIFI_PROFILE (see instrumentation.py)
+    profiler = enable_from_env()
+    try:
+        run_tests()
+    except KeyboardInterrupt:
+        print("Stopping tests...")
+        generate_pdf_report()
+    if profiler:
+        profiler.stop()
+
+if __name__ == "__main__":
+    main()
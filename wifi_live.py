@@ -1,14 +1,19 @@
-import subprocess, json, os, time, threading
-import pandas as pd
-from datetime import datetime
-from ping3 import ping
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-
-file_name = "wifi_results.csv"
+import threading, itertools
+from wifi_store import default_store, Sample, now_ns, ANOMALY_FLAGS
+from ingest_service import default_writer
+from iperf_stream import run_iperf_streaming
+from anomaly_detector import AnomalyDetector
+from result_follower import RingBuffer
+from dashboard_engine import LiveDashboard
+from latency_prober import probe_hosts, run_with_probes
+from pipeline import test_pipeline, StageQueue, COALESCE, concat_records
+from instrumentation import span, timed, enable_from_env, REGISTRY
+
+TEST_GAP = 2   # idle seconds between tests
 
 # -------- Run iperf3 Test -------- #
-def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None):
+@timed("iperf3")
+def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, bandwidth=None, on_interval=None):
     cmd = ["iperf3", "-c", server_ip, "-t", str(duration), "-J", "-p", "5201"]
     if parallel > 1:
         cmd += ["-P", str(parallel)]
@@ -17,101 +22,107 @@ def run_iperf_test(server_ip="127.0.0.1", duration=5, parallel=1, udp=False, ban
         if bandwidth:
             cmd += ["-b", str(bandwidth)]
 
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        print("❌ iperf3 error:", proc.stderr)
-        return None
     try:
-        return json.loads(proc.stdout)
-    except:
+        # Parsed incrementally: only start/end are kept, intervals go to on_interval
+        return run_iperf_streaming(cmd, on_interval=on_interval)
+    except RuntimeError as e:
+        print("❌ iperf3 error:", e)
+        return None
+    except ValueError as e:
+        print("❌ iperf3 output unreadable:", e)
         return None
 
 # -------- Extract Metrics -------- #
-def extract_metrics(iperf_json, server_ip="127.0.0.1"):
+@timed("extract_metrics")
+def extract_metrics(iperf_json, server_ip="127.0.0.1", latency=None):
     end = iperf_json.get("end", {})
     summary = end.get("sum_received") or end.get("sum_sent") or {}
 
-    latency_ms = ping(server_ip, unit="ms")
-
-    return {
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "throughput_mbps": summary.get("bits_per_second", 0) / 1e6,
-        "retransmits": summary.get("retransmits"),
-        "lost_percent": summary.get("lost_percent"),
-        "jitter_ms": summary.get("jitter_ms"),
-        "latency_ms": latency_ms,
-    }
-
-# -------- Save to CSV -------- #
-def save_results(metrics):
-    df = pd.DataFrame([metrics])
-    if os.path.exists(file_name):
-        df.to_csv(file_name, mode="a", header=False, index=False)
-    else:
-        df.to_csv(file_name, index=False)
-
-# -------- Anomaly Detection -------- #
-def detect_anomalies(series):
-    if len(series) < 2:
-        return []
-    mean = series.mean()
-    std = series.std()
-    return series[(series - mean).abs() > 2 * std]
+    if latency is None:
+        with span("latency_probe"):
+            latency = probe_hosts([server_ip])[server_ip]
+
+    return Sample(now_ns(), throughput_mbps=summary.get("bits_per_second", 0) / 1e6,
+                  retransmits=summary.get("retransmits"), lost_percent=summary.get("lost_percent"),
+                  jitter_ms=summary.get("jitter_ms"), latency_ms=latency.get("avg"))
+
+# -------- Save to Result Store -------- #
+@timed("save")
+def save_results(metrics, target="127.0.0.1:5201"):
+    default_writer().append(metrics, target=target)
 
 # -------- Background Test Runner -------- #
-def run_tests(server_ip="127.0.0.1", num_tests=20, duration=5):
+def run_tests(server_ip="127.0.0.1", num_tests=20, duration=5, intervals=False, ui_queue=None):
+    """
+    Tests start every duration + TEST_GAP seconds; anomaly flagging and
+    storage run as pipeline stages behind them. Enriched records are also
+    put on `ui_queue` when given.
+    """
     print(f"🚀 Running {num_tests} Wi-Fi tests...\n")
-    for i in range(num_tests):
-        print(f"▶ Test {i+1}/{num_tests}")
-        j = run_iperf_test(server_ip, duration=duration)
-        if j:
-            metrics = extract_metrics(j, server_ip)
-            print(metrics)
-            save_results(metrics)
-        time.sleep(2)
+    target = f"{server_ip}:5201"
+    capture = None
+    if intervals:
+        from interval_capture import default_capture
+        capture = default_capture()
+    counter = itertools.count(1)
+
+    def measure():
+        print(f"▶ Test {next(counter)}/{num_tests}")
+        on_interval = capture.recorder(target) if capture else None
+        # Latency is probed while iperf3 loads the link
+        j, latency = run_with_probes(server_ip, run_iperf_test, server_ip, duration=duration,
+                                     on_interval=on_interval)
+        if not j:
+            return None
+        metrics = extract_metrics(j, server_ip, latency)
+        print(metrics)
+        return metrics
+
+    pipe, _ = test_pipeline(measure, default_writer(), target, duration + TEST_GAP,
+                            detector=AnomalyDetector(), count=num_tests, ui=ui_queue)
+    pipe.start().join()
+    if capture:
+        capture.flush()
     print("\n✅ All tests finished!")
+    print("⏱️ Time per stage:")
+    REGISTRY.print_summary()
 
 # -------- Real-Time Plotting -------- #
 metrics = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
-fig, axs = plt.subplots(len(metrics), 1, figsize=(10, 12))
-plt.subplots_adjust(hspace=0.5)
 
-def load_data():
-    try:
-        df = pd.read_csv(file_name)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        return df
-    except:
-        return pd.DataFrame()
-
-def update(frame):
-    df = load_data()
-    if df.empty:
+# Records come straight from the pipeline (already flagged); the store only backfills history
+dashboard = None
+history = None
+ui_queue = StageQueue(1, COALESCE, concat_records)
+
+def update(force=False):
+    global history
+    if history is None:
+        store = default_store()
+        history = RingBuffer(100000, store.dtype)
+        history.extend(store.tail(100000))
+    batch = ui_queue.get_batch(timeout=0)
+    if batch:
+        history.extend(batch[0])
+    elif not force:
         return
-
-    for i, metric in enumerate(metrics):
-        axs[i].clear()
-        axs[i].set_title(f"Real-Time Wi-Fi Performance: {metric}")
-        axs[i].set_xlabel("Time")
-        axs[i].set_ylabel(metric)
-
-        if metric in df.columns:
-            axs[i].plot(df["timestamp"], df[metric], marker="o", label=metric)
-
-            anomalies = detect_anomalies(df[metric].dropna())
-            if not anomalies.empty:
-                anomaly_points = df.loc[df[metric].isin(anomalies)]
-                axs[i].scatter(anomaly_points["timestamp"], anomaly_points[metric],
-                               color="red", s=80, label="Anomaly", zorder=5)
-
-            axs[i].legend()
+    if len(history) > 0:
+        with span("dashboard"):
+            dashboard.update_records(history.view(), ANOMALY_FLAGS)
 
 # -------- Main -------- #
-if __name__ == "__main__":
+def main(server_ip="127.0.0.1", num_tests=20, duration=5, intervals=False):
+    global dashboard
+    # WIFI_METRICS_PORT / WIFI_METRICS_FILE / WIFI_PROFILE (see instrumentation.py)
+    enable_from_env()
     # Start test runner in background thread
-    t = threading.Thread(target=run_tests, args=("127.0.0.1", 20, 5))
+    t = threading.Thread(target=run_tests, args=(server_ip, num_tests, duration, intervals, ui_queue))
     t.start()
 
     # Start real-time dashboard
-    ani = FuncAnimation(fig, update, interval=2000)
-    plt.show()
+    dashboard = LiveDashboard(metrics, figsize=(10, 12))
+    update(force=True)
+    dashboard.run(update, interval=2000)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,27 @@
 import pandas as pd
+from result_query import ResultQuery
+from online_training import label_frame
+from features import FEATURE_NAMES, frame_features
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
 
-# Load data
-df = pd.read_csv("wifi_results.csv")
-df["timestamp"] = pd.to_datetime(df["timestamp"])
+# Load data (only the columns training needs)
+df = ResultQuery().frame(columns=["timestamp", "target", "throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"])
 
 # Define target: degraded = 1 if metrics exceed thresholds
-df["degraded"] = ((df["latency_ms"] > 50) | 
-                  (df["lost_percent"] > 5) | 
-                  (df["throughput_mbps"] < df["throughput_mbps"].mean() * 0.5)).astype(int)
+# (throughput is compared with a rolling per-target baseline, not the all-time mean)
+df["degraded"] = label_frame(df)
 
-# Features
-X = df[["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]]
+# Features: raw metrics plus per-target rolling context (same as training and live scoring)
+X = pd.DataFrame(frame_features(df), columns=FEATURE_NAMES)
 y = df["degraded"]
 
 # Train-test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
 # Train model
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
+clf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
 clf.fit(X_train, y_train)
 
 # Evaluate
@@ -0,0 +1,174 @@
+import asyncio, random, time
+from iperf_stream import run_iperf_streaming_async
+
+# -------- Targets -------- #
+IPERF_PORT = 5201
+ENGINES = ("iperf3", "native")
+POLICY_POLL = 0.25    # seconds; how often a waiting target re-reads its adaptive interval
+
+class Target:
+    """
+    One server/port pair and the test settings used against it. `engine`
+    is "iperf3" (fork an iperf3 client) or "native" (traffic_engine.py,
+    in-process, against `traffic_engine.py server`).
+    """
+
+    def __init__(self, server_ip="127.0.0.1", port=IPERF_PORT, duration=5, parallel=1,
+                 udp=False, bandwidth=None, interval=2, engine="iperf3"):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}")
+        self.server_ip = server_ip
+        self.port = int(port)
+        self.duration = duration
+        self.parallel = parallel
+        self.udp = udp
+        self.bandwidth = bandwidth
+        self.interval = interval
+        self.engine = engine
+
+    @property
+    def key(self):
+        # An iperf3 server only serves one client at a time, so the lock key is ip:port
+        # (the native server takes any number, but tests of one target still shouldn't overlap)
+        return (self.server_ip, self.port)
+
+    def __repr__(self):
+        return f"Target({self.server_ip}:{self.port})"
+
+def parse_targets(spec, **settings):
+    """Parse "host[:port],host[:port],..." into Target objects (default port per engine)"""
+    default_port = IPERF_PORT
+    if settings.get("engine") == "native":
+        from traffic_engine import ENGINE_PORT as default_port
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.partition(":")
+        targets.append(Target(host, int(port or default_port), **settings))
+    return targets
+
+def iperf_command(target):
+    # iperf3 counts test time in whole seconds
+    duration = max(1, round(target.duration))
+    cmd = ["iperf3", "-c", target.server_ip, "-t", str(duration), "-J", "-p", str(target.port)]
+    if target.parallel > 1:
+        cmd += ["-P", str(target.parallel)]
+    if target.udp:
+        cmd += ["-u"]
+        if target.bandwidth:
+            cmd += ["-b", str(target.bandwidth)]
+    return cmd
+
+# -------- Async iperf3 Test -------- #
+async def run_iperf_test_async(target, on_interval=None):
+    """
+    Run iperf3 as an asyncio subprocess so many tests can be in flight at
+    once, or the built-in engine for engine="native" targets. Both return
+    the {"start", "end"} iperf3 document.
+    """
+    if target.engine == "native":
+        from traffic_engine import run_target_async
+        return await run_target_async(target, on_interval=on_interval)
+    # Output is parsed as it arrives; per-interval data is never held in full
+    return await run_iperf_streaming_async(iperf_command(target), on_interval=on_interval)
+
+# -------- Scheduler -------- #
+class TestScheduler:
+    """
+    Runs tests against many targets concurrently.
+
+    - at most `max_workers` tests are in flight at once
+    - tests sharing an ip:port never overlap (per-target lock)
+    - each target waits a jittered interval between rounds, or with a
+      `policy` (adaptive_scheduler.AdaptivePolicy) the interval and test
+      duration the policy gives it; the sink reports results to the policy
+    - results go through a bounded queue; when the sink falls behind,
+      measuring tasks block on the queue instead of piling up results
+    """
+
+    def __init__(self, targets, measure, sink, max_workers=8, queue_size=64, jitter=0.2, policy=None):
+        self.targets = list(targets)
+        self.measure = measure
+        self.sink = sink
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.jitter = jitter
+        self.policy = policy
+        self.completed = 0
+        self.failed = 0
+
+    def _jittered(self, interval):
+        if not self.jitter:
+            return interval
+        return max(0.0, interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def _run_target(self, target, rounds):
+        # Spread the first round so all targets don't start on the same tick
+        await asyncio.sleep(random.uniform(0, self.jitter * target.interval))
+        done = 0
+        while rounds is None or done < rounds:
+            async with self._locks[target.key], self._slots:
+                if self.policy is not None:
+                    target.duration = self.policy.duration(target.key)
+                started = time.monotonic()
+                try:
+                    metrics = await self.measure(target)
+                except Exception as e:
+                    self.failed += 1
+                    print(f"❌ {target}: {e}")
+                    metrics = None
+                elapsed = time.monotonic() - started
+            if metrics is not None:
+                # Blocks here when the sink is behind (backpressure)
+                await self._queue.put((target, metrics, elapsed))
+            done += 1
+            if rounds is None or done < rounds:
+                await self._pause(target, started)
+
+    async def _pause(self, target, started):
+        """Wait for the target's next round"""
+        if self.policy is None:
+            await asyncio.sleep(self._jittered(target.interval))
+            return
+        # Start to start; re-read while waiting, so an escalation reported by the sink cuts the wait short
+        while True:
+            remaining = started + self.policy.interval(target.key) - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, POLICY_POLL))
+
+    async def _drain(self):
+        while True:
+            target, metrics, elapsed = await self._queue.get()
+            try:
+                # The sink may touch disk; keep it off the event loop
+                await asyncio.to_thread(self.sink, target, metrics)
+                self.completed += 1
+            except Exception as e:
+                print(f"❌ sink failed for {target}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def run(self, rounds=None):
+        """Run `rounds` tests per target (forever if None)"""
+        self._locks = {t.key: asyncio.Lock() for t in self.targets}
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+
+        drainer = asyncio.create_task(self._drain())
+        try:
+            await asyncio.gather(*(self._run_target(t, rounds) for t in self.targets))
+            await self._queue.join()
+        finally:
+            drainer.cancel()
+            try:
+                await drainer
+            except asyncio.CancelledError:
+                pass
+        return self.completed
+
+    def sweep(self, rounds=1):
+        """Blocking convenience wrapper around run()"""
+        return asyncio.run(self.run(rounds))
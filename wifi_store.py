@@ -0,0 +1,729 @@
+import os, sys, json, time, zlib, fcntl, struct, threading
+from datetime import datetime
+import numpy as np
+
+# ----------------- Configuration ----------------- #
+STORE_DIR = "wifi_store"
+LEGACY_CSV = "wifi_results.csv"
+SEGMENT_ROWS = 65536      # rows in the active segment before it is sealed
+COMPACT_EVERY = 8         # merge this many small sealed segments into one
+# One entry per append, in a .crc file next to the active segment: its size after
+# the append and the CRC32 of the appended records
+BATCH_DTYPE = np.dtype([("end", "<u8"), ("crc", "<u4")])
+
+METRICS = ["throughput_mbps", "latency_ms", "jitter_ms", "lost_percent"]
+TEST_TYPES = ["tcp", "udp"]
+# flags: one bit per metric, set when the detector flagged that metric at ingest
+ANOMALY_FLAGS = {metric: 1 << i for i, metric in enumerate(METRICS)}
+
+# One fixed-size little-endian record per test. Timestamps are int64 nanoseconds
+# of the same naive wall-clock time the CSV used; missing metrics are NaN and an
+# unscored predicted_degraded is -1.
+RESULT_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("target", "<u2"),
+    ("test_type", "u1"),
+    ("flags", "u1"),
+    ("throughput_mbps", "<f4"),
+    ("retransmits", "<f4"),
+    ("lost_percent", "<f4"),
+    ("jitter_ms", "<f4"),
+    ("latency_ms", "<f4"),
+    ("predicted_degraded", "i1"),
+])
+
+# -------- Timestamps -------- #
+def to_ns(value):
+    """datetime / "%Y-%m-%d %H:%M:%S" / isoformat string -> int64 ns"""
+    if value is None:
+        return now_ns()
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if getattr(value, "tzinfo", None) is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return int(np.datetime64(value, "ns").astype(np.int64))
+
+def now_ns():
+    """Local wall-clock time in int64 ns, like to_ns(datetime.now()) without the conversions"""
+    t = time.time_ns()
+    return t + time.localtime(t // 1_000_000_000).tm_gmtoff * 1_000_000_000
+
+def flag_bits(anomalies):
+    """Metric names -> the flags byte"""
+    return sum(ANOMALY_FLAGS[m] for m in anomalies or ())
+
+# -------- Samples -------- #
+class Sample:
+    """
+    One test result, held the way RESULT_DTYPE stores it: int64 ns
+    timestamp, NaN for a missing metric, -1 for an unscored prediction.
+    Slots instead of a dict (~200 bytes instead of ~1 KB) and row() is the
+    record tuple, so a batch becomes an array in one call (to_records).
+    Keeps the dict-style get / [] access the detector and predictor use,
+    with missing values reading as None.
+    """
+    __slots__ = RESULT_DTYPE.names
+
+    def __init__(self, timestamp=None, throughput_mbps=None, retransmits=None, lost_percent=None,
+                 jitter_ms=None, latency_ms=None, predicted_degraded=None, target=0, test_type="tcp",
+                 anomalies=None):
+        self.timestamp = to_ns(timestamp)
+        self.target = target
+        self.test_type = test_type if isinstance(test_type, int) else TEST_TYPES.index(test_type)
+        self.flags = flag_bits(anomalies)
+        self.throughput_mbps = _float(throughput_mbps)
+        self.retransmits = _float(retransmits)
+        self.lost_percent = _float(lost_percent)
+        self.jitter_ms = _float(jitter_ms)
+        self.latency_ms = _float(latency_ms)
+        self.predicted_degraded = _predicted(predicted_degraded)
+
+    @classmethod
+    def from_dict(cls, metrics, test_type="tcp"):
+        return cls(metrics.get("timestamp"), metrics.get("throughput_mbps"), metrics.get("retransmits"),
+                   metrics.get("lost_percent"), metrics.get("jitter_ms"), metrics.get("latency_ms"),
+                   metrics.get("predicted_degraded"), test_type=test_type, anomalies=metrics.get("anomalies"))
+
+    def row(self, target_id=None):
+        """Field values in RESULT_DTYPE order"""
+        return (self.timestamp, self.target if target_id is None else target_id, self.test_type, self.flags,
+                self.throughput_mbps, self.retransmits, self.lost_percent, self.jitter_ms, self.latency_ms,
+                self.predicted_degraded)
+
+    def get(self, key, default=None):
+        if key == "anomalies":
+            return [m for m, bit in ANOMALY_FLAGS.items() if self.flags & bit]
+        value = getattr(self, key, None) if key in RESULT_DTYPE.fields else None
+        if value is None or value != value or (key == "predicted_degraded" and value < 0):
+            return default
+        return value
+
+    def __getitem__(self, key):
+        if key != "anomalies" and key not in RESULT_DTYPE.fields:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __setitem__(self, key, value):
+        if key == "anomalies":
+            self.flags = flag_bits(value)
+        elif key == "predicted_degraded":
+            self.predicted_degraded = _predicted(value)
+        elif key in METRICS or key == "retransmits":
+            setattr(self, key, _float(value))
+        elif key in RESULT_DTYPE.fields:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __repr__(self):
+        when = np.datetime64(self.timestamp, "ns").astype("datetime64[s]")
+        values = ", ".join(f"{k}={getattr(self, k):.3f}" for k in ("throughput_mbps", "latency_ms", "jitter_ms",
+                                                                   "lost_percent", "retransmits")
+                           if getattr(self, k) == getattr(self, k))
+        return f"Sample({when}, {values})"
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+def _predicted(value):
+    return -1 if value is None or value != value else int(value)
+
+def make_record(metrics, target_id=0, test_type="tcp"):
+    """One Sample or metrics dict -> a 1-element RESULT_DTYPE array"""
+    if not isinstance(metrics, Sample):
+        metrics = Sample.from_dict(metrics, test_type)
+    return np.array([metrics.row(target_id)], dtype=RESULT_DTYPE)
+
+def to_records(samples, target_id=None):
+    """Samples (or metrics dicts) -> one RESULT_DTYPE array"""
+    return np.fromiter(((s if isinstance(s, Sample) else Sample.from_dict(s)).row(target_id) for s in samples),
+                       RESULT_DTYPE, len(samples))
+
+class SampleBuffer:
+    """
+    Preallocated RESULT_DTYPE rows that double in capacity when full.
+    append() writes one row in place; view() hands the filled rows to the
+    store or a model (features()) without a copy.
+    """
+
+    def __init__(self, capacity=256, dtype=RESULT_DTYPE):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        if self.size + n > len(self.data):
+            grown = np.empty(max(2 * len(self.data), self.size + n), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+
+    def append(self, sample, target_id=None):
+        if not isinstance(sample, Sample):
+            sample = Sample.from_dict(sample)
+        self._reserve(1)
+        self.data[self.size] = sample.row(target_id)
+        self.size += 1
+
+    def extend(self, records):
+        self._reserve(len(records))
+        self.data[self.size:self.size + len(records)] = records
+        self.size += len(records)
+
+    def view(self):
+        return self.data[:self.size]
+
+    def features(self, fields=METRICS, missing=0.0):
+        """(rows, len(fields)) float64 matrix of the buffered rows"""
+        return feature_matrix(self.view(), fields, missing)
+
+    def clear(self):
+        self.size = 0
+
+def feature_matrix(records, fields=METRICS, missing=0.0):
+    """Model input from RESULT_DTYPE records; NaN becomes `missing` unless it is None"""
+    X = np.column_stack([records[f].astype(np.float64) for f in fields])
+    if missing is not None:
+        X[np.isnan(X)] = missing
+    return X
+
+# -------- Segment Log -------- #
+class SegmentLog:
+    """
+    Append-only log of fixed-size records split into segment files.
+
+    New records are appended to the active segment (O(1) per write). Once it
+    reaches `segment_rows` it is sealed and its time range recorded in the
+    manifest, so range reads only open segments that overlap the range.
+    Small sealed segments are periodically merged and sorted by time.
+
+    Every append also writes its end offset and CRC32 to the active
+    segment's .crc file. A writer opening the segment checks every batch
+    and cuts it back to the last one that matches, so a crash can leave
+    neither a torn tail nor a garbled or zero-filled one of the right
+    length; the follower only reads checked batches. Fields in `mutable`
+    (rewritten in place by write_field) are left out of the CRC.
+    With `durable`, seals and compactions are fsynced and sync() flushes
+    the active segment (the ingest service calls it once per group commit).
+    """
+
+    mutable = ()
+
+    def __init__(self, path, dtype, segment_rows=SEGMENT_ROWS, compact_every=COMPACT_EVERY,
+                 time_field="timestamp", durable=False):
+        self.path = path
+        self.durable = durable
+        self.dtype = np.dtype(dtype)
+        self.segment_rows = segment_rows
+        self.compact_every = compact_every
+        self.time_field = time_field
+        self.manifest_file = os.path.join(path, "manifest.json")
+        self._fd = None
+        self._crc_fd = None
+        self._lock_fd = None
+        # flock only excludes other processes; threads sharing this object need their own lock
+        self._thread_lock = threading.Lock()
+        self._manifest_mtime = None
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(self.manifest_file):
+                self._write_manifest({
+                    "version": 1,
+                    "dtype": self.dtype.descr,
+                    "next_id": 1,
+                    "active": self._segment_name(0),
+                    "segments": [],
+                })
+            self._load_manifest()
+        # Compare in JSON form: subarray shapes come back from the manifest as lists
+        if self.manifest["dtype"] != json.loads(json.dumps(self.dtype.descr)):
+            raise ValueError(f"{path} was written with a different record layout")
+
+    # ---- manifest ---- #
+    def _segment_name(self, seg_id):
+        return f"seg-{seg_id:06d}.bin"
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def crc_file(self, name):
+        return self._file(os.path.splitext(name)[0] + ".crc")
+
+    def checksum(self, data):
+        """CRC32 of whole records' bytes, leaving out the mutable fields"""
+        if self.mutable:
+            data = np.frombuffer(data, dtype=np.uint8).reshape(-1, self.dtype.itemsize).copy()
+            for field in self.mutable:
+                offset = self.dtype.fields[field][1]
+                data[:, offset:offset + self.dtype[field].itemsize] = 0
+        return zlib.crc32(data)
+
+    def read_batches(self, name):
+        """The whole entries of a segment's .crc file, or None if it has none (sealed or pre-CRC)"""
+        try:
+            with open(self.crc_file(name), "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        return np.frombuffer(raw[:len(raw) - len(raw) % BATCH_DTYPE.itemsize], dtype=BATCH_DTYPE)
+
+    def _locked(self):
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self._file("store.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        return _FileLock(self._lock_fd, self._thread_lock)
+
+    def _write_manifest(self, manifest):
+        tmp = self.manifest_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_file)
+        self.manifest = manifest
+
+    def _load_manifest(self):
+        mtime = os.stat(self.manifest_file).st_mtime_ns
+        with open(self.manifest_file) as f:
+            self.manifest = json.load(f)
+        self._manifest_mtime = mtime
+
+    def refresh(self):
+        """Reload the manifest if another process changed it"""
+        if os.stat(self.manifest_file).st_mtime_ns != self._manifest_mtime:
+            self._load_manifest()
+            return True
+        return False
+
+    # ---- writing ---- #
+    def _active_fd(self):
+        if self.refresh() and self._fd is not None:
+            os.close(self._fd)
+            os.close(self._crc_fd)
+            self._fd = self._crc_fd = None
+        if self._fd is None:
+            name = self.manifest["active"]
+            path = self._file(name)
+            legacy = os.path.exists(path) and os.path.getsize(path) > 0 and not os.path.exists(self.crc_file(name))
+            self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._crc_fd = os.open(self.crc_file(name), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            self._recover(legacy)
+        return self._fd
+
+    def _recover(self, legacy=False):
+        """Cut the active segment back to its last batch whose CRC matches (after a crash)"""
+        size = os.fstat(self._fd).st_size
+        if legacy:
+            # Written before checksums: keep its whole records as one batch
+            size -= size % self.dtype.itemsize
+            os.ftruncate(self._fd, size)
+            with open(self._file(self.manifest["active"]), "rb") as f:
+                os.write(self._crc_fd, struct.pack("<QI", size, self.checksum(f.read(size))))
+            return
+        batches = self.read_batches(self.manifest["active"])
+        with open(self._file(self.manifest["active"]), "rb") as f:
+            data = f.read()
+        end = good = 0
+        for batch in batches:
+            n = int(batch["end"]) - end
+            if n <= 0 or int(batch["end"]) > size or n % self.dtype.itemsize \
+                    or self.checksum(data[end:end + n]) != batch["crc"]:
+                break
+            end += n
+            good += 1
+        if end != size or good * BATCH_DTYPE.itemsize != os.fstat(self._crc_fd).st_size:
+            if end != size:
+                print(f"⚠️ {self._file(self.manifest['active'])}: dropped {size - end} bytes "
+                      f"after the last intact batch")
+            os.ftruncate(self._fd, end)
+            os.ftruncate(self._crc_fd, good * BATCH_DTYPE.itemsize)
+
+    def _batch_end(self):
+        """End offset recorded by the last append, or None if the .crc tail is torn"""
+        crc_size = os.fstat(self._crc_fd).st_size
+        if crc_size % BATCH_DTYPE.itemsize:
+            return None
+        if crc_size == 0:
+            return 0
+        last = os.pread(self._crc_fd, BATCH_DTYPE.itemsize, crc_size - BATCH_DTYPE.itemsize)
+        return struct.unpack("<QI", last)[0]
+
+    def append_records(self, records):
+        """Append a structured array of records (one write syscall, plus its .crc entry)"""
+        records = np.ascontiguousarray(records, dtype=self.dtype)
+        if len(records) == 0:
+            return
+        data = records.tobytes()
+        with self._locked():
+            fd = self._active_fd()
+            size = os.fstat(fd).st_size
+            if size != self._batch_end():
+                # A writer in another process died mid-append
+                self._recover()
+                size = os.fstat(fd).st_size
+            crc_size = os.fstat(self._crc_fd).st_size
+            entry = struct.pack("<QI", size + len(data), self.checksum(data))
+            if os.write(fd, data) != len(data) or os.write(self._crc_fd, entry) != len(entry):
+                # e.g. out of space: drop the partial batch rather than misalign the segment
+                os.ftruncate(fd, size)
+                os.ftruncate(self._crc_fd, crc_size)
+                raise OSError(f"short write to {self._file(self.manifest['active'])}")
+            self._appended(records)
+            if size + len(data) >= self.segment_rows * self.dtype.itemsize:
+                self._seal()
+
+    def _appended(self, records):
+        """Called under the store lock after `records` were written (derived data goes here)"""
+
+    def sync(self):
+        """fsync the active segment (records appended before a seal were synced by it)"""
+        with self._locked():
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.fsync(self._crc_fd)
+
+    def write_field(self, name, field, rows, values):
+        """
+        Overwrite one field of existing records of segment `name` in place
+        (`rows` are offsets into it). Runs under the store lock, so it never
+        races a compaction; False if compaction already replaced the segment.
+        """
+        if field not in self.mutable:
+            raise ValueError(f"{field} is covered by the segment checksums; only {self.mutable} can be rewritten")
+        with self._locked():
+            self.refresh()
+            if name != self.manifest["active"] and name not in {s["name"] for s in self.manifest["segments"]}:
+                return False
+            data = np.memmap(self._file(name), dtype=self.dtype, mode="r+", shape=(int(rows.max()) + 1,))
+            data[field][rows] = values
+            data.flush()            # msync: durable on return
+            del data
+        return True
+
+    def _seal(self):
+        name = self.manifest["active"]
+        data = np.fromfile(self._file(name), dtype=self.dtype)
+        t = data[self.time_field]
+        manifest = dict(self.manifest)
+        manifest["segments"] = self.manifest["segments"] + [{
+            "name": name,
+            "rows": int(len(data)),
+            "t_min": int(t.min()),
+            "t_max": int(t.max()),
+            "sorted": bool(np.all(t[1:] >= t[:-1])),
+        }]
+        manifest["active"] = self._segment_name(manifest["next_id"])
+        manifest["next_id"] += 1
+        if self.durable:
+            os.fsync(self._fd)
+        self._write_manifest(manifest)
+        self._manifest_mtime = os.stat(self.manifest_file).st_mtime_ns
+        os.close(self._fd)
+        os.close(self._crc_fd)
+        self._fd = self._crc_fd = None
+        # The manifest now vouches for the sealed rows
+        os.remove(self.crc_file(name))
+
+        small = [s for s in manifest["segments"] if s["rows"] < self.segment_rows * self.compact_every]
+        if self.compact_every and len(small) >= self.compact_every:
+            self._compact(small)
+
+    def compact(self):
+        """Merge every sealed segment smaller than segment_rows * compact_every"""
+        with self._locked():
+            self.refresh()
+            small = [s for s in self.manifest["segments"] if s["rows"] < self.segment_rows * self.compact_every]
+            if len(small) > 1:
+                self._compact(small)
+
+    def _compact(self, segments):
+        data = np.concatenate([np.fromfile(self._file(s["name"]), dtype=self.dtype) for s in segments])
+        data = self._merge(data)
+        manifest = dict(self.manifest)
+        name = self._segment_name(manifest["next_id"])
+        manifest["next_id"] += 1
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "wb") as f:
+            data.tofile(f)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self._file(name))
+
+        merged = {s["name"] for s in segments}
+        t = data[self.time_field]
+        kept = [s for s in manifest["segments"] if s["name"] not in merged]
+        kept.append({"name": name, "rows": int(len(data)), "t_min": int(t.min()),
+                     "t_max": int(t.max()), "sorted": True})
+        manifest["segments"] = sorted(kept, key=lambda s: s["t_min"])
+        self._write_manifest(manifest)
+        self._manifest_mtime = os.stat(self.manifest_file).st_mtime_ns
+        for s in segments:
+            try:
+                os.remove(self._file(s["name"]))
+            except FileNotFoundError:
+                pass
+
+    def _merge(self, data):
+        """Rows of the compacted segment, sorted by time (subclasses may also combine rows)"""
+        return data[np.argsort(data[self.time_field], kind="stable")]
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            os.close(self._crc_fd)
+            self._fd = self._crc_fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # ---- reading ---- #
+    def _map(self, name, rows=None):
+        path = self._file(name)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=self.dtype)
+        # Ignore a partially written trailing record
+        n = size // self.dtype.itemsize if rows is None else rows
+        if n == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode="r", shape=(n,))
+
+    def _slice(self, data, start, end, is_sorted):
+        t = data[self.time_field]
+        if is_sorted:
+            lo = 0 if start is None else np.searchsorted(t, start, "left")
+            hi = len(t) if end is None else np.searchsorted(t, end, "left")
+            return data[lo:hi]
+        mask = np.ones(len(t), dtype=bool)
+        if start is not None:
+            mask &= t >= start
+        if end is not None:
+            mask &= t < end
+        return data[mask]
+
+    def read_range(self, start=None, end=None):
+        """Records with start <= timestamp < end, touching only overlapping segments"""
+        start = None if start is None else to_ns(start)
+        end = None if end is None else to_ns(end)
+        for _ in range(3):
+            self.refresh()
+            try:
+                parts = []
+                for s in self.manifest["segments"]:
+                    if (start is not None and s["t_max"] < start) or (end is not None and s["t_min"] >= end):
+                        continue
+                    data = np.memmap(self._file(s["name"]), dtype=self.dtype, mode="r", shape=(s["rows"],))
+                    parts.append(self._slice(data, start, end, s["sorted"]))
+                parts.append(self._slice(self._map(self.manifest["active"]), start, end, False))
+                break
+            except FileNotFoundError:
+                # A compaction replaced a segment under us; reload and retry
+                self._manifest_mtime = None
+        else:
+            raise RuntimeError(f"could not read a consistent snapshot of {self.path}")
+        return np.concatenate(parts) if parts else np.empty(0, dtype=self.dtype)
+
+    def iter_chunks(self, start=None, end=None, chunk_rows=SEGMENT_ROWS):
+        """Yield the range segment by segment in chunks of at most chunk_rows"""
+        start = None if start is None else to_ns(start)
+        end = None if end is None else to_ns(end)
+        self.refresh()
+        names = [(s["name"], s["rows"], s["sorted"]) for s in self.manifest["segments"]
+                 if not ((start is not None and s["t_max"] < start) or (end is not None and s["t_min"] >= end))]
+        names.append((self.manifest["active"], None, False))
+        for name, rows, is_sorted in names:
+            data = self._slice(self._map(name, rows), start, end, is_sorted)
+            for i in range(0, len(data), chunk_rows):
+                yield np.array(data[i:i + chunk_rows])
+
+    def tail(self, n):
+        """The last n records, reading only the newest segments"""
+        self.refresh()
+        parts = []
+        active = self._map(self.manifest["active"])
+        parts.append(np.array(active[max(0, len(active) - n):]))
+        need = n - len(parts[0])
+        for s in reversed(self.manifest["segments"]):
+            if need <= 0:
+                break
+            data = np.memmap(self._file(s["name"]), dtype=self.dtype, mode="r", shape=(s["rows"],))
+            parts.append(np.array(data[max(0, s["rows"] - need):]))
+            need -= len(parts[-1])
+        return np.concatenate(parts[::-1])
+
+    def time_range(self):
+        """(first, last) timestamp stored, from the manifest plus a scan of the active segment; None if empty"""
+        self.refresh()
+        lo = [s["t_min"] for s in self.manifest["segments"]]
+        hi = [s["t_max"] for s in self.manifest["segments"]]
+        t = self._map(self.manifest["active"])[self.time_field]
+        if len(t):
+            lo.append(int(t.min()))
+            hi.append(int(t.max()))
+        return (min(lo), max(hi)) if lo else None
+
+    def __len__(self):
+        self.refresh()
+        return sum(s["rows"] for s in self.manifest["segments"]) + len(self._map(self.manifest["active"]))
+
+# -------- Result Store -------- #
+class ResultStore(SegmentLog):
+    """Test results shared by all scripts (replaces rewriting wifi_results.csv)"""
+
+    mutable = ("predicted_degraded",)    # backfill scores rows in place
+
+    def __init__(self, path=STORE_DIR, **kwargs):
+        super().__init__(path, RESULT_DTYPE, **kwargs)
+        self.rollups = None     # RollupEngine kept up to date by append_records (see rollups.attach)
+
+    # ---- targets ---- #
+    def target_id(self, target):
+        """Map a target name (e.g. "127.0.0.1:5201") to its small integer id"""
+        target = str(target or "127.0.0.1:5201")
+        targets = self.manifest.setdefault("targets", [])
+        if target in targets:
+            return targets.index(target)
+        with self._locked():
+            self._load_manifest()
+            targets = self.manifest.setdefault("targets", [])
+            if target not in targets:
+                manifest = dict(self.manifest)
+                manifest["targets"] = targets + [target]
+                self._write_manifest(manifest)
+                self._manifest_mtime = os.stat(self.manifest_file).st_mtime_ns
+            return self.manifest["targets"].index(target)
+
+    def target_names(self):
+        self.refresh()
+        return list(self.manifest.get("targets", []))
+
+    def target_labels(self, ids):
+        """Target ids -> "ip:port" names; ids the manifest does not know become unknown:<id>"""
+        names = self.target_names() or ["127.0.0.1:5201"]
+        ids = np.asarray(ids)
+        labels = np.array(names + [None], dtype=object)[np.minimum(ids, len(names))]
+        unknown = ids >= len(names)
+        if unknown.any():
+            labels[unknown] = [f"unknown:{i}" for i in ids[unknown]]
+        return labels
+
+    # ---- writing ---- #
+    def _appended(self, records):
+        # Same critical section as the raw write: a crash can't leave the rollups behind the raw rows
+        if self.rollups is not None:
+            self.rollups.add(records)
+
+    def make_record(self, metrics, target=None, test_type="tcp"):
+        return make_record(metrics, self.target_id(target), test_type)
+
+    def append(self, metrics, target=None, test_type="tcp"):
+        """Append one metrics dict as produced by extract_metrics / run_iperf_test"""
+        self.append_records(self.make_record(metrics, target, test_type))
+
+    # ---- reading ---- #
+    def to_frame(self, records):
+        """Structured records -> DataFrame with the same columns as the CSV"""
+        import pandas as pd
+        df = pd.DataFrame({
+            "timestamp": pd.to_datetime(records["timestamp"], unit="ns"),
+            "throughput_mbps": records["throughput_mbps"].astype(float),
+            "retransmits": records["retransmits"].astype(float),
+            "lost_percent": records["lost_percent"].astype(float),
+            "jitter_ms": records["jitter_ms"].astype(float),
+            "latency_ms": records["latency_ms"].astype(float),
+            "predicted_degraded": np.where(records["predicted_degraded"] < 0, np.nan,
+                                           records["predicted_degraded"]).astype(float),
+        })
+        df["target"] = self.target_labels(records["target"])
+        df["test_type"] = np.array(TEST_TYPES, dtype=object)[records["test_type"]]
+        df["flags"] = records["flags"]
+        return df
+
+    def read_frame(self, start=None, end=None):
+        return self.to_frame(self.read_range(start, end))
+
+    # ---- CSV interop ---- #
+    def import_csv(self, csv_file=LEGACY_CSV, target=None):
+        import pandas as pd
+        df = pd.read_csv(csv_file)
+        if df.empty:
+            return 0
+        # The scripts wrote both "%Y-%m-%d %H:%M:%S" and isoformat() timestamps
+        ts = pd.to_datetime(df["timestamp"], format="mixed")
+        records = np.zeros(len(df), dtype=RESULT_DTYPE)
+        records["timestamp"] = ts.values.astype("datetime64[ns]").astype(np.int64)
+        records["target"] = self.target_id(target)
+        for field in ["throughput_mbps", "retransmits", "lost_percent", "jitter_ms", "latency_ms"]:
+            records[field] = df[field].astype(float).values if field in df.columns else np.nan
+        if "predicted_degraded" in df.columns:
+            records["predicted_degraded"] = df["predicted_degraded"].fillna(-1).astype(int).values
+        else:
+            records["predicted_degraded"] = -1
+        self.append_records(records)
+        return len(records)
+
+    def export_csv(self, csv_file, start=None, end=None):
+        df = self.read_frame(start, end)
+        df.to_csv(csv_file, index=False)
+        return len(df)
+
+class _FileLock:
+    def __init__(self, fd, thread_lock):
+        self.fd = fd
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+def open_store(path=STORE_DIR, legacy_csv=LEGACY_CSV):
+    """Open the shared store, importing the legacy CSV the first time"""
+    from rollups import attach
+    fresh = not os.path.exists(os.path.join(path, "manifest.json"))
+    store = ResultStore(path)
+    attach(store)
+    if fresh and legacy_csv and os.path.exists(legacy_csv):
+        n = store.import_csv(legacy_csv)
+        print(f"📦 Imported {n} rows from {legacy_csv} into {path}/")
+    return store
+
+_default_store = None
+
+def default_store():
+    """The process-wide store every script reads and writes"""
+    global _default_store
+    if _default_store is None:
+        _default_store = open_store()
+    return _default_store
+
+# -------- Command Line -------- #
+if __name__ == "__main__":
+    usage = "usage: python wifi_store.py [import CSV | export CSV | compact | info]"
+    if len(sys.argv) < 2:
+        print(usage)
+        sys.exit(1)
+    store = open_store(legacy_csv=None)
+    cmd = sys.argv[1]
+    if cmd == "import":
+        print(f"✅ Imported {store.import_csv(sys.argv[2])} rows")
+    elif cmd == "export":
+        print(f"✅ Exported {store.export_csv(sys.argv[2])} rows to {sys.argv[2]}")
+    elif cmd == "compact":
+        store.compact()
+        print(f"✅ Compacted into {len(store.manifest['segments'])} segment(s)")
+    elif cmd == "info":
+        print(f"rows={len(store)} segments={len(store.manifest['segments'])} targets={store.target_names()}")
+    else:
+        print(usage)
+        sys.exit(1)
+    store.close()